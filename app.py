@@ -3,9 +3,19 @@
 # - Main Flask Application Entry Point
 ###########################################
 
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_from_directory
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
 from flask_sqlalchemy import SQLAlchemy
-from models import db, USAFRetirementPay, VADisabilityPay, RentalProperty, UploadedFile
+from models import db, sync_schema, USAFRetirementPay, VADisabilityPay, RentalProperty, UploadedFile
+from services.ledger import migrate_legacy_income_tables
+from services.migrations import apply_data_migrations
+from services.search import ensure_search_index
+from services.analytics import ensure_change_log
+from services.net_worth import ensure_net_worth_tracking
+from services.money import MoneyJSONProvider
+from services.cache import query_cache
+from services.file_serving import send_stored_file
+from services.document_jobs import document_worker
+from services.sqlite_engine import sqlite_engine_options, init_sqlite_engine
 from datetime import datetime
 
 import os
@@ -21,6 +31,9 @@ app = Flask(
     static_folder='static'        # Points to static/
 )
 
+# Serialize Decimal money values as fixed-point strings (see services/money.py)
+app.json = MoneyJSONProvider(app)
+
 # Project base directory
 basedir = os.path.abspath(os.path.dirname(__file__))
 
@@ -31,8 +44,39 @@ app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'a_very_secret_and_rando
 app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(basedir, 'data', 'database.db')}"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# SQLite engine profile: 'tuned' (WAL, pragmas, sized pool) or 'default' (see services/sqlite_engine.py)
+app.config['SQLITE_ENGINE_PROFILE'] = os.environ.get('SQLITE_ENGINE_PROFILE', 'tuned')
+app.config['SQLITE_CACHE_SIZE_MB'] = int(os.environ.get('SQLITE_CACHE_SIZE_MB', 64))
+app.config['SQLITE_MMAP_SIZE_MB'] = int(os.environ.get('SQLITE_MMAP_SIZE_MB', 256))
+app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = sqlite_engine_options(
+    app.config['SQLITE_ENGINE_PROFILE'],
+    busy_timeout_ms=app.config['SQLITE_BUSY_TIMEOUT_MS'],
+    pool_size=int(os.environ.get('SQLITE_POOL_SIZE', 10)),
+    max_overflow=int(os.environ.get('SQLITE_POOL_MAX_OVERFLOW', 10)),
+)
+
+# Years of zeroed monthly pay rows kept around the current year (see services/seeding.py)
+app.config['PAY_CALENDAR_YEARS_BACK'] = int(os.environ.get('PAY_CALENDAR_YEARS_BACK', 1))
+app.config['PAY_CALENDAR_YEARS_AHEAD'] = int(os.environ.get('PAY_CALENDAR_YEARS_AHEAD', 1))
+
+# In-process query result cache (see services/cache.py)
+app.config['QUERY_CACHE_ENABLED'] = os.environ.get('QUERY_CACHE_ENABLED', '1') == '1'
+app.config['QUERY_CACHE_MAX_ENTRIES'] = int(os.environ.get('QUERY_CACHE_MAX_ENTRIES', 256))
+app.config['QUERY_CACHE_TTL'] = int(os.environ.get('QUERY_CACHE_TTL', 300)) # Seconds
+
+# Background thumbnail / text-extraction workers (see services/document_jobs.py)
+app.config['DOCUMENT_WORKER_ENABLED'] = os.environ.get('DOCUMENT_WORKER_ENABLED', '1') == '1'
+app.config['DOCUMENT_WORKER_THREADS'] = int(os.environ.get('DOCUMENT_WORKER_THREADS', 2))
+app.config['DOCUMENT_WORKER_POLL_SECONDS'] = int(os.environ.get('DOCUMENT_WORKER_POLL_SECONDS', 5))
+
 # File Upload Path
 app.config['UPLOAD_FOLDER'] = os.path.join('static', 'uploads')
+app.config['UPLOAD_CHUNK_SIZE'] = int(os.environ.get('UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024)) # Max bytes per resumable chunk
+app.config['MAX_UPLOAD_SIZE'] = int(os.environ.get('MAX_UPLOAD_SIZE', 2 * 1024 * 1024 * 1024)) # Max bytes per resumable upload
+# Let a front proxy stream documents: '' (Python serves them), 'x-sendfile' or 'x-accel-redirect'
+app.config['UPLOAD_SENDFILE_MODE'] = os.environ.get('UPLOAD_SENDFILE_MODE', '')
+app.config['UPLOAD_ACCEL_REDIRECT_PREFIX'] = os.environ.get('UPLOAD_ACCEL_REDIRECT_PREFIX', '/protected_uploads/')
 
 # Ensure necessary folders exist
 os.makedirs('data', exist_ok=True)
@@ -54,8 +98,11 @@ if not app.debug:
 # - Register Blueprints
 ###########################################
 
-# Initialize the DB with the app
+# Initialize the DB (with its SQLite pragmas), the query cache and the document worker with the app
 db.init_app(app)
+init_sqlite_engine(app, db)
+query_cache.init_app(app)
+document_worker.init_app(app)
 
 # Load and register all blueprints centrally
 from routes import register_blueprints
@@ -69,8 +116,9 @@ register_blueprints(app)
 def uploaded_file(filename):
     """
     Serves uploaded files from the uploads directory.
+    Blob paths are cached as immutable; legacy names are revalidated by ETag.
     """
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    return send_stored_file(filename)
 
 ###########################################
 # - Run the App
@@ -79,7 +127,12 @@ def uploaded_file(filename):
 if __name__ == '__main__':
     with app.app_context():
         try:
-            db.create_all()
+            sync_schema()  # Creates tables and back-fills indexes added since the DB was created
+            ensure_search_index()  # FTS5 table + sync triggers, filled from existing rows on first run
+            apply_data_migrations()  # One-off row rewrites, e.g. money columns to integer cents
+            migrate_legacy_income_tables()  # Copies USAF/VA rows from their old tables into the income ledger
+            ensure_change_log()  # Update/delete triggers feeding the analytics snapshot
+            ensure_net_worth_tracking()  # Series tables + triggers marking the earliest changed day
             print("✅ Databases created successfully!")
         except Exception as e:
             print(f" Error creating databases: {e}")
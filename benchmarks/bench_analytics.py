@@ -0,0 +1,93 @@
+# benchmarks/bench_analytics.py
+###########################################
+# - Benchmark: dashboard analytics from the column snapshot
+#
+# Fills a database with several years of synthetic bank transactions and
+# income ledger rows, then times:
+#   SQL GROUP BY      : the monthly cash flow computed by SQLite on every request (baseline)
+#   snapshot load     : first request, every table read into NumPy columns
+#   cash flow series  : monthly rollup + moving average + year-over-year from the snapshot
+#   delta refresh     : after updating and inserting a few hundred rows (change log + new ids)
+# and checks the snapshot's monthly totals against the SQL ones.
+#
+# Usage: python benchmarks/bench_analytics.py [rows]
+###########################################
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from models import db, BankTransaction, IncomeLedgerEntry
+from services.analytics import ensure_change_log, analytics_store, cash_flow_series, income_series
+from services.versioning import bump_table_versions
+from datetime import date, timedelta
+
+CATEGORIES = (None, 'Groceries', 'Dining', 'Fuel', 'Utilities', 'Shopping', 'Travel')
+
+def timed(label, run, repeat=1):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = run()
+    elapsed = (time.perf_counter() - started) / repeat
+    print(f"{label:34s} {elapsed * 1000:9.2f} ms")
+    return result
+
+def sql_monthly_cash_flow():
+    rows = db.session.execute(db.text(
+        "SELECT strftime('%Y-%m', posted_date) AS period, "
+        "sum(CASE WHEN amount > 0 THEN amount ELSE 0 END), sum(CASE WHEN amount < 0 THEN -amount ELSE 0 END) "
+        "FROM bank_transactions GROUP BY period ORDER BY period")).all()
+    return {period: (money_in, money_out) for period, money_in, money_out in rows}
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    rng = random.Random(19)
+    start = date(2015, 1, 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            ensure_change_log()
+            db.session.execute(db.insert(BankTransaction), [{
+                'account': rng.choice(('usaa', 'n26', 'chase')),
+                'posted_date': start + timedelta(days=i * 3650 // rows),
+                'amount': rng.randrange(1, 300000) / 100 * (1 if i % 20 == 0 else -1),
+                'description': 'POS', 'dedup_key': f"{i:032x}", 'category': rng.choice(CATEGORIES),
+            } for i in range(rows)])
+            db.session.execute(db.insert(IncomeLedgerEntry), [{
+                'stream': f"stream{s}", 'year': 2015 + m // 12, 'month_index': m % 12 + 1,
+                'gross_pay': 5000, 'taxed_amount': 900, 'net_pay': 4100 + m,
+            } for s in range(rows // 1200) for m in range(120)])
+            bump_table_versions(db.session, ['bank_transactions', 'income_ledger'])
+            db.session.commit()
+            print(f"{rows} transactions, {rows // 1200 * 120} income rows\n")
+
+            expected = timed('SQL GROUP BY (monthly cash flow)', sql_monthly_cash_flow, repeat=3)
+            timed('snapshot load (first request)', analytics_store.snapshot)
+            series = timed('cash flow series (monthly)', cash_flow_series, repeat=20)
+            timed('income series (monthly)', income_series, repeat=20)
+            timed('unchanged snapshot check', analytics_store.snapshot, repeat=100)
+
+            actual = {period: (money_in, money_out)
+                      for period, money_in, money_out in zip(series['periods'], series['money_in'], series['money_out'])}
+            for period, (money_in, money_out) in expected.items():
+                assert actual[period] == (f"{money_in / 100:.2f}", f"{money_out / 100:.2f}"), period
+
+            changed = rng.sample(range(1, rows + 1), 300)
+            db.session.connection().exec_driver_sql(
+                "UPDATE bank_transactions SET amount = amount - 100 WHERE id = ?", [(row_id,) for row_id in changed])
+            db.session.execute(db.insert(BankTransaction), [{
+                'account': 'usaa', 'posted_date': date(2025, 1, 1), 'amount': -1, 'description': 'POS',
+                'dedup_key': f"new{i:029x}"} for i in range(300)])
+            bump_table_versions(db.session, ['bank_transactions'])
+            db.session.commit()
+            timed('delta refresh (300 updated, 300 new)', analytics_store.snapshot)
+            print(f"\n{analytics_store.stats}")
+            db.engine.dispose()
@@ -0,0 +1,85 @@
+# benchmarks/bench_money_serialization.py
+###########################################
+# - Benchmark: monthly pay serialization
+#
+# Compares the old path (ORM objects -> to_dict() -> jsonify with Flask's
+# default provider) against the money pipeline (column projection -> money
+# formatted while building rows -> MoneyJSONProvider).
+#
+# Usage: python benchmarks/bench_money_serialization.py [rows]
+###########################################
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify
+from flask.json.provider import DefaultJSONProvider
+from models import db, USAFRetirementPay, IncomeLedgerEntry
+from services.money import MoneyJSONProvider, format_money
+from decimal import Decimal
+import calendar
+
+FIELDS = ('id', 'year', 'month_index', 'gross_pay', 'taxed_amount', 'net_pay')
+MONEY_FIELDS = ('gross_pay', 'taxed_amount', 'net_pay')
+
+def build_app(rows):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        legacy, ledger = [], []
+        for i in range(rows):
+            year, month_index = 1000 + i // 12, i % 12 + 1
+            gross, taxed = Decimal(1000 + i % 997) + Decimal('0.37'), Decimal(i % 211) + Decimal('0.05')
+            legacy.append({'year': year, 'month_index': month_index, 'month_name': calendar.month_name[month_index],
+                           'gross_pay': gross, 'taxed_amount': taxed, 'net_pay': gross - taxed})
+            ledger.append({'stream': 'bench', 'year': year, 'month_index': month_index,
+                           'gross_pay': gross, 'taxed_amount': taxed, 'net_pay': gross - taxed})
+        db.session.execute(db.insert(USAFRetirementPay), legacy)
+        db.session.execute(db.insert(IncomeLedgerEntry), ledger)
+        db.session.commit()
+    return app
+
+def old_path(app):
+    app.json = DefaultJSONProvider(app)
+    data = USAFRetirementPay.query.all()
+    return jsonify([item.to_dict() for item in data]).get_data()
+
+def new_path(app):
+    app.json = MoneyJSONProvider(app)
+    columns = [getattr(IncomeLedgerEntry, field) for field in FIELDS]
+    rows = (db.session.query(*columns)
+            .filter(IncomeLedgerEntry.stream == 'bench')
+            .order_by(IncomeLedgerEntry.year, IncomeLedgerEntry.month_index)
+            .all())
+    result = []
+    for row in rows:
+        item = dict(zip(FIELDS, row))
+        for field in MONEY_FIELDS:
+            item[field] = format_money(item[field])
+        item['month_name'] = calendar.month_name[item['month_index']]
+        result.append(item)
+    return jsonify(result).get_data()
+
+def best_of(func, app, repeat=5):
+    timings = []
+    with app.test_request_context():
+        for _ in range(repeat):
+            db.session.expunge_all()
+            start = time.perf_counter()
+            body = func(app)
+            timings.append(time.perf_counter() - start)
+    return min(timings), len(body)
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    app = build_app(rows)
+    print(f"Serializing {rows:,} monthly pay rows (best of 5)")
+    for name, func in (('to_dict + jsonify (default provider)', old_path),
+                       ('projection + MoneyJSONProvider', new_path)):
+        seconds, size = best_of(func, app)
+        print(f"  {name:40s} {seconds * 1000:8.1f} ms  {rows / seconds:12,.0f} rows/s  {size / 1024:8.0f} KiB")
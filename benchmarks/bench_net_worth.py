@@ -0,0 +1,91 @@
+# benchmarks/bench_net_worth.py
+###########################################
+# - Benchmark: materialized net worth series
+#
+# Fills a database with decades of synthetic transactions, income and
+# mortgaged properties, then times services.net_worth.refresh_net_worth() for:
+#   full build          : every day since the first source record
+#   recent change       : one transaction edited last month (recomputes a few weeks)
+#   old change          : one transaction edited 20 years ago (recomputes 20 years)
+# and the read of one year of the daily series, which costs the same whatever
+# the length of the history. The incremental result is checked against a full rebuild.
+#
+# Usage: python benchmarks/bench_net_worth.py [years]
+###########################################
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from models import db, BankTransaction, IncomeLedgerEntry, RentalProperty, NetWorthPoint
+from services.net_worth import ensure_net_worth_tracking, refresh_net_worth
+from datetime import date, timedelta
+
+def timed(label, run):
+    started = time.perf_counter()
+    result = run()
+    print(f"{label:32s} {(time.perf_counter() - started) * 1000:9.1f} ms")
+    return result
+
+def series():
+    return db.session.execute(db.text("SELECT * FROM net_worth_series ORDER BY granularity, period")).all()
+
+def rebuild():
+    db.session.execute(db.text("UPDATE net_worth_state SET built_through = NULL"))
+    db.session.commit()
+    return refresh_net_worth(today)
+
+if __name__ == '__main__':
+    years = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    rng = random.Random(20)
+    today = date.today()
+    start = today.replace(year=today.year - years)
+    days = (today - start).days
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            ensure_net_worth_tracking()
+            db.session.execute(db.insert(BankTransaction), [{
+                'account': 'usaa', 'posted_date': start + timedelta(days=rng.randrange(days)),
+                'amount': rng.randrange(-30000, 20000) / 100, 'description': 'POS', 'dedup_key': f"{i:032x}",
+            } for i in range(days * 10)])
+            db.session.execute(db.insert(IncomeLedgerEntry), [{
+                'stream': 'salary', 'year': start.year + m // 12, 'month_index': m % 12 + 1,
+                'gross_pay': 6000, 'taxed_amount': 1200, 'net_pay': 4800,
+            } for m in range(years * 12)])
+            db.session.execute(db.insert(RentalProperty), [{
+                'property_id': f"P{i}", 'property_name': 'Unit', 'address': '-', 'city': '-', 'state': 'TX',
+                'ownership_association': 'LLC', 'purchase_date': start + timedelta(days=rng.randrange(days)),
+                'purchase_price': rng.randrange(100000, 600000), 'down_payment': 20000,
+                'interest_rate': rng.choice((3.25, 4.5, 6.0, 7.125)),
+            } for i in range(200)])
+            db.session.commit()
+            print(f"{years} years: {days * 10} transactions, {years * 12} income months, 200 properties\n")
+
+            timed('full build', lambda: refresh_net_worth(today))
+            timed('already current', lambda: refresh_net_worth(today))
+            for label, day in (('recent change (last month)', today - timedelta(days=30)),
+                               ('old change (20 years ago)', today.replace(year=today.year - 20))):
+                db.session.execute(db.text(
+                    "UPDATE bank_transactions SET amount = amount + 100 WHERE id = "
+                    "(SELECT id FROM bank_transactions WHERE posted_date >= :day ORDER BY posted_date LIMIT 1)"),
+                    {'day': str(day)})
+                db.session.commit()
+                timed(label, lambda: refresh_net_worth(today))
+            incremental = series()
+            timed('full rebuild (check)', rebuild)
+            assert series() == incremental, 'incremental refresh differs from a full rebuild'
+
+            year_ago = today.replace(year=today.year - 1)
+            rows = timed('read 1 year of daily points', lambda: NetWorthPoint.query.filter(
+                NetWorthPoint.granularity == 'day', NetWorthPoint.period >= year_ago).all())
+            print(f"\n{len(incremental)} series rows, {len(rows)} read")
+            db.engine.dispose()
@@ -0,0 +1,88 @@
+# benchmarks/bench_search.py
+###########################################
+# - Benchmark: FTS5 search latency
+#
+# Fills uploaded_file and rental_properties with synthetic records (the FTS
+# index is kept in sync by its triggers), then times services.search.search()
+# for full-word, prefix and multi-term queries.
+#
+# Usage: python benchmarks/bench_search.py [documents] [properties]
+###########################################
+
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from models import db, UploadedFile, RentalProperty
+from services.search import ensure_search_index, search
+
+WORDS = ('invoice receipt lease contract mortgage insurance repair plumbing roof hvac tax assessment '
+         'statement deposit escrow appraisal inspection permit utility water electric gas landscaping '
+         'maple oak cedar pine elm main market river lake hill park austin dallas houston denver').split()
+QUERIES = ('invoice', 'mortg', 'ma', 'plumbing repair', 'oak st', 'lease 2024', 'denv', 'nothingmatches')
+RUNS = 50
+
+def make_vocabulary(rng, size=20000):
+    """
+    Domain words plus random filler words; sampled with Zipf-like weights
+    so, as in real documents, a few terms are common and most are rare.
+    """
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    filler = {''.join(rng.choice(letters) for _ in range(rng.randint(3, 10))) for _ in range(size)}
+    vocabulary = list(WORDS) + sorted(filler - set(WORDS))
+    rng.shuffle(vocabulary)
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+    return vocabulary, cum_weights
+
+def sentence(rng, words, vocabulary=None):
+    if vocabulary is None:
+        return ' '.join(rng.choice(WORDS) for _ in range(words))
+    return ' '.join(rng.choices(vocabulary[0], cum_weights=vocabulary[1], k=words))
+
+def build_app(path, documents, properties):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{path}"
+    db.init_app(app)
+    rng = random.Random(42)
+    vocabulary = make_vocabulary(rng)
+    with app.app_context():
+        db.create_all()
+        ensure_search_index()
+        db.session.execute(db.insert(UploadedFile), [{
+            'filename': f"{rng.choice(WORDS)}_{i}.pdf", 'related_page': 'bench',
+            'notes': sentence(rng, 6, vocabulary),
+            'extracted_text': f"{sentence(rng, 80, vocabulary)} {2000 + i % 25}"
+        } for i in range(documents)])
+        db.session.execute(db.insert(RentalProperty), [{
+            'property_id': f"P-{i}", 'property_name': f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {i}",
+            'address': f"{i} {rng.choice(WORDS).title()} St", 'city': rng.choice(WORDS).title(), 'state': 'TX',
+            'ownership_association': 'LLC', 'loan_number': f"LN-{i:06d}", 'mortgage_broker_name': sentence(rng, 2)
+        } for i in range(properties)])
+        db.session.commit()
+        db.session.execute(db.text("INSERT INTO search_index(search_index) VALUES ('optimize')"))
+        db.session.commit()
+    return app
+
+if __name__ == '__main__':
+    documents = int(sys.argv[1]) if len(sys.argv) > 1 else 40000
+    properties = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        app = build_app(os.path.join(tmp, 'bench.db'), documents, properties)
+        print(f"{documents} documents + {properties} properties indexed in {time.perf_counter() - started:.1f}s\n")
+        with app.app_context():
+            for query in QUERIES:
+                timings = []
+                for _ in range(RUNS):
+                    started = time.perf_counter()
+                    results, total, has_more = search(query, limit=20)
+                    timings.append((time.perf_counter() - started) * 1000)
+                timings.sort()
+                print(f"{query!r:26s} {total:6d} matches  "
+                      f"p50 {timings[len(timings) // 2]:6.2f} ms   p95 {timings[int(len(timings) * 0.95)]:6.2f} ms")
@@ -0,0 +1,101 @@
+# benchmarks/bench_sqlite_concurrency.py
+###########################################
+# - Load test: SQLite read/write concurrency per engine profile
+#
+# Runs reader threads (ledger range scan + yearly sums) next to writer
+# threads (single-row update + commit) against a file database, once with
+# the 'default' profile (rollback journal, no pragmas, stock pool) and once
+# with the 'tuned' profile from services/sqlite_engine.py. Reports
+# throughput, latency percentiles and "database is locked" errors.
+#
+# Usage: python benchmarks/bench_sqlite_concurrency.py [seconds] [readers] [writers]
+###########################################
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, exc, text
+from models import db
+from services.sqlite_engine import sqlite_engine_options, sqlite_pragmas, apply_sqlite_pragmas
+
+ROWS = 20000
+READ_SQL = text(
+    "SELECT year, SUM(gross_pay), SUM(net_pay) FROM income_ledger "
+    "WHERE stream = 'bench' AND year BETWEEN :start AND :start + 20 GROUP BY year"
+)
+WRITE_SQL = text("UPDATE income_ledger SET gross_pay = gross_pay + 1, net_pay = net_pay + 1 WHERE id = :id")
+
+def build_engine(path, profile):
+    engine = create_engine(f"sqlite:///{path}", **sqlite_engine_options(profile))
+    apply_sqlite_pragmas(engine, sqlite_pragmas(profile))
+    return engine
+
+def seed(path):
+    engine = create_engine(f"sqlite:///{path}")
+    db.metadata.create_all(engine, tables=[db.metadata.tables['income_ledger']])
+    with engine.begin() as conn:
+        conn.execute(db.metadata.tables['income_ledger'].insert(), [
+            {'stream': 'bench', 'year': 1000 + i // 12, 'month_index': i % 12 + 1,
+             'gross_pay': 100000 + i, 'taxed_amount': 1000, 'net_pay': 99000 + i}
+            for i in range(ROWS)
+        ])
+    engine.dispose()
+
+def worker(engine, kind, stop, results, seed_value):
+    latencies, errors, n = [], 0, seed_value
+    while not stop.is_set():
+        n = (n * 1103515245 + 12345) % 2**31
+        started = time.perf_counter()
+        try:
+            with engine.connect() as conn:
+                if kind == 'read':
+                    conn.execute(READ_SQL, {'start': 1000 + n % (ROWS // 12 - 20)}).fetchall()
+                else:
+                    conn.execute(WRITE_SQL, {'id': 1 + n % ROWS})
+                    conn.commit()
+            latencies.append(time.perf_counter() - started)
+        except exc.OperationalError:
+            errors += 1 # "database is locked"
+    results.append((kind, latencies, errors))
+
+def percentile(values, pct):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))] * 1000
+
+def run(profile, seconds, readers, writers):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        seed(path)
+        engine = build_engine(path, profile)
+        stop, results = threading.Event(), []
+        threads = [threading.Thread(target=worker, args=(engine, 'read', stop, results, i)) for i in range(readers)]
+        threads += [threading.Thread(target=worker, args=(engine, 'write', stop, results, 1000 + i)) for i in range(writers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+
+    print(f"\n[{profile}] {readers} readers / {writers} writers for {seconds}s")
+    for kind in ('read', 'write'):
+        latencies = [value for k, lats, _ in results if k == kind for value in lats]
+        errors = sum(errs for k, _, errs in results if k == kind)
+        print(f"  {kind:5s}: {len(latencies) / seconds:8.0f} ops/s   "
+              f"p50 {percentile(latencies, 0.50):7.2f} ms   p95 {percentile(latencies, 0.95):7.2f} ms   "
+              f"p99 {percentile(latencies, 0.99):7.2f} ms   locked errors {errors}")
+
+if __name__ == '__main__':
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    writers = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+    for profile in ('default', 'tuned'):
+        run(profile, seconds, readers, writers)
@@ -0,0 +1,67 @@
+# benchmarks/bench_tax_engine.py
+###########################################
+# - Benchmark: 1040 tax engine
+#
+# Computes a what-if grid (every filing status x a range of wages x a few
+# deductions) two ways:
+#   per-bracket loop  : a Python loop over each scenario's brackets, as the page
+#                       used to do in JavaScript (baseline, ordinary tax only)
+#   estimate_batch    : the whole grid in one vectorized call (bracket search + one multiply)
+# checks that both give the same ordinary tax, then times single estimate() calls.
+#
+# Usage: python benchmarks/bench_tax_engine.py [wage steps]
+###########################################
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.tax_engine import (FILING_STATUSES, TABLE_STATUS, TAX_YEARS, estimate, estimate_batch, latest_year,
+                                 tax_tables)
+import numpy as np
+
+def loop_tax(taxable, schedule):
+    tax = 0.0
+    for index, (lower, rate) in enumerate(schedule):
+        upper = schedule[index + 1][0] if index + 1 < len(schedule) else float('inf')
+        if taxable > lower:
+            tax += (min(taxable, upper) - lower) * rate
+    return tax
+
+def timed(label, run):
+    started = time.perf_counter()
+    result = run()
+    print(f"{label:28s} {(time.perf_counter() - started) * 1000:9.1f} ms")
+    return result
+
+if __name__ == '__main__':
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    year = latest_year()
+    figures = TAX_YEARS[year]
+    wages = np.linspace(0, 1000000, steps).round(2) * 100
+    deductions = np.array([np.nan, 2000000, 4000000]) # standard, $20k, $40k itemized
+    status, wage, deduction = (axis.ravel() for axis in np.meshgrid(
+        np.arange(len(FILING_STATUSES)), wages, deductions, indexing='ij'))
+    print(f"{year}: {len(status)} scenarios\n")
+
+    timed('compile tables', lambda: tax_tables(year))
+
+    def loop():
+        taxes = []
+        for row, amount, itemized in zip(status.tolist(), wage.tolist(), deduction.tolist()):
+            name = TABLE_STATUS.get(FILING_STATUSES[row], FILING_STATUSES[row])
+            allowed = figures['standard_deduction'][name] if itemized != itemized else itemized / 100
+            taxes.append(loop_tax(max(amount / 100 - allowed, 0), figures['brackets'][name]))
+        return taxes
+
+    expected = timed('per-bracket loop', loop)
+    result = timed('estimate_batch (one call)', lambda: estimate_batch(year, status, wage, itemized_deduction=deduction))
+    drift = np.abs(result['ordinary_tax'] - np.rint(np.array(expected) * 100)).max()
+    assert drift <= 1, f'ordinary tax differs by {drift} cents'
+
+    inputs = {'year': year, 'filing_status': 'married_jointly', 'wages': '185000', 'capital_gain': '12000',
+              'business_income': '30000', 'dependents': 2}
+    timed('1000 x estimate()', lambda: [estimate(inputs) for _ in range(1000)])
+    print(f"\ntotal tax over the grid: {result['total_tax'].sum() / 100:,.2f}")
@@ -0,0 +1,97 @@
+# benchmarks/bench_transaction_import.py
+###########################################
+# - Benchmark: bank statement import throughput and memory
+#
+# Writes a synthetic multi-year USAA CSV export and an OFX export of the same
+# size, then times services.bank_import.import_statement() for:
+#   first import    : every row is new
+#   re-import       : every row is a duplicate (skipped by the unique dedup key)
+# Peak Python memory (tracemalloc, in a separate untimed pass) is measured for
+# a tenth of the file and for the whole file; it should stay flat as the file grows.
+#
+# Usage: python benchmarks/bench_transaction_import.py [rows]
+###########################################
+
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from models import db, BankTransaction
+from services.bank_import import import_statement
+from datetime import date, timedelta
+
+MERCHANTS = ('HEB #512', 'SHELL OIL 5744', 'AMAZON MKTPLACE', 'STARBUCKS #1188', 'NETFLIX.COM', 'AUSTIN ENERGY',
+             'CITY OF AUSTIN UTIL', 'TRADER JOES', 'COSTCO WHSE', 'UBER TRIP', 'PAYROLL DEPOSIT', 'VENMO')
+
+def write_csv(path, rows, rng):
+    start = date(2018, 1, 1)
+    with open(path, 'w', newline='') as out:
+        out.write('Date,Description,Original Description,Category,Amount,Status\n')
+        for i in range(rows):
+            day = start + timedelta(days=i * 2500 // rows)
+            amount = rng.randrange(100, 250000) / 100
+            merchant = rng.choice(MERCHANTS)
+            sign = '' if merchant == 'PAYROLL DEPOSIT' else '-'
+            out.write(f'{day.isoformat()},{merchant},"{merchant} {rng.randrange(10000)}",Shopping,{sign}{amount:.2f},Posted\n')
+
+def write_ofx(path, rows, rng):
+    start = date(2018, 1, 1)
+    with open(path, 'w') as out:
+        out.write('OFXHEADER:100\nDATA:OFXSGML\nVERSION:102\n\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>\n')
+        for i in range(rows):
+            day = start + timedelta(days=i * 2500 // rows)
+            out.write(f'<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>{day:%Y%m%d}120000<TRNAMT>-{rng.randrange(100, 250000) / 100:.2f}'
+                      f'<FITID>{i:010d}<NAME>{rng.choice(MERCHANTS)}<MEMO>POS PURCHASE</STMTTRN>\n')
+        out.write('</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n')
+
+def timed_import(app, account, path):
+    with app.app_context():
+        started = time.perf_counter()
+        with open(path, 'rb') as stream:
+            log, _ = import_statement(account, stream, filename=os.path.basename(path))
+        db.session.commit()
+        return time.perf_counter() - started, log.inserted, log.duplicates
+
+def peak_memory(app, account, path):
+    with app.app_context():
+        tracemalloc.start()
+        with open(path, 'rb') as stream:
+            import_statement(account, stream, filename=os.path.basename(path))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        db.session.rollback()
+        return peak
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rng = random.Random(3)
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+        files = {'csv': os.path.join(tmp, 'usaa.csv'), 'ofx': os.path.join(tmp, 'usaa.ofx')}
+        write_csv(files['csv'], rows, rng)
+        write_ofx(files['ofx'], rows, rng)
+        small = os.path.join(tmp, 'small.csv')
+        write_csv(small, rows // 10, rng)
+
+        for file_format, account in (('csv', 'usaa'), ('ofx', 'n26')):
+            size_mb = os.path.getsize(files[file_format]) / 1e6
+            for label in ('first import', 're-import'):
+                elapsed, inserted, duplicates = timed_import(app, account, files[file_format])
+                print(f"{file_format} {rows} rows ({size_mb:.1f} MB) {label:13s} {elapsed:6.2f} s  "
+                      f"{rows / elapsed:9.0f} rows/s  (+{inserted}, {duplicates} duplicates)")
+        print()
+        for path, count in ((small, rows // 10), (files['csv'], rows)):
+            print(f"peak memory importing {count:>8} rows: {peak_memory(app, 'scu', path) / 1e6:5.1f} MB")
+        with app.app_context():
+            print(f"\n{BankTransaction.query.count()} transactions stored")
+            db.engine.dispose()
@@ -0,0 +1,104 @@
+# benchmarks/bench_uploads_listing.py
+###########################################
+# - Benchmark: uploaded-file listing latency vs. table size
+#
+# Grows uploaded_file to 1k / 10k / 100k rows while the listed page and the
+# listed property always own the same 50 / 10 files, and times the two
+# listing queries the routes run:
+#   get_files_by_page             : related_page = ? ORDER BY date_uploaded DESC
+#   list_uploaded_files_for_property : files linked to one rental property
+# once without and once with the new indexes. With the indexes the latency
+# should stay flat; without them it grows with the table.
+#
+# Usage: python benchmarks/bench_uploads_listing.py [max_rows]
+###########################################
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from models import db, UploadedFile, DocumentLink
+from services.document_links import files_for_entity_query
+from datetime import datetime, timedelta
+
+PAGE_FILES = 50      # Files on the listed page
+ENTITY_FILES = 10    # Files linked to the listed property
+TARGET_ENTITY = 1
+NEW_INDEXES = ('ix_uploaded_file_related_page_date', 'uq_document_links_entity_file', 'ix_document_links_file_id')
+RUNS = 200
+
+def build_app(path, rows):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{path}"
+    db.init_app(app)
+    rng = random.Random(7)
+    start = datetime(2020, 1, 1)
+    with app.app_context():
+        db.create_all()
+        files = []
+        for i in range(rows):
+            page = 'target' if i % (rows // PAGE_FILES) == 0 else f"page_{rng.randrange(1000)}"
+            files.append({'filename': f"doc_{i}.pdf", 'filetype': 'application/pdf', 'related_page': page,
+                          'notes': '', 'date_uploaded': start + timedelta(minutes=rng.randrange(2_000_000))})
+        rng.shuffle(files) # Insert order unrelated to upload date, as after imports and re-uploads
+        db.session.execute(db.insert(UploadedFile), files)
+        links = [{'file_id': file_id, 'entity_type': 'rental_property',
+                  'entity_id': TARGET_ENTITY if file_id % (rows // ENTITY_FILES) == 0 else 2 + file_id % 5000}
+                 for file_id in range(1, rows + 1)]
+        db.session.execute(db.insert(DocumentLink), links)
+        db.session.commit()
+    return app
+
+def time_query(run):
+    timings = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+def measure(app):
+    with app.app_context():
+        page = time_query(lambda: UploadedFile.query.filter_by(related_page='target')
+                          .order_by(UploadedFile.date_uploaded.desc()).all())
+        entity = time_query(lambda: files_for_entity_query('rental_property', TARGET_ENTITY).all())
+        counts = (UploadedFile.query.filter_by(related_page='target').count(),
+                  files_for_entity_query('rental_property', TARGET_ENTITY).count())
+    return page, entity, counts
+
+def drop_new_indexes(app):
+    with app.app_context():
+        for name in NEW_INDEXES:
+            db.session.execute(db.text(f"DROP INDEX IF EXISTS {name}"))
+        db.session.commit()
+
+def restore_indexes(app):
+    with app.app_context():
+        for table in (UploadedFile.__table__, DocumentLink.__table__):
+            for index in table.indexes:
+                if index.name in NEW_INDEXES:
+                    index.create(db.engine)
+        db.session.execute(db.text("ANALYZE"))
+        db.session.commit()
+
+if __name__ == '__main__':
+    max_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    sizes = [size for size in (1000, 10000, 100000, 1000000) if size <= max_rows]
+    print(f"{'rows':>8}  {'by page: no idx':>16} {'indexed':>9}   {'by property: no idx':>20} {'indexed':>9}")
+    for rows in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            app = build_app(os.path.join(tmp, 'bench.db'), rows)
+            drop_new_indexes(app)
+            page_before, entity_before, counts = measure(app)
+            restore_indexes(app)
+            page_after, entity_after, _ = measure(app)
+            with app.app_context():
+                db.engine.dispose()
+        print(f"{rows:>8}  {page_before:>13.2f} ms {page_after:>6.2f} ms   "
+              f"{entity_before:>17.2f} ms {entity_after:>6.2f} ms   ({counts[0]} / {counts[1]} files listed)")
@@ -4,16 +4,76 @@
 ###########################################
 
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import exc
+from sqlalchemy.schema import CreateColumn
+from services.money import Money
 from datetime import datetime, date
+import calendar
+import logging
 
 # This line allows app.py to initialize db, but models to be defined separately
 db = SQLAlchemy()
 
 #-----------------------------------------
-# Stores USAF Retirement Pay in the same database (database.db) as separate tables.
+# Stores monthly income for every income stream in one table.
+# Streams are registered in services/ledger.py (INCOME_STREAMS).
+#-----------------------------------------
+class IncomeLedgerEntry(db.Model):
+    __tablename__ = 'income_ledger'
+    __table_args__ = (
+        # One row per stream and month; serves per-stream range scans and keyset pagination
+        db.Index('uq_income_ledger_stream_year_month', 'stream', 'year', 'month_index', unique=True),
+        # Serves cross-stream rollups (e.g. total monthly income) in (year, month_index) order
+        db.Index('ix_income_ledger_year_month', 'year', 'month_index'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    stream = db.Column(db.String(50), nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    month_index = db.Column(db.Integer, nullable=False)
+    gross_pay = db.Column(Money, nullable=False) # Integer cents in storage, Decimal in Python
+    taxed_amount = db.Column(Money, nullable=False)
+    net_pay = db.Column(Money, nullable=False)
+
+    @property
+    def month_name(self):
+        """
+        Month name derived from month_index (not stored, to keep rows compact).
+        """
+        return calendar.month_name[self.month_index]
+
+    def to_dict(self):
+        """
+        Converts the model instance to a dictionary, useful for JSON serialization.
+        """
+        return {
+            'id': self.id,
+            'stream': self.stream,
+            'year': self.year,
+            'month_name': self.month_name,
+            'month_index': self.month_index,
+            'gross_pay': self.gross_pay,
+            'taxed_amount': self.taxed_amount,
+            'net_pay': self.net_pay
+        }
+
+    def __repr__(self):
+        """
+        Provides a readable representation of the IncomeLedgerEntry object for debugging.
+        """
+        return (f"<IncomeLedgerEntry(id={self.id}, stream='{self.stream}', year={self.year}, "
+                f"month='{self.month_name}', net_pay={self.net_pay:.2f})>")
+
+#-----------------------------------------
+# LEGACY: USAF Retirement Pay table, superseded by IncomeLedgerEntry (stream 'usaf_retirement').
+# Kept only so services/ledger.migrate_legacy_income_tables() can copy existing rows.
 #-----------------------------------------
 class USAFRetirementPay(db.Model):
     __tablename__ = 'usaf_retirement_pay'
+    __table_args__ = (
+        # One row per month; also supports year-range filters and keyset pagination ordered by (year, month_index)
+        db.Index('uq_usaf_retirement_pay_year_month', 'year', 'month_index', unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     year = db.Column(db.Integer, nullable=False)
@@ -45,10 +105,15 @@ class USAFRetirementPay(db.Model):
                 f"month='{self.month_name}', net_pay={self.net_pay:.2f})>")
     
 #-----------------------------------------
-# Stores VA Disability in the same database (database.db) as separate tables.
+# LEGACY: VA Disability table, superseded by IncomeLedgerEntry (stream 'va_disability').
+# Kept only so services/ledger.migrate_legacy_income_tables() can copy existing rows.
 #-----------------------------------------
 class VADisabilityPay(db.Model):
     __tablename__ = 'va_disability_pay'
+    __table_args__ = (
+        # One row per month; also supports year-range filters and keyset pagination ordered by (year, month_index)
+        db.Index('uq_va_disability_pay_year_month', 'year', 'month_index', unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     year = db.Column(db.Integer, nullable=False)
@@ -84,6 +149,14 @@ class VADisabilityPay(db.Model):
 #-----------------------------------------
 class RentalProperty(db.Model):
     __tablename__ = 'rental_properties'
+    # Portfolio summaries group by these columns; carrying the summed columns too
+    # lets SQLite answer each GROUP BY from the index alone, already in group order
+    __table_args__ = (
+        db.Index('ix_rental_properties_ownership_totals', 'ownership_association', 'purchase_price', 'down_payment', 'interest_rate'),
+        db.Index('ix_rental_properties_state_totals', 'state', 'purchase_price', 'down_payment', 'interest_rate'),
+        db.Index('ix_rental_properties_purchase_date_totals', 'purchase_date', 'purchase_price', 'down_payment', 'interest_rate'),
+    )
+
     id = db.Column(db.Integer, primary_key=True) # Internal database ID
     property_id = db.Column(db.String(50), unique=True, nullable=False) # User-defined unique ID
     property_name = db.Column(db.String(100), nullable=False)
@@ -95,14 +168,19 @@ class RentalProperty(db.Model):
     built_year = db.Column(db.String(50))
     purchase_date = db.Column(db.Date) # Store as Date object
     ownership_association = db.Column(db.String(100), nullable=False)
-    purchase_price = db.Column(db.Float)
-    down_payment = db.Column(db.Float)
+    purchase_price = db.Column(Money) # Integer cents in storage, Decimal in Python
+    down_payment = db.Column(Money)
     interest_rate = db.Column(db.Float)
     mortgage_broker_name = db.Column(db.String(100))
     maturity_date = db.Column(db.Date) # NEW FIELD: Optional
     loan_number = db.Column(db.String(100)) # NEW FIELD: Optional
+    # Optimistic concurrency: every ORM UPDATE sets version = version + 1 WHERE version
+    # still holds the value that was read, and fails (StaleDataError) when it does not
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     # document_path = db.Column(db.String(255)) # Placeholder for future document storage path
 
+    __mapper_args__ = {'version_id_col': version}
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -122,6 +200,7 @@ class RentalProperty(db.Model):
             'mortgage_broker_name': self.mortgage_broker_name,
             'maturity_date': self.maturity_date.isoformat() if self.maturity_date else None, # NEW FIELD
             'loan_number': self.loan_number, # NEW FIELD
+            'version': self.version,
             # 'document_path': self.document_path # Include if implemented
         }
     
@@ -132,14 +211,34 @@ __tablename__ = 'uploaded_files'
 # Stores uploaded files (contracts, receipts, etc.)
 #-----------------------------------------
 class UploadedFile(db.Model):
+    __table_args__ = (
+        # Finds an existing blob (dedup) and counts its remaining references on delete
+        db.Index('ix_uploaded_file_sha256', 'sha256'),
+        # Serves get_files_by_page: equality on related_page, rows already in date order (no sort step)
+        db.Index('ix_uploaded_file_related_page_date', 'related_page', 'date_uploaded'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    filename = db.Column(db.String(255), nullable=False)
+    filename = db.Column(db.String(255), nullable=False) # Original (secured) name, shown to the user
     filetype = db.Column(db.String(50))
     related_page = db.Column(db.String(100))  # e.g., "retirement", "rental_properties"
     notes = db.Column(db.Text)
     date_uploaded = db.Column(db.DateTime, default=datetime.utcnow)
-    related_id = db.Column(db.Integer)  # ✅ This line is missing
+    related_id = db.Column(db.Integer)  # DEPRECATED: kept for old clients; attachments live in DocumentLink
+    sha256 = db.Column(db.String(64)) # Content hash; NULL for files uploaded before content-addressed storage
+    size = db.Column(db.Integer) # Bytes
+    storage_path = db.Column(db.String(255)) # Blob path inside UPLOAD_FOLDER, e.g. "blobs/ab/ab12..."
+    # Filled by the background document jobs (see services/document_jobs.py)
+    processing_status = db.Column(db.String(20)) # pending / processing / done / failed; NULL = never queued
+    thumbnail_path = db.Column(db.String(255)) # JPEG preview inside UPLOAD_FOLDER
+    extracted_text = db.deferred(db.Column(db.Text)) # Deferred: list queries never load document text
 
+    @property
+    def stored_name(self):
+        """
+        Path of the file's bytes inside UPLOAD_FOLDER (legacy rows were saved under their filename).
+        """
+        return self.storage_path or self.filename
 
     def to_dict(self):
         return {
@@ -148,10 +247,324 @@ class UploadedFile(db.Model):
             'filetype': self.filetype,
             'date_uploaded': self.date_uploaded.strftime('%Y-%m-%d %H:%M:%S'),
             'related_page': self.related_page,
-            'notes': self.notes
+            'notes': self.notes,
+            'sha256': self.sha256,
+            'size': self.size,
+            'processing_status': self.processing_status,
+            'has_thumbnail': self.thumbnail_path is not None
         }
 
     def __repr__(self):
         return f"<UploadedFile {self.filename} ({self.related_page})>"
+
+#-----------------------------------------
+# Attaches an uploaded file to any record (many-to-many): one receipt can
+# belong to several properties, and entity ids of different tables never collide.
+# Entity types are registered in services/document_links.py (ENTITY_TYPES).
+#-----------------------------------------
+class DocumentLink(db.Model):
+    __tablename__ = 'document_links'
+    __table_args__ = (
+        # One link per file and record; covers "files of this record" without touching the table
+        db.Index('uq_document_links_entity_file', 'entity_type', 'entity_id', 'file_id', unique=True),
+        # Reverse lookup: records a file is attached to (and cleanup on delete)
+        db.Index('ix_document_links_file_id', 'file_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    file_id = db.Column(db.Integer, db.ForeignKey('uploaded_file.id', ondelete='CASCADE'), nullable=False)
+    entity_type = db.Column(db.String(50), nullable=False) # e.g. 'rental_property'
+    entity_id = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'file_id': self.file_id,
+            'entity_type': self.entity_type,
+            'entity_id': self.entity_id
+        }
+
+    def __repr__(self):
+        return f"<DocumentLink file={self.file_id} -> {self.entity_type}:{self.entity_id}>"
+
+#-----------------------------------------
+# In-progress resumable upload (see services/storage.py); the received bytes
+# live in UPLOAD_FOLDER/tmp/<id>.part until the last chunk arrives.
+#-----------------------------------------
+class UploadSession(db.Model):
+    __tablename__ = 'upload_sessions'
+
+    id = db.Column(db.String(32), primary_key=True) # Random hex token handed to the client
+    filename = db.Column(db.String(255), nullable=False)
+    filetype = db.Column(db.String(50))
+    total_size = db.Column(db.Integer, nullable=False) # Bytes announced by the client
+    related_page = db.Column(db.String(100))
+    related_id = db.Column(db.Integer)
+    notes = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<UploadSession {self.id} {self.filename} ({self.total_size} bytes)>"
+
+#-----------------------------------------
+# Background job for an uploaded document (thumbnail, text extraction).
+# Persisted so queued work survives restarts (see services/document_jobs.py).
+#-----------------------------------------
+class DocumentJob(db.Model):
+    __tablename__ = 'document_jobs'
+    __table_args__ = (
+        # Serves the worker's "next runnable job" claim
+        db.Index('ix_document_jobs_status_run_after', 'status', 'run_after'),
+        # Serves the per-file status rollup
+        db.Index('ix_document_jobs_file_id', 'file_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    file_id = db.Column(db.Integer, nullable=False) # UploadedFile.id
+    kind = db.Column(db.String(30), nullable=False) # 'thumbnail' or 'extract_text'
+    status = db.Column(db.String(20), nullable=False, default='pending') # pending / running / done / failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow) # Retry backoff
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'file_id': self.file_id,
+            'kind': self.kind,
+            'status': self.status,
+            'attempts': self.attempts,
+            'error': self.error,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None,
+            'finished_at': self.finished_at.strftime('%Y-%m-%d %H:%M:%S') if self.finished_at else None
+        }
+
+    def __repr__(self):
+        return f"<DocumentJob {self.id} {self.kind} file={self.file_id} {self.status}>"
+
+#-----------------------------------------
+# One bank or credit card transaction, imported from a statement export.
+# Accounts are registered in services/bank_import.py (BANK_ACCOUNTS).
+#-----------------------------------------
+class BankTransaction(db.Model):
+    __tablename__ = 'bank_transactions'
+    __table_args__ = (
+        # Re-importing an overlapping export skips rows already stored (INSERT ... ON CONFLICT DO NOTHING)
+        db.Index('uq_bank_transactions_account_key', 'account', 'dedup_key', unique=True),
+        # Serves per-account listings newest first, with (posted_date, id) as the keyset cursor
+        db.Index('ix_bank_transactions_account_date', 'account', 'posted_date', 'id'),
+        # Serves spending per category over a date range
+        db.Index('ix_bank_transactions_category_date', 'category', 'posted_date'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    account = db.Column(db.String(50), nullable=False) # Key of BANK_ACCOUNTS, e.g. 'usaa'
+    posted_date = db.Column(db.Date, nullable=False)
+    amount = db.Column(Money, nullable=False) # Signed: negative = money out
+    description = db.Column(db.String(255), nullable=False)
+    memo = db.Column(db.Text)
+    fitid = db.Column(db.String(255)) # Bank-assigned transaction id (OFX exports only)
+    dedup_key = db.Column(db.String(32), nullable=False) # Hashed natural key, see services/bank_import.py
+    import_id = db.Column(db.Integer) # TransactionImport that created the row
+    # Set by services/categorization.py; rules never overwrite a 'manual' category
+    category = db.Column(db.String(50))
+    category_rule_id = db.Column(db.Integer) # CategoryRule that matched (NULL when manual or uncategorized)
+    category_source = db.Column(db.String(10)) # 'rule' / 'manual' / NULL
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'account': self.account,
+            'posted_date': self.posted_date.isoformat(),
+            'amount': self.amount,
+            'description': self.description,
+            'memo': self.memo,
+            'import_id': self.import_id,
+            'category': self.category,
+            'category_source': self.category_source
+        }
+
+    def __repr__(self):
+        return f"<BankTransaction {self.account} {self.posted_date} {self.amount} {self.description!r}>"
+
+#-----------------------------------------
+# Maps a transaction description pattern to a spending category
+# (see services/categorization.py)
+#-----------------------------------------
+class CategoryRule(db.Model):
+    __tablename__ = 'category_rules'
+
+    id = db.Column(db.Integer, primary_key=True)
+    category = db.Column(db.String(50), nullable=False) # e.g. 'Groceries'
+    pattern = db.Column(db.String(255), nullable=False)
+    match_type = db.Column(db.String(10), nullable=False, default='contains') # 'contains' or 'regex'
+    priority = db.Column(db.Integer, nullable=False, default=100) # Lower wins when several rules match
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'category': self.category,
+            'pattern': self.pattern,
+            'match_type': self.match_type,
+            'priority': self.priority
+        }
+
+    def __repr__(self):
+        return f"<CategoryRule {self.id} {self.match_type}:{self.pattern!r} -> {self.category}>"
+
+#-----------------------------------------
+# One statement file imported into bank_transactions, with its row counts
+#-----------------------------------------
+class TransactionImport(db.Model):
+    __tablename__ = 'transaction_imports'
+
+    id = db.Column(db.Integer, primary_key=True)
+    account = db.Column(db.String(50), nullable=False)
+    filename = db.Column(db.String(255))
+    file_format = db.Column(db.String(10)) # 'csv' or 'ofx'
+    rows_read = db.Column(db.Integer, default=0)
+    inserted = db.Column(db.Integer, default=0)
+    duplicates = db.Column(db.Integer, default=0) # Already stored by an earlier import
+    rejected = db.Column(db.Integer, default=0) # Unparseable rows
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'account': self.account,
+            'filename': self.filename,
+            'format': self.file_format,
+            'rows_read': self.rows_read,
+            'inserted': self.inserted,
+            'duplicates': self.duplicates,
+            'rejected': self.rejected,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None
+        }
+
+    def __repr__(self):
+        return f"<TransactionImport {self.id} {self.account} {self.filename} (+{self.inserted})>"
+
+#-----------------------------------------
+# Records one-off data migrations already applied (see services/migrations.py)
+#-----------------------------------------
+class SchemaMigration(db.Model):
+    __tablename__ = 'schema_migrations'
+
+    name = db.Column(db.String(100), primary_key=True)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<SchemaMigration {self.name}>"
+
+#-----------------------------------------
+# Change counter per table, bumped in the same transaction as every write
+# (see services/versioning.py); read endpoints derive their ETag from it.
+#-----------------------------------------
+class TableVersion(db.Model):
+    __tablename__ = 'table_versions'
+
+    table_name = db.Column(db.String(100), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<TableVersion {self.table_name} v{self.version}>"
+
+#-----------------------------------------
+# Append-only log of updated / deleted rows of the tables the analytics
+# snapshot mirrors, written by SQLite triggers (see services/analytics.py).
+# Inserts are not logged: new rows are found by id.
+#-----------------------------------------
+class RowChange(db.Model):
+    __tablename__ = 'row_changes'
+
+    seq = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(100), nullable=False)
+    row_id = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<RowChange {self.seq} {self.table_name}:{self.row_id}>"
+
+#-----------------------------------------
+# Materialized net worth, one row per day and one per month
+# (see services/net_worth.py). Month rows are keyed by the month's first day
+# and hold its last day's values (today's for the current month).
+#-----------------------------------------
+class NetWorthPoint(db.Model):
+    __tablename__ = 'net_worth_series'
+
+    granularity = db.Column(db.String(5), primary_key=True) # 'day' or 'month'
+    period = db.Column(db.Date, primary_key=True)
+    cash = db.Column(Money, nullable=False) # Running balance of the imported bank transactions
+    income = db.Column(Money, nullable=False) # Net pay received so far (income ledger)
+    property_value = db.Column(Money, nullable=False) # Purchase price of the properties owned
+    loan_balance = db.Column(Money, nullable=False) # Outstanding mortgage principal
+    net_worth = db.Column(Money, nullable=False)
+
+    def to_dict(self):
+        return {
+            'period': self.period.isoformat(),
+            'cash': self.cash,
+            'income': self.income,
+            'property_value': self.property_value,
+            'loan_balance': self.loan_balance,
+            'net_worth': self.net_worth
+        }
+
+    def __repr__(self):
+        return f"<NetWorthPoint {self.granularity} {self.period} {self.net_worth}>"
+
+#-----------------------------------------
+# Single row (id 1) tracking how far net_worth_series is built and the
+# earliest date a source change invalidated (set by SQLite triggers).
+#-----------------------------------------
+class NetWorthState(db.Model):
+    __tablename__ = 'net_worth_state'
+
+    id = db.Column(db.Integer, primary_key=True)
+    built_through = db.Column(db.Date) # Last day materialized; NULL = never built
+    dirty_from = db.Column(db.Date) # Earliest day to recompute; NULL = nothing changed
+
+    def __repr__(self):
+        return f"<NetWorthState built_through={self.built_through} dirty_from={self.dirty_from}>"
+
+#-----------------------------------------
+# Add any additional models here as needed
+#-----------------------------------------
+
+#-----------------------------------------
+# Brings an existing database up to date with the models above.
 #-----------------------------------------
-# Add any additional models here as needed
\ No newline at end of file
+def sync_schema():
+    """
+    Creates missing tables, plus any nullable columns and indexes declared on
+    the models that an existing database (created before they were added)
+    does not have yet. Must be called inside an application context.
+    """
+    db.create_all()
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable and column.server_default is None:
+                # SQLite cannot add a NOT NULL column without a default to a populated table
+                logging.getLogger(__name__).warning(f"Cannot add NOT NULL column {table.name}.{column.name}")
+                continue
+            with db.engine.begin() as connection:
+                connection.execute(db.text(
+                    f"ALTER TABLE {table.name} ADD COLUMN {CreateColumn(column).compile(dialect=db.engine.dialect)}"
+                ))
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                try:
+                    index.create(db.engine)
+                except exc.IntegrityError as e:
+                    # A unique index cannot be added while duplicate rows exist; leave them for manual cleanup
+                    logging.getLogger(__name__).warning(f"Could not create index {index.name}: {e}")
\ No newline at end of file
@@ -9,6 +9,7 @@ from .taxes import tax_bp
 from .financial_health import financial_health_bp
 from .uploads import uploads_bp
 from .dashboard import dashboard_bp  # 🆕 NEW: handles index + dashboard-specific routes
+from .search import search_bp
 
 def register_blueprints(app):
     """
@@ -23,4 +24,5 @@ def register_blueprints(app):
     app.register_blueprint(financial_health_bp)
     app.register_blueprint(uploads_bp)
     app.register_blueprint(dashboard_bp)
+    app.register_blueprint(search_bp)
     # 🆕 NEW: Registering the dashboard blueprint for index and dashboard routes
\ No newline at end of file
@@ -3,13 +3,22 @@
 # - Routes for Company Finances
 ###########################################
 
-from flask import Blueprint, render_template, jsonify, request, current_app
-from models import db, RentalProperty, UploadedFile
+from flask import Blueprint, Response, render_template, jsonify, request, stream_with_context
+from models import db, RentalProperty
+from services.money import parse_money, from_cents
+from services.streaming import get_stream_mode, streamed_response
+from services.versioning import conditional_get
+from services.cache import cached_query
+from services.storage import save_upload, discard_new_blobs
+from services.document_links import unlink_entity
+from services.loans import loan_terms, forget_schedule
+from services.property_import import (PropertyImportError, import_properties, export_csv, clean_property_value,
+                                      PROPERTY_COLUMNS, REQUIRED_COLUMNS)
+from sqlalchemy.orm.exc import StaleDataError
 from werkzeug.utils import secure_filename
 from datetime import datetime
 import calendar
 import logging # Import logging for better error messages
-import os
 
 # Create a Blueprint for company finances
 company_bp = Blueprint('company', __name__, url_prefix='/company_finances',
@@ -74,8 +83,87 @@ def rental_properties():
 
 @company_bp.route('/api/rental_properties/data')
 def get_rental_properties_data():
-    properties = RentalProperty.query.order_by(RentalProperty.property_id).all()
-    return jsonify([p.to_dict() for p in properties])
+    """
+    Returns all rental properties ordered by property_id.
+    ?stream=json|ndjson streams them in chunks instead of building the whole list.
+    """
+    try:
+        stream_mode = get_stream_mode(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def build_response():
+        if stream_mode:
+            query = RentalProperty.query.order_by(RentalProperty.property_id)
+            return streamed_response(query, RentalProperty.to_dict, stream_mode)
+        return jsonify(_rental_property_dicts())
+
+    # 304 Not Modified (no property query at all) while the table is unchanged
+    return conditional_get([RentalProperty.__tablename__], build_response)
+
+@cached_query(RentalProperty.__tablename__)
+def _rental_property_dicts():
+    """
+    All properties as dicts ordered by property_id; cached until the table is written.
+    """
+    return [p.to_dict() for p in RentalProperty.query.order_by(RentalProperty.property_id).all()]
+
+#------------------------------------------
+# Portfolio summary: totals per group, aggregated by SQLite
+#------------------------------------------
+SUMMARY_DIMENSIONS = {
+    'ownership_association': RentalProperty.ownership_association,
+    'state': RentalProperty.state,
+    'purchase_year': db.func.substr(RentalProperty.purchase_date, 1, 4), # Dates are stored as 'YYYY-MM-DD'
+}
+
+@company_bp.route('/api/rental_properties/summary')
+def get_rental_properties_summary():
+    """
+    Returns portfolio totals (count, purchase price, down payment, financed amount,
+    interest rates) overall and per group. ?group_by= takes a comma-separated
+    subset of ownership_association, state and purchase_year (default: all three).
+    The weighted interest rate is weighted by the financed amount.
+    """
+    requested = request.args.get('group_by')
+    dimensions = tuple(dict.fromkeys(requested.split(','))) if requested else tuple(SUMMARY_DIMENSIONS)
+    unknown = [name for name in dimensions if name not in SUMMARY_DIMENSIONS]
+    if unknown:
+        return jsonify({"error": f"Unknown group_by: {', '.join(unknown)}. "
+                                 f"Expected: {', '.join(SUMMARY_DIMENSIONS)}"}), 400
+    return conditional_get([RentalProperty.__tablename__], lambda: jsonify(_portfolio_summary(dimensions)))
+
+@cached_query(RentalProperty.__tablename__)
+def _portfolio_summary(dimensions):
+    """
+    One GROUP BY per dimension plus the overall totals; cached until the table is written.
+    """
+    # Raw integer cents: Python only converts the sums
+    price = db.func.coalesce(db.type_coerce(RentalProperty.purchase_price, db.Integer), 0)
+    down = db.func.coalesce(db.type_coerce(RentalProperty.down_payment, db.Integer), 0)
+    financed = db.func.max(price - down, 0)
+    rated = db.case((RentalProperty.interest_rate.is_not(None), financed), else_=0)
+    aggregates = (db.func.count(RentalProperty.id), db.func.sum(price), db.func.sum(down), db.func.sum(financed),
+                  db.func.sum(RentalProperty.interest_rate * financed), db.func.sum(rated),
+                  db.func.avg(RentalProperty.interest_rate))
+
+    def totals(row):
+        count, price_sum, down_sum, financed_sum, rate_weight, rated_sum, average_rate = row
+        return {
+            'count': count,
+            'purchase_price': from_cents(price_sum or 0),
+            'down_payment': from_cents(down_sum or 0),
+            'financed': from_cents(financed_sum or 0),
+            'weighted_interest_rate': round(rate_weight / rated_sum, 4) if rated_sum else None,
+            'average_interest_rate': round(average_rate, 4) if average_rate is not None else None
+        }
+
+    summary = {'totals': totals(db.session.query(*aggregates).one()), 'groups': {}}
+    for name in dimensions:
+        key = SUMMARY_DIMENSIONS[name].label(name)
+        rows = db.session.query(key, *aggregates).group_by(key).order_by(key).all()
+        summary['groups'][name] = [{name: row[0], **totals(row[1:])} for row in rows]
+    return summary
 
 @company_bp.route('/api/rental_properties/add', methods=['POST'])
 def add_rental_property():
@@ -101,8 +189,8 @@ def add_rental_property():
             built_year=int(data.get('built_year') or 0),
             purchase_date=purchase_date,
             ownership_association=data.get('ownership_association'),
-            purchase_price=float(data.get('purchase_price') or 0),
-            down_payment=float(data.get('down_payment') or 0),
+            purchase_price=parse_money(data.get('purchase_price') or 0),
+            down_payment=parse_money(data.get('down_payment') or 0),
             interest_rate=float(data.get('interest_rate') or 0),
             mortgage_broker_name=data.get('mortgage_broker_name'),
             maturity_date=maturity_date,
@@ -113,29 +201,63 @@ def add_rental_property():
 
         # --- FILE UPLOAD LOGIC ---
         if file:
-            filename = secure_filename(file.filename)
-            save_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-            file.save(save_path)
-
-            # Create the link in the database
-            uploaded_file = UploadedFile(
-                filename=filename,
-                filetype=file.content_type,
+            # Stored content-addressed; creates the link in the database
+            save_upload(
+                file,
                 related_page='rental_properties',
-                notes=notes,
-                related_id=new_property.id  # This is the crucial link!
+                related_id=new_property.id,  # This is the crucial link!
+                notes=notes
             )
-            db.session.add(uploaded_file)
             db.session.commit()
 
         return jsonify({"message": "Property added successfully!", "property": new_property.to_dict()}), 201
 
     except Exception as e:
         db.session.rollback()
+        discard_new_blobs()
         company_bp.logger.error(f"Error adding property: {e}", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
 
+@company_bp.route('/api/rental_properties/import', methods=['POST'])
+def import_rental_properties():
+    """
+    Bulk-creates properties from a CSV or JSON/NDJSON file (multipart field 'file'),
+    with the columns of the export. The optional 'format' field ('csv' or 'json')
+    overrides detection; 'atomic' = 'true' imports nothing if any row is rejected.
+    Returns the per-row error report.
+    """
+    file = request.files.get('file')
+    if not file or not file.filename:
+        return jsonify({"error": "No file provided"}), 400
+    atomic = request.form.get('atomic', '').lower() in ('1', 'true', 'yes')
+
+    try:
+        report = import_properties(file.stream, filename=secure_filename(file.filename),
+                                   file_format=request.form.get('format') or None, atomic=atomic)
+        db.session.commit()
+    except PropertyImportError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        company_bp.logger.error(f"Error importing properties from {file.filename}: {e}", exc_info=True)
+        return jsonify({"error": "Failed to import properties"}), 500
+
+    company_bp.logger.info(f"Property import {file.filename}: {report['inserted']} added, {report['rejected']} rejected.")
+    if atomic and report['rejected']:
+        return jsonify({"error": f"{report['rejected']} rows rejected; nothing was imported", **report}), 400
+    return jsonify({"message": f"{report['inserted']} properties imported", **report}), 200
+
+@company_bp.route('/api/rental_properties/export')
+def export_rental_properties():
+    """
+    Streams every property as a CSV file (re-importable through the import endpoint).
+    """
+    response = Response(stream_with_context(export_csv()), mimetype='text/csv')
+    response.headers['Content-Disposition'] = 'attachment; filename=rental_properties.csv'
+    return response
+
 @company_bp.route('/api/rental_properties/update/<int:property_db_id>', methods=['PUT'])
 def update_rental_property(property_db_id):
     data = request.json
@@ -144,6 +266,7 @@ def update_rental_property(property_db_id):
     if not property_to_update:
         return jsonify({"error": "Property not found"}), 404
 
+    old_terms = loan_terms(property_to_update)
     try:
         property_to_update.property_name = data.get('property_name')
         property_to_update.address = data.get('address')
@@ -156,8 +279,8 @@ def update_rental_property(property_db_id):
         property_to_update.purchase_date = datetime.strptime(purchase_date_str, '%Y-%m-%d').date() if purchase_date_str else None
 
         property_to_update.ownership_association = data.get('ownership_association')
-        property_to_update.purchase_price = data.get('purchase_price')
-        property_to_update.down_payment = data.get('down_payment')
+        property_to_update.purchase_price = _optional_money(data.get('purchase_price'))
+        property_to_update.down_payment = _optional_money(data.get('down_payment'))
         property_to_update.interest_rate = data.get('interest_rate')
         property_to_update.mortgage_broker_name = data.get('mortgage_broker_name') if data.get('mortgage_broker_name') else None
         
@@ -167,12 +290,102 @@ def update_rental_property(property_db_id):
         property_to_update.loan_number = data.get('loan_number') if data.get('loan_number') else None
 
         db.session.commit()
+        if loan_terms(property_to_update) != old_terms:
+            forget_schedule(old_terms) # The next read amortizes the new terms
         return jsonify({"message": f"Property {property_to_update.property_id} updated successfully!"}), 200
     except Exception as e:
         db.session.rollback()
         company_bp.logger.error(f"Error updating rental property {property_db_id}: {e}", exc_info=True)
         return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
 
+#------------------------------------------
+# Single property: GET with its ETag, PATCH guarded by If-Match
+#------------------------------------------
+# The ETag is the row's version column; PATCH requires it back in If-Match
+# ('*' accepts any version), so an edit made from a stale copy gets 412 instead
+# of silently overwriting the newer one. Only the fields present in the body
+# are parsed, and only those that differ go into the UPDATE.
+PATCHABLE_COLUMNS = tuple(column for column in PROPERTY_COLUMNS if column != 'property_id')
+
+def _property_response(rental_property, status=200, **extra):
+    response = jsonify({**extra, 'property': rental_property.to_dict()})
+    response.status_code = status
+    response.set_etag(str(rental_property.version))
+    return response
+
+@company_bp.route('/api/rental_properties/<int:property_db_id>', methods=['GET'])
+def get_rental_property(property_db_id):
+    rental_property = db.session.get(RentalProperty, property_db_id)
+    if not rental_property:
+        return jsonify({"error": "Property not found"}), 404
+    return _property_response(rental_property)
+
+@company_bp.route('/api/rental_properties/<int:property_db_id>', methods=['PATCH'])
+def patch_rental_property(property_db_id):
+    """
+    Partial update: the JSON body holds only the fields to change
+    (property_id cannot be changed; null or '' clears an optional field).
+    Requires If-Match with the property's ETag; 412 with the current property when it is stale.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data:
+        return jsonify({"error": "Expected a JSON object with the fields to change"}), 400
+
+    rental_property = db.session.get(RentalProperty, property_db_id)
+    if not rental_property:
+        return jsonify({"error": "Property not found"}), 404
+    if not request.if_match:
+        return jsonify({"error": "If-Match header required (the property's ETag)"}), 428
+    if not request.if_match.star_tag and not request.if_match.contains(str(rental_property.version)):
+        return _property_response(rental_property, 412, error="Property was modified since it was read")
+
+    if 'property_id' in data and str(data['property_id']).strip() != rental_property.property_id:
+        return jsonify({"error": "property_id cannot be changed"}), 400
+    unknown = sorted(set(data) - set(PATCHABLE_COLUMNS) - {'property_id'})
+    if unknown:
+        return jsonify({"error": f"Unknown fields: {', '.join(unknown)}"}), 400
+
+    changes, errors = {}, []
+    for column in PATCHABLE_COLUMNS:
+        if column not in data:
+            continue
+        try:
+            value = clean_property_value(column, data[column])
+        except ValueError as e:
+            errors.append(str(e))
+            continue
+        if value is None and column in REQUIRED_COLUMNS:
+            errors.append(f'{column} is required')
+        elif value != getattr(rental_property, column):
+            changes[column] = value
+    if errors:
+        return jsonify({"error": '; '.join(errors), "errors": errors}), 400
+    if not changes:
+        return _property_response(rental_property, message="No changes", changed=[])
+
+    old_terms = loan_terms(rental_property)
+    try:
+        for column, value in changes.items():
+            setattr(rental_property, column, value)
+        # UPDATE ... SET <changed columns>, version = version + 1 WHERE id = ? AND version = ?
+        db.session.commit()
+    except StaleDataError:
+        # Another request committed between our read and our write
+        db.session.rollback()
+        current = db.session.get(RentalProperty, property_db_id)
+        if not current:
+            return jsonify({"error": "Property not found"}), 404
+        return _property_response(current, 412, error="Property was modified since it was read")
+    except Exception as e:
+        db.session.rollback()
+        company_bp.logger.error(f"Error patching rental property {property_db_id}: {e}", exc_info=True)
+        return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
+
+    if loan_terms(rental_property) != old_terms:
+        forget_schedule(old_terms) # The next read amortizes the new terms
+    return _property_response(rental_property, message=f"Property {rental_property.property_id} updated successfully!",
+                              changed=sorted(changes))
+
 @company_bp.route('/api/rental_properties/delete', methods=['POST'])
 def delete_rental_property():
     print("DEBUG: delete_rental_property route hit!") # DEBUG PRINT STATEMENT
@@ -184,12 +397,23 @@ def delete_rental_property():
     property_to_delete = RentalProperty.query.get(db_id) 
     if property_to_delete:
         try:
+            unlink_entity('rental_property', property_to_delete.id) # Its documents stay, unattached
+            terms = loan_terms(property_to_delete)
             db.session.delete(property_to_delete)
             db.session.commit()
+            forget_schedule(terms)
             return jsonify({"message": f"Property {property_to_delete.property_id} deleted successfully!"}), 200
         except Exception as e:
             db.session.rollback()
             company_bp.logger.error(f"Error deleting rental property {db_id}: {e}", exc_info=True)
             return jsonify({"error": str(e)}), 500
     # FIX: Changed error message to reflect looking for DB ID
-    return jsonify({"error": f"Property with database ID {db_id} not found"}), 404
\ No newline at end of file
+    return jsonify({"error": f"Property with database ID {db_id} not found"}), 404
+
+def _optional_money(value):
+    """
+    Parses an optional money field; missing or blank values become None.
+    """
+    if value is None or value == '':
+        return None
+    return parse_money(value)
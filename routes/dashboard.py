@@ -3,7 +3,8 @@
 # - Routes for Dashboard and Root Pages
 ###########################################
 
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, jsonify
+from services.cache import query_cache
 
 dashboard_bp = Blueprint('dashboard', __name__, url_prefix='')
 
@@ -20,3 +21,10 @@ def upload_test():
     Temporary route to test file upload interface.
     """
     return render_template('html/includes/upload_test.html')
+
+@dashboard_bp.route('/api/cache/stats')
+def cache_stats():
+    """
+    Hit/miss counters of the in-process query cache, for monitoring.
+    """
+    return jsonify(query_cache.stats())
@@ -3,11 +3,27 @@
 # - Routes for Financial Health
 ###########################################
 
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, jsonify, request
+from models import db, BankTransaction, CategoryRule, NetWorthPoint, RentalProperty
+from services.categorization import validate_rule, recategorize
+from services.analytics import GRANULARITIES, MAX_WINDOW, YEAR_RANGE, MAX_YEAR_SPAN, income_series, \
+    cash_flow_series, property_acquisitions, overview
+from services.net_worth import COLUMNS as NET_WORTH_COLUMNS, refresh_net_worth
+from services.loans import loan_terms, get_schedules, portfolio_series
+from services.cache import cached_query
+from services.versioning import conditional_get
+from services.money import format_money, from_cents
+from datetime import date
+import logging
+import re
+import numpy as np
 
 # Create a Blueprint for financial health
 financial_health_bp = Blueprint('financial_health', __name__, url_prefix='/financial_health')
 
+# Configure logger for this blueprint
+financial_health_bp.logger = logging.getLogger(__name__)
+
 @financial_health_bp.route('/personal_finances')
 def personal_finances_overview():
     """
@@ -76,4 +92,399 @@ def financial_education():
     """
     Renders the financial education resources page.
     """
-    return render_template('html/financial_health/financial_education.html')
\ No newline at end of file
+    return render_template('html/financial_health/financial_education.html')
+
+#------------------------------------------
+#-------- Category Rules API --------------
+# Rules categorize bank transactions (see services/categorization.py).
+# Every change re-categorizes the affected transactions in the same transaction.
+#------------------------------------------
+@financial_health_bp.route('/api/category_rules', methods=['GET'])
+def list_category_rules():
+    """
+    API endpoint listing the category rules, strongest first.
+    """
+    rules = CategoryRule.query.order_by(CategoryRule.priority, CategoryRule.id).all()
+    return jsonify([rule.to_dict() for rule in rules])
+
+@financial_health_bp.route('/api/category_rules', methods=['POST'])
+def add_category_rule():
+    """
+    API endpoint to add a rule. Expects JSON {'category', 'pattern', 'match_type'?, 'priority'?}.
+    """
+    try:
+        fields = validate_rule(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    rule = CategoryRule(**fields)
+    db.session.add(rule)
+    return _commit_rule_change(rule, 'add', 'added', lambda: [rule.id], 201)
+
+@financial_health_bp.route('/api/category_rules/<int:rule_id>', methods=['PUT'])
+def update_category_rule(rule_id):
+    """
+    API endpoint to change some fields of a rule.
+    """
+    rule = db.session.get(CategoryRule, rule_id)
+    if not rule:
+        return jsonify({'error': 'Rule not found'}), 404
+    try:
+        fields = validate_rule(request.get_json(silent=True), partial=True)
+        if fields.get('match_type', rule.match_type) == 'regex' and 'pattern' not in fields:
+            validate_rule({'pattern': rule.pattern, 'match_type': 'regex'}, partial=True)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    for field, value in fields.items():
+        setattr(rule, field, value)
+    return _commit_rule_change(rule, 'update', 'updated', lambda: [rule_id], 200)
+
+@financial_health_bp.route('/api/category_rules/<int:rule_id>', methods=['DELETE'])
+def delete_category_rule(rule_id):
+    """
+    API endpoint to delete a rule; the rows it categorized fall back to the other rules.
+    """
+    rule = db.session.get(CategoryRule, rule_id)
+    if not rule:
+        return jsonify({'error': 'Rule not found'}), 404
+    db.session.delete(rule)
+    return _commit_rule_change(rule, 'delete', 'deleted', lambda: [rule_id], 200)
+
+@financial_health_bp.route('/api/category_rules/apply', methods=['POST'])
+def apply_category_rules():
+    """
+    API endpoint re-running every rule over all transactions not categorized by hand.
+    """
+    try:
+        updated = recategorize()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        financial_health_bp.logger.error(f"Failed to re-apply category rules: {e}", exc_info=True)
+        return jsonify({'error': 'Failed to re-apply category rules'}), 500
+    return jsonify({'message': f'{updated} transactions re-categorized', 'updated': updated})
+
+def _commit_rule_change(rule, action, done, changed_ids, status):
+    """
+    Flushes a rule change, re-categorizes the rows it affects and commits both together.
+    action / done name the change ('add' / 'added') in messages.
+    changed_ids is called after the flush, so a new rule already has its id.
+    """
+    try:
+        db.session.flush()
+        updated = recategorize(changed_ids())
+        db.session.commit()
+    except re.error as e:
+        # The rule set no longer compiles as a whole; refuse the change rather than break every import
+        db.session.rollback()
+        return jsonify({'error': f'Invalid regex rule set: {e}'}), 400
+    except Exception as e:
+        db.session.rollback()
+        financial_health_bp.logger.error(f"Failed to {action} category rule: {e}", exc_info=True)
+        return jsonify({'error': f'Failed to {action} category rule'}), 500
+    financial_health_bp.logger.info(f"Category rule {rule.id} {done}; {updated} transactions re-categorized.")
+    return jsonify({'rule': rule.to_dict(), 'recategorized': updated}), status
+
+#------------------------------------------
+#-------- Spending by Category ------------
+#------------------------------------------
+@financial_health_bp.route('/api/expenses/by_category', methods=['GET'])
+def expenses_by_category():
+    """
+    API endpoint summing money out (negative amounts) per category, optionally
+    limited with 'date_from'/'date_to' (YYYY-MM-DD) and 'account'.
+    Uncategorized spending is reported under category null.
+    """
+    try:
+        date_from = date.fromisoformat(request.args['date_from']) if request.args.get('date_from') else None
+        date_to = date.fromisoformat(request.args['date_to']) if request.args.get('date_to') else None
+    except ValueError:
+        return jsonify({'error': 'date_from and date_to must be YYYY-MM-DD dates'}), 400
+    account = request.args.get('account') or None
+    return conditional_get([BankTransaction.__tablename__],
+                           lambda: jsonify(_spending_by_category(date_from, date_to, account)))
+
+@cached_query(BankTransaction.__tablename__)
+def _spending_by_category(date_from, date_to, account):
+    """
+    One GROUP BY over the transactions; cached until they are written.
+    """
+    query = (db.session.query(BankTransaction.category,
+                              db.func.count(BankTransaction.id),
+                              db.func.sum(BankTransaction.amount))
+             .filter(BankTransaction.amount < 0))
+    if date_from is not None:
+        query = query.filter(BankTransaction.posted_date >= date_from)
+    if date_to is not None:
+        query = query.filter(BankTransaction.posted_date <= date_to)
+    if account is not None:
+        query = query.filter(BankTransaction.account == account)
+    rows = query.group_by(BankTransaction.category).all()
+    # Largest spending first; amounts are negative, so flip them to positive totals
+    return [{'category': category, 'transactions': count, 'total_spent': format_money(-total)}
+            for category, count, total in sorted(rows, key=lambda row: row[2])]
+
+#------------------------------------------
+#-------- Dashboard Analytics -------------
+# Rollups computed from the in-memory column snapshot (services/analytics.py).
+# Series come back column-wise: 'periods' plus one list per measure, aligned
+# with it, ready to hand to a chart. Money values are fixed-point strings.
+#------------------------------------------
+def _year_range():
+    """
+    Reads the optional 'year_from'/'year_to'. Returns ((year_from, year_to), None)
+    or (None, error response). The years must lie within YEAR_RANGE, in order and
+    at most MAX_YEAR_SPAN apart, since the series are built for every period between them.
+    """
+    try:
+        years = [int(request.args[key]) if request.args.get(key) else None for key in ('year_from', 'year_to')]
+    except ValueError:
+        return None, (jsonify({'error': 'year_from and year_to must be integers'}), 400)
+    if any(year is not None and not YEAR_RANGE[0] <= year <= YEAR_RANGE[1] for year in years):
+        return None, (jsonify({'error': f'year_from and year_to must be between {YEAR_RANGE[0]} and {YEAR_RANGE[1]}'}), 400)
+    year_from, year_to = years
+    if year_from is not None and year_to is not None:
+        if year_from > year_to:
+            return None, (jsonify({'error': 'year_from must not be after year_to'}), 400)
+        if year_to - year_from >= MAX_YEAR_SPAN:
+            return None, (jsonify({'error': f'At most {MAX_YEAR_SPAN} years can be requested at once'}), 400)
+    return (year_from, year_to), None
+
+def _analytics_args():
+    """
+    Reads 'granularity' (month/year), 'window' (moving average periods) and
+    'year_from'/'year_to'. Returns (args, None) or (None, error response).
+    """
+    granularity = request.args.get('granularity', 'month')
+    if granularity not in GRANULARITIES:
+        return None, (jsonify({'error': f"granularity must be one of: {', '.join(GRANULARITIES)}"}), 400)
+    try:
+        window = int(request.args.get('window', 3))
+    except ValueError:
+        return None, (jsonify({'error': 'window must be an integer'}), 400)
+    if not 1 <= window <= MAX_WINDOW:
+        return None, (jsonify({'error': f'window must be between 1 and {MAX_WINDOW}'}), 400)
+    years, error = _year_range()
+    if error:
+        return None, error
+    return {'granularity': granularity, 'window': window, 'year_from': years[0], 'year_to': years[1]}, None
+
+@financial_health_bp.route('/api/analytics/income', methods=['GET'])
+def analytics_income():
+    """
+    API endpoint for income per month/year (all streams or 'stream') with the
+    net pay's moving average and year-over-year change.
+    """
+    args, error = _analytics_args()
+    if error:
+        return error
+    stream = request.args.get('stream') or None
+    return conditional_get(['income_ledger'], lambda: jsonify(income_series(stream=stream, **args)))
+
+@financial_health_bp.route('/api/analytics/cash_flow', methods=['GET'])
+def analytics_cash_flow():
+    """
+    API endpoint for bank money in/out per month/year, optionally for one
+    'account' and/or 'category' (empty category = uncategorized), with spending
+    trends and spending per category over the range.
+    """
+    args, error = _analytics_args()
+    if error:
+        return error
+    account = request.args.get('account') or None
+    category = request.args.get('category')
+    return conditional_get([BankTransaction.__tablename__],
+                           lambda: jsonify(cash_flow_series(account=account, category=category, **args)))
+
+@financial_health_bp.route('/api/analytics/properties', methods=['GET'])
+def analytics_properties():
+    """
+    API endpoint for rental property acquisitions per purchase year with running totals.
+    """
+    return conditional_get(['rental_properties'], lambda: jsonify(property_acquisitions()))
+
+@financial_health_bp.route('/api/analytics/overview', methods=['GET'])
+def analytics_overview():
+    """
+    API endpoint for the overview dashboards: trailing-twelve-month income,
+    money in and spending against the year before, and property totals.
+    """
+    # No ETag: the trailing window moves with the calendar even when no table changes
+    return jsonify(overview())
+
+#------------------------------------------
+#-------- Net Worth Series ----------------
+# Served from the materialized net_worth_series table (services/net_worth.py),
+# refreshed from the earliest changed day before each read.
+#------------------------------------------
+@financial_health_bp.route('/api/net_worth', methods=['GET'])
+def net_worth_history():
+    """
+    API endpoint for the net worth series, column-wise: 'granularity' (day/month,
+    default month) and an optional 'date_from'/'date_to' (YYYY-MM-DD) range.
+    """
+    granularity = request.args.get('granularity', 'month')
+    if granularity not in ('day', 'month'):
+        return jsonify({'error': 'granularity must be one of: day, month'}), 400
+    try:
+        date_from = date.fromisoformat(request.args['date_from']) if request.args.get('date_from') else None
+        date_to = date.fromisoformat(request.args['date_to']) if request.args.get('date_to') else None
+    except ValueError:
+        return jsonify({'error': 'date_from and date_to must be YYYY-MM-DD dates'}), 400
+
+    try:
+        refresh_net_worth()
+    except Exception as e:
+        # Serve the last materialized series rather than failing the chart
+        db.session.rollback()
+        financial_health_bp.logger.error(f"Failed to refresh the net worth series: {e}", exc_info=True)
+    return conditional_get([NetWorthPoint.__tablename__],
+                           lambda: jsonify(_load_net_worth(granularity, date_from, date_to)))
+
+@cached_query(NetWorthPoint.__tablename__)
+def _load_net_worth(granularity, date_from, date_to):
+    """
+    Primary-key range read of the series; money as fixed-point strings.
+    """
+    query = db.session.query(NetWorthPoint.period, *[getattr(NetWorthPoint, column) for column in NET_WORTH_COLUMNS])
+    query = query.filter(NetWorthPoint.granularity == granularity)
+    if date_from is not None:
+        query = query.filter(NetWorthPoint.period >= date_from)
+    if date_to is not None:
+        query = query.filter(NetWorthPoint.period <= date_to)
+    rows = query.order_by(NetWorthPoint.period).all()
+    series = {'granularity': granularity, 'periods': [row[0].isoformat() for row in rows]}
+    for index, column in enumerate(NET_WORTH_COLUMNS, start=1):
+        series[column] = [format_money(row[index]) for row in rows]
+    return series
+
+#------------------------------------------
+#-------- Rental Property Loans -----------
+# Mortgage schedules come from services/loans.py, cached by loan terms.
+#------------------------------------------
+def _cents(value):
+    return format_money(from_cents(int(value)))
+
+def _financed_properties():
+    """
+    [(property, schedule)] for every property with a financed purchase, plus the
+    property_ids without one.
+    """
+    properties = RentalProperty.query.order_by(RentalProperty.property_id).all()
+    terms = [loan_terms(rental_property) for rental_property in properties]
+    financed = [(rental_property, loan) for rental_property, loan in zip(properties, terms) if loan]
+    schedules = get_schedules([loan for _, loan in financed])
+    return ([(rental_property, schedule) for (rental_property, _), schedule in zip(financed, schedules)],
+            [rental_property.property_id for rental_property, loan in zip(properties, terms) if not loan])
+
+@financial_health_bp.route('/api/loans', methods=['GET'])
+def loans_summary():
+    """
+    API endpoint for each property's mortgage position on 'as_of' (YYYY-MM-DD,
+    default today) and the portfolio totals.
+    """
+    try:
+        as_of = date.fromisoformat(request.args['as_of']) if request.args.get('as_of') else date.today()
+    except ValueError:
+        return jsonify({'error': 'as_of must be a YYYY-MM-DD date'}), 400
+
+    financed, without_loan = _financed_properties()
+    loans = []
+    totals = {'original_principal': 0, 'outstanding_principal': 0, 'interest_paid': 0,
+              'remaining_interest': 0, 'monthly_payment': 0}
+    for rental_property, schedule in financed:
+        made = schedule.payments_made(as_of)
+        figures = {
+            'original_principal': schedule.terms.principal,
+            'outstanding_principal': schedule.balance[made],
+            'interest_paid': schedule.interest_paid[made],
+            'remaining_interest': schedule.interest_paid[-1] - schedule.interest_paid[made],
+            # Only loans still being repaid count towards the portfolio's monthly payment
+            'monthly_payment': schedule.monthly_payment if made < schedule.terms.term_months else 0,
+        }
+        for key, value in figures.items():
+            totals[key] += int(value)
+        loans.append({
+            'id': rental_property.id,
+            'property_id': rental_property.property_id,
+            'property_name': rental_property.property_name,
+            'loan_number': rental_property.loan_number,
+            'interest_rate': schedule.terms.annual_rate,
+            'term_months': schedule.terms.term_months,
+            'first_payment': str(schedule.due[0]),
+            'payoff_date': str(schedule.due[-1]),
+            'payments_made': made,
+            **{key: _cents(value) for key, value in figures.items()},
+            'monthly_payment': _cents(schedule.monthly_payment),
+        })
+    return jsonify({'as_of': as_of.isoformat(), 'loans': loans,
+                    'totals': {'loans': len(loans), **{key: _cents(value) for key, value in totals.items()}},
+                    'without_loan': without_loan})
+
+@financial_health_bp.route('/api/loans/<int:property_db_id>/schedule', methods=['GET'])
+def loan_schedule(property_db_id):
+    """
+    API endpoint for the full amortization schedule of one property, column-wise.
+    """
+    def build_response():
+        rental_property = db.session.get(RentalProperty, property_db_id)
+        if not rental_property:
+            return jsonify({'error': 'Property not found'}), 404
+        terms = loan_terms(rental_property)
+        if terms is None:
+            return jsonify({'error': 'Property has no financed purchase (purchase date, price and down payment)'}), 404
+        schedule = get_schedules([terms])[0]
+        return jsonify({
+            'property_id': rental_property.property_id,
+            'principal': _cents(terms.principal),
+            'interest_rate': terms.annual_rate,
+            'term_months': terms.term_months,
+            'monthly_payment': _cents(schedule.monthly_payment),
+            'total_interest': _cents(schedule.interest_paid[-1]),
+            'due': schedule.due.astype(str).tolist(),
+            'interest': [_cents(value) for value in schedule.interest.tolist()],
+            'principal_paid': [_cents(value) for value in schedule.principal.tolist()],
+            'balance': [_cents(value) for value in schedule.balance[1:].tolist()],
+        })
+
+    return conditional_get([RentalProperty.__tablename__], build_response)
+
+@financial_health_bp.route('/api/loans/portfolio', methods=['GET'])
+def loans_portfolio():
+    """
+    API endpoint for outstanding principal (at period end) and interest / principal
+    paid per month or year across every mortgage, optionally within 'year_from'/'year_to'.
+    """
+    granularity = request.args.get('granularity', 'month')
+    if granularity not in ('month', 'year'):
+        return jsonify({'error': 'granularity must be one of: month, year'}), 400
+    years, error = _year_range() # Bounded: portfolio_series builds a (loans x months) grid over the range
+    if error:
+        return error
+    year_from, year_to = years
+
+    def build_response():
+        financed, _ = _financed_properties()
+        months, outstanding, interest, paid_down = portfolio_series(
+            [schedule for _, schedule in financed],
+            np.datetime64(f'{year_from:04d}-01') if year_from is not None else None,
+            np.datetime64(f'{year_to:04d}-12') if year_to is not None else None)
+        if granularity == 'year' and len(months):
+            years = months.astype('datetime64[Y]')
+            starts = np.flatnonzero(np.concatenate([[True], years[1:] != years[:-1]]))
+            ends = np.concatenate([starts[1:], [len(months)]]) - 1
+            periods = years[starts].astype(str).tolist()
+            outstanding = outstanding[ends]
+            interest, paid_down = np.add.reduceat(interest, starts), np.add.reduceat(paid_down, starts)
+        else:
+            periods = months.astype(str).tolist()
+        return jsonify({
+            'granularity': granularity,
+            'periods': periods,
+            'outstanding_principal': [_cents(value) for value in outstanding.tolist()],
+            'interest_paid': [_cents(value) for value in interest.tolist()],
+            'principal_paid': [_cents(value) for value in paid_down.tolist()],
+        })
+
+    return conditional_get([RentalProperty.__tablename__], build_response)
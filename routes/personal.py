@@ -4,8 +4,17 @@
 ###########################################
 
 from flask import Blueprint, render_template, jsonify, request
-from models import db, USAFRetirementPay, VADisabilityPay
-from datetime import datetime
+from models import db, IncomeLedgerEntry, BankTransaction, TransactionImport
+from services.ledger import get_income_stream
+from services.bank_import import BANK_ACCOUNTS, StatementError, get_bank_account, import_statement
+from services.categorization import load_matcher
+from services.seeding import ensure_pay_calendar
+from services.streaming import get_stream_mode, streamed_response
+from services.versioning import conditional_get
+from services.cache import cached_query
+from datetime import date
+from werkzeug.utils import secure_filename
+from services.money import ZERO, parse_money, format_money
 import calendar
 import logging # Import logging for better error messages
 
@@ -55,6 +64,198 @@ def capital_one():
     """
     return render_template('html/personal_finances/credit_card/capital_one.html')
 
+#------------------------------------------
+#--- API Endpoints for Account Statements --
+# <account> is a key of services.bank_import.BANK_ACCOUNTS,
+# e.g. /personal/api/accounts/usaa/import or /personal/api/accounts/chase/transactions
+#------------------------------------------
+TRANSACTIONS_TABLE = BankTransaction.__tablename__
+TRANSACTION_FIELDS = ('id', 'posted_date', 'amount', 'description', 'memo', 'import_id', 'category', 'category_source')
+
+@personal_bp.route('/api/accounts', methods=['GET'])
+def list_bank_accounts():
+    """
+    API endpoint listing the accounts that have a statement ledger.
+    """
+    return jsonify([{'account': account, 'label': info['label'], 'kind': info['kind']}
+                    for account, info in BANK_ACCOUNTS.items()])
+
+@personal_bp.route('/api/accounts/<account>/import', methods=['POST'])
+def import_bank_statement(account):
+    """
+    API endpoint importing a CSV or OFX/QFX statement export (multipart field 'file').
+    The optional 'format' field ('csv' or 'ofx') overrides detection by extension.
+    Rows already imported are skipped, so overlapping exports can be uploaded as they are.
+    """
+    info = get_bank_account(account)
+    if not info:
+        return _unknown_account(account)
+    file = request.files.get('file')
+    if not file or not file.filename:
+        return jsonify({'error': 'No file provided'}), 400
+
+    try:
+        log, errors = import_statement(account, file.stream, filename=secure_filename(file.filename),
+                                       file_format=request.form.get('format') or None)
+        db.session.commit()
+    except StatementError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        personal_bp.logger.error(f"Failed to import {info['label']} statement {file.filename}: {e}", exc_info=True)
+        return jsonify({'error': f"Failed to import {info['label']} statement"}), 500
+
+    personal_bp.logger.info(f"{info['label']} statement {log.filename}: {log.inserted} added, "
+                            f"{log.duplicates} duplicates, {log.rejected} rejected.")
+    return jsonify({
+        'message': f"{log.inserted} {info['label']} transactions imported",
+        'import': log.to_dict(),
+        'errors': errors
+    }), 200
+
+@personal_bp.route('/api/accounts/<account>/imports', methods=['GET'])
+def list_statement_imports(account):
+    """
+    API endpoint listing an account's statement imports, newest first.
+    """
+    if not get_bank_account(account):
+        return _unknown_account(account)
+    imports = (TransactionImport.query.filter_by(account=account)
+               .order_by(TransactionImport.id.desc()).all())
+    return jsonify([log.to_dict() for log in imports])
+
+@personal_bp.route('/api/accounts/<account>/transactions', methods=['GET'])
+def get_bank_transactions(account):
+    """
+    API endpoint to retrieve an account's transactions, newest first.
+    Supports 'date_from'/'date_to' (YYYY-MM-DD), keyset pagination via
+    'limit'/'after' (X-Next-Cursor header) and ?stream=json|ndjson.
+    Answers If-None-Match/If-Modified-Since with 304 when the ledger is unchanged.
+    """
+    if not get_bank_account(account):
+        return _unknown_account(account)
+    return conditional_get([TRANSACTIONS_TABLE], lambda: _transactions_response(account))
+
+@personal_bp.route('/api/transactions/<int:transaction_id>/category', methods=['POST'])
+def set_transaction_category(transaction_id):
+    """
+    API endpoint to categorize one transaction by hand. Expects JSON {'category': str or null}.
+    A manual category is kept when rules change; null hands the row back to the rules.
+    """
+    data = request.get_json(silent=True)
+    category = data.get('category') if isinstance(data, dict) else None
+    if category is not None and (not isinstance(category, str) or not category.strip() or len(category) > 50):
+        return jsonify({'error': 'category must be null or a non-empty string of at most 50 characters'}), 400
+
+    transaction = db.session.get(BankTransaction, transaction_id)
+    if not transaction:
+        return jsonify({'error': 'Transaction not found'}), 404
+    if category is None:
+        transaction.category, transaction.category_rule_id = load_matcher().match(transaction.description)
+        transaction.category_source = 'rule' if transaction.category_rule_id else None
+    else:
+        transaction.category, transaction.category_rule_id, transaction.category_source = category.strip(), None, 'manual'
+
+    try:
+        db.session.commit()
+        return jsonify(transaction.to_dict())
+    except Exception as e:
+        db.session.rollback()
+        personal_bp.logger.error(f"Failed to categorize transaction {transaction_id}: {e}")
+        return jsonify({'error': 'Failed to update the transaction category'}), 500
+
+def _unknown_account(account):
+    """
+    Error response for an <account> that is not registered in BANK_ACCOUNTS.
+    """
+    return jsonify({'error': f'Unknown account: {account}'}), 404
+
+def _parse_transactions_query(args):
+    """
+    Returns (date_from, date_to, limit, after) or raises ValueError with a client-facing message.
+    'after' is a '<YYYY-MM-DD>_<id>' cursor as returned in the X-Next-Cursor header.
+    """
+    try:
+        date_from = date.fromisoformat(args['date_from']) if args.get('date_from') else None
+        date_to = date.fromisoformat(args['date_to']) if args.get('date_to') else None
+    except ValueError:
+        raise ValueError('date_from and date_to must be YYYY-MM-DD dates')
+    try:
+        limit = int(args['limit']) if args.get('limit') else None
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+
+    after = None
+    if args.get('after'):
+        try:
+            after_date, after_id = args['after'].split('_')
+            after = (date.fromisoformat(after_date), int(after_id))
+        except ValueError:
+            raise ValueError("after must be a '<YYYY-MM-DD>_<id>' cursor")
+    return date_from, date_to, limit, after
+
+def _transactions_response(account):
+    """
+    Returns an account's transactions as a JSON list, or streamed with ?stream=json|ndjson.
+    """
+    try:
+        date_from, date_to, limit, after = _parse_transactions_query(request.args)
+        stream_mode = get_stream_mode(request.args)
+        if stream_mode and limit:
+            raise ValueError('stream cannot be combined with limit')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if not stream_mode:
+        items, next_cursor = _load_transactions_page(account, date_from, date_to, limit, after)
+        response = jsonify(items)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
+
+    query = _transactions_query(account, date_from, date_to, after)
+    return streamed_response(query, _serialize_transaction, stream_mode)
+
+@cached_query(TRANSACTIONS_TABLE)
+def _load_transactions_page(account, date_from, date_to, limit, after):
+    """
+    Loads one (or the only) page of transactions as dicts plus the next cursor.
+    Cached by the full set of query parameters until the ledger is written.
+    """
+    query = _transactions_query(account, date_from, date_to, after)
+    rows = query.limit(limit + 1).all() if limit else query.all()
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = f"{rows[-1].posted_date.isoformat()}_{rows[-1].id}"
+    return [_serialize_transaction(row) for row in rows], next_cursor
+
+def _transactions_query(account, date_from, date_to, after):
+    """
+    Column query over the (account, posted_date, id) index, newest first.
+    """
+    columns = [getattr(BankTransaction, field) for field in TRANSACTION_FIELDS]
+    query = db.session.query(*columns).filter(BankTransaction.account == account)
+    if date_from is not None:
+        query = query.filter(BankTransaction.posted_date >= date_from)
+    if date_to is not None:
+        query = query.filter(BankTransaction.posted_date <= date_to)
+    if after is not None:
+        query = query.filter(db.or_(
+            BankTransaction.posted_date < after[0],
+            db.and_(BankTransaction.posted_date == after[0], BankTransaction.id < after[1])
+        ))
+    return query.order_by(BankTransaction.posted_date.desc(), BankTransaction.id.desc())
+
+def _serialize_transaction(row):
+    item = dict(zip(TRANSACTION_FIELDS, row))
+    item['posted_date'] = item['posted_date'].isoformat()
+    item['amount'] = format_money(item['amount'])
+    return item
+
 ###########################################
 # -------- Income --------
 ###########################################
@@ -68,200 +269,407 @@ def retirement():
     Renders the USAF Retirement income tracking page.
     """
     return render_template('html/personal_finances/income/retirement.html')
+
 #------------------------------------------
-#---- API Endpoints for USAF Retirement ---
+#------------ VA Disability ---------------
 #------------------------------------------
-@personal_bp.route('/api/usaf_retirement/data', methods=['GET'])
-def get_usaf_retirement_data():
+@personal_bp.route('/income/disability')
+def disability():
     """
-    API endpoint to retrieve all USAF Retirement Pay data.
-    If the table is empty, it initializes data for the current year,
-    the year before, and two years after.
+    Renders the VA Disability income tracking page.
     """
-    data = USAFRetirementPay.query.all()
+    return render_template('html/personal_finances/income/disability.html')
 
-    # If no data exists, initialize the table with default entries
-    if not data:
-        personal_bp.logger.info("USAFRetirementPay table is empty, initializing with default data.")
-        current_year = datetime.now().year
-        try:
-            for year in range(current_year - 1, current_year + 2): # From last year to two years in future
-                for month_index in range(1, 13):
-                    month_name = calendar.month_name[month_index]
-                    new_entry = USAFRetirementPay(
-                        year=year,
-                        month_index=month_index,
-                        month_name=month_name,
-                        gross_pay=0.0,
-                        taxed_amount=0.0,
-                        net_pay=0.0
-                    )
-                    db.session.add(new_entry)
-            db.session.commit()
-            personal_bp.logger.info("USAFRetirementPay table initialized successfully.")
-            data = USAFRetirementPay.query.all() # Re-fetch data after initialization
-        except Exception as e:
-            db.session.rollback()
-            personal_bp.logger.error(f"Error initializing USAFRetirementPay data: {e}")
-            return jsonify({'error': 'Failed to initialize USAF retirement data'}), 500
+#------------------------------------------
+#------------- Dividends / Stocks ---------
+#------------------------------------------
+@personal_bp.route('/income/dividends')
+def dividends():
+    """
+    Renders the Cash Dividends income tracking page.
+    """
+    return render_template('html/personal_finances/income/dividends.html')
 
-    # Use the to_dict() method for cleaner serialization
-    result = [item.to_dict() for item in data]
-    return jsonify(result)
+@personal_bp.route('/income/stocks')
+def stocks():
+    """
+    Renders the Stocks income tracking page.
+    """
+    return render_template('html/personal_finances/income/stocks.html')
+
+#------------------------------------------
+#---- API Endpoints for Income Streams ----
+# <stream> is a key of services.ledger.INCOME_STREAMS,
+# e.g. /personal/api/usaf_retirement/data or /personal/api/va_disability/update_batch
+#------------------------------------------
+LEDGER_TABLE = IncomeLedgerEntry.__tablename__
 
-@personal_bp.route('/api/usaf_retirement/update', methods=['POST'])
-def update_usaf_retirement_entry():
+@personal_bp.route('/api/<stream>/data', methods=['GET'])
+def get_income_data(stream):
     """
-    API endpoint to update an existing USAF Retirement Pay entry.
-    Expects JSON with 'id', 'grossPay', and 'taxedAmount'.
+    API endpoint to retrieve an income stream's monthly pay data ordered by year and month.
+    Supports 'year_from'/'year_to' filters, 'fields' projection, keyset
+    pagination via 'limit'/'after' and ?stream=json|ndjson (see _pay_data_response).
+    The pay calendar is seeded (or extended forward) first, see ensure_pay_calendar.
+    Answers If-None-Match/If-Modified-Since with 304 when the ledger is unchanged.
     """
-    data = request.get_json()
-    entry_id = data.get('id')
-    gross_pay = data.get('grossPay')
-    taxed_amount = data.get('taxedAmount')
+    info = get_income_stream(stream)
+    if not info:
+        return _unknown_stream(stream)
+    label = info['label']
+
+    # Seed before the version check so a newly extended calendar changes the ETag
+    try:
+        ensure_pay_calendar(stream)
+    except Exception as e:
+        db.session.rollback()
+        personal_bp.logger.error(f"Error initializing {label} data: {e}")
+        return jsonify({'error': f'Failed to initialize {label} data'}), 500
+
+    return conditional_get([LEDGER_TABLE], lambda: _pay_data_response(stream, label))
 
-    # Input validation
-    if not isinstance(entry_id, int):
-        personal_bp.logger.warning(f"Invalid entry ID received: {entry_id}")
-        return jsonify({'error': 'Invalid ID format'}), 400
+@personal_bp.route('/api/<stream>/totals', methods=['GET'])
+def get_income_totals(stream):
+    """
+    API endpoint to retrieve per-year and cumulative totals for an income stream.
+    """
+    if not get_income_stream(stream):
+        return _unknown_stream(stream)
+    return conditional_get([LEDGER_TABLE], lambda: jsonify(_pay_totals(stream)))
 
+@personal_bp.route('/api/<stream>/update', methods=['POST'])
+def update_income_entry(stream):
+    """
+    API endpoint to update an existing monthly entry of an income stream.
+    Expects JSON with 'id', 'grossPay', and 'taxedAmount'.
+    """
+    info = get_income_stream(stream)
+    if not info:
+        return _unknown_stream(stream)
+    label = info['label']
+
+    data = request.get_json()
     try:
-        gross_pay = float(gross_pay)
-        taxed_amount = float(taxed_amount)
-        if gross_pay < 0 or taxed_amount < 0:
-            personal_bp.logger.warning(f"Negative pay or taxed amount received for entry ID {entry_id}: Gross={gross_pay}, Taxed={taxed_amount}")
-            return jsonify({'error': 'Gross pay and taxed amount must be non-negative'}), 400
-    except (TypeError, ValueError):
-        personal_bp.logger.warning(f"Invalid or missing grossPay/taxedAmount for entry ID {entry_id}: Gross={gross_pay}, Taxed={taxed_amount}")
-        return jsonify({'error': 'Invalid or missing grossPay or taxedAmount'}), 400
-
-    net_pay = gross_pay - taxed_amount
-    entry = USAFRetirementPay.query.get(entry_id)
+        entry_id, gross_pay, taxed_amount = _parse_pay_edit(data)
+    except ValueError as e:
+        personal_bp.logger.warning(f"Invalid {label} update received: {data} ({e})")
+        return jsonify({'error': str(e)}), 400
 
+    entry = IncomeLedgerEntry.query.filter_by(id=entry_id, stream=stream).first()
     if not entry:
-        personal_bp.logger.warning(f"USAF Retirement entry not found for ID: {entry_id}")
+        personal_bp.logger.warning(f"{label} entry not found for ID: {entry_id}")
         return jsonify({'error': 'Entry not found'}), 404
 
     entry.gross_pay = gross_pay
     entry.taxed_amount = taxed_amount
-    entry.net_pay = net_pay
+    entry.net_pay = gross_pay - taxed_amount
 
     try:
         db.session.commit()
-        personal_bp.logger.info(f"USAF retirement entry ID {entry_id} updated successfully.")
-        return jsonify({'message': 'USAF retirement entry updated successfully'})
+        personal_bp.logger.info(f"{label} entry ID {entry_id} updated successfully.")
+        return jsonify({'message': f'{label} entry updated successfully'})
     except Exception as e:
         db.session.rollback()
-        personal_bp.logger.error(f"Failed to update USAF retirement entry (ID: {entry_id}): {e}")
-        return jsonify({'error': 'Failed to update USAF retirement entry'}), 500
+        personal_bp.logger.error(f"Failed to update {label} entry (ID: {entry_id}): {e}")
+        return jsonify({'error': f'Failed to update {label} entry'}), 500
 
-#------------------------------------------
-#------------ VA Disability ---------------
-#------------------------------------------
-@personal_bp.route('/income/disability')
-def disability():
+@personal_bp.route('/api/<stream>/update_batch', methods=['POST'])
+def update_income_batch(stream):
     """
-    Renders the VA Disability income tracking page.
+    API endpoint to update many monthly entries of an income stream in one transaction.
+    Expects JSON with 'entries', a list of {'id', 'grossPay', 'taxedAmount'}.
     """
-    return render_template('html/personal_finances/income/disability.html')
+    info = get_income_stream(stream)
+    if not info:
+        return _unknown_stream(stream)
+    return _apply_pay_batch(stream, info['label'])
+
+@personal_bp.route('/api/income/monthly_totals', methods=['GET'])
+def get_monthly_income_totals():
+    """
+    API endpoint to retrieve total monthly income across all streams,
+    optionally limited with 'year_from'/'year_to'.
+    Answered by one GROUP BY over the ledger's (year, month_index) index.
+    """
+    return conditional_get([LEDGER_TABLE], _monthly_income_totals)
+
+def _monthly_income_totals():
+    """
+    Builds the cross-stream monthly totals response for get_monthly_income_totals.
+    """
+    try:
+        year_from = int(request.args['year_from']) if request.args.get('year_from') else None
+        year_to = int(request.args['year_to']) if request.args.get('year_to') else None
+    except ValueError:
+        return jsonify({'error': 'year_from and year_to must be integers'}), 400
+
+    return jsonify(_monthly_income_rows(year_from, year_to))
+
+@cached_query(LEDGER_TABLE)
+def _monthly_income_rows(year_from, year_to):
+    """
+    Sums all streams per (year, month_index); cached until the ledger is written.
+    """
+    query = db.session.query(
+        IncomeLedgerEntry.year,
+        IncomeLedgerEntry.month_index,
+        db.func.sum(IncomeLedgerEntry.gross_pay),
+        db.func.sum(IncomeLedgerEntry.taxed_amount),
+        db.func.sum(IncomeLedgerEntry.net_pay))
+    if year_from is not None:
+        query = query.filter(IncomeLedgerEntry.year >= year_from)
+    if year_to is not None:
+        query = query.filter(IncomeLedgerEntry.year <= year_to)
+    rows = (query.group_by(IncomeLedgerEntry.year, IncomeLedgerEntry.month_index)
+                 .order_by(IncomeLedgerEntry.year, IncomeLedgerEntry.month_index)
+                 .all())
+
+    return [{
+        'year': year,
+        'month_index': month_index,
+        'month_name': calendar.month_name[month_index],
+        'gross_total': format_money(gross),
+        'taxed_total': format_money(taxed),
+        'net_total': format_money(net)
+    } for year, month_index, gross, taxed, net in rows]
 
 #------------------------------------------
-# --- API Endpoints for VA Disability ---
+#------- Shared Monthly Pay Helpers -------
 #------------------------------------------
-@personal_bp.route('/api/va_disability/data', methods=['GET'])
-def get_va_disability_data():
+MAX_BATCH_SIZE = 500
+MAX_PAGE_SIZE = 1000
+PAY_FIELDS = ('id', 'year', 'month_name', 'month_index', 'gross_pay', 'taxed_amount', 'net_pay')
+MONEY_FIELDS = ('gross_pay', 'taxed_amount', 'net_pay')
+
+def _unknown_stream(stream):
     """
-    API endpoint to retrieve all VA Disabiliy Pay data.
-    If the table is empty, it initializes data for the current year,
-    the year before, and two years after.
+    Error response for a <stream> that is not registered in INCOME_STREAMS.
     """
-    data = VADisabilityPay.query.all()
+    return jsonify({'error': f'Unknown income stream: {stream}'}), 404
 
-    # If no data exists, initialize the table with default entries
-    if not data:
-        personal_bp.logger.info("VADisabilityPay table is empty, initializing with default data.")
-        current_year = datetime.now().year
-        try:
-            for year in range(current_year - 1, current_year + 2): # From last year to two years in future
-                for month_index in range(1, 13):
-                    month_name = calendar.month_name[month_index]
-                    new_entry = VADisabilityPay(
-                        year=year,
-                        month_index=month_index,
-                        month_name=month_name,
-                        gross_pay=0.0,
-                        taxed_amount=0.0,
-                        net_pay=0.0
-                    )
-                    db.session.add(new_entry)
-            db.session.commit()
-            personal_bp.logger.info("VADisabilityPay table initialized successfully.")
-            data = VADisabilityPay.query.all() # Re-fetch data after initialization
-        except Exception as e:
-            db.session.rollback()
-            personal_bp.logger.error(f"Error initializing VADisabilityPay data: {e}")
-            return jsonify({'error': 'Failed to initialize VA disability data'}), 500
+@cached_query(LEDGER_TABLE)
+def _pay_totals(stream):
+    """
+    Sums gross, taxed and net pay per year with a single GROUP BY and adds
+    running (cumulative) totals across the years in ascending order.
+    Returns one dict per year, so the payload grows with years rather than months.
+    Cached until the ledger is written.
+    """
+    rows = (db.session.query(
+                IncomeLedgerEntry.year,
+                db.func.sum(IncomeLedgerEntry.gross_pay),
+                db.func.sum(IncomeLedgerEntry.taxed_amount),
+                db.func.sum(IncomeLedgerEntry.net_pay))
+            .filter(IncomeLedgerEntry.stream == stream)
+            .group_by(IncomeLedgerEntry.year)
+            .order_by(IncomeLedgerEntry.year)
+            .all())
 
-    # Use the to_dict() method for cleaner serialization
-    result = [item.to_dict() for item in data]
-    return jsonify(result)
+    # SUM() keeps the Money column type, so sums arrive as exact Decimals
+    cumulative = [ZERO, ZERO, ZERO]
+    totals = []
+    for year, *sums in rows:
+        sums = [ZERO if value is None else value for value in sums]
+        cumulative = [running + value for running, value in zip(cumulative, sums)]
+        totals.append({
+            'year': year,
+            'gross_total': sums[0],
+            'taxed_total': sums[1],
+            'net_total': sums[2],
+            'cumulative_gross': cumulative[0],
+            'cumulative_taxed': cumulative[1],
+            'cumulative_net': cumulative[2]
+        })
+    return totals
 
-@personal_bp.route('/api/va_disability/update', methods=['POST'])
-def update_va_disability_entry():
+def _parse_data_query(args):
     """
-    API endpoint to update an existing VA disability Pay entry.
-    Expects JSON with 'id', 'grossPay', and 'taxedAmount'.
+    Parses the data endpoint query string.
+    Returns (year_from, year_to, fields, limit, after) or raises ValueError with a client-facing message.
+    'after' is a '<year>-<month_index>' cursor as returned in the X-Next-Cursor header.
     """
-    data = request.get_json()
-    entry_id = data.get('id')
-    gross_pay = data.get('grossPay')
-    taxed_amount = data.get('taxedAmount')
+    try:
+        year_from = int(args['year_from']) if args.get('year_from') else None
+        year_to = int(args['year_to']) if args.get('year_to') else None
+        limit = int(args['limit']) if args.get('limit') else None
+    except ValueError:
+        raise ValueError('year_from, year_to and limit must be integers')
 
-    # Input validation
-    if not isinstance(entry_id, int):
-        personal_bp.logger.warning(f"Invalid entry ID received: {entry_id}")
-        return jsonify({'error': 'Invalid ID format'}), 400
+    if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
 
-    try:
-        gross_pay = float(gross_pay)
-        taxed_amount = float(taxed_amount)
-        if gross_pay < 0 or taxed_amount < 0:
-            personal_bp.logger.warning(f"Negative pay or taxed amount received for entry ID {entry_id}: Gross={gross_pay}, Taxed={taxed_amount}")
-            return jsonify({'error': 'Gross pay and taxed amount must be non-negative'}), 400
-    except (TypeError, ValueError):
-        personal_bp.logger.warning(f"Invalid or missing grossPay/taxedAmount for entry ID {entry_id}: Gross={gross_pay}, Taxed={taxed_amount}")
-        return jsonify({'error': 'Invalid or missing grossPay or taxedAmount'}), 400
-
-    net_pay = gross_pay - taxed_amount
-    entry = VADisabilityPay.query.get(entry_id)
+    fields = PAY_FIELDS
+    if args.get('fields'):
+        fields = tuple(field.strip() for field in args['fields'].split(',') if field.strip())
+        unknown = [field for field in fields if field not in PAY_FIELDS]
+        if unknown or not fields:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(PAY_FIELDS)}")
 
-    if not entry:
-        personal_bp.logger.warning(f"VA disability entry not found for ID: {entry_id}")
-        return jsonify({'error': 'Entry not found'}), 404
+    after = None
+    if args.get('after'):
+        try:
+            after_year, after_month = (int(part) for part in args['after'].split('-'))
+        except ValueError:
+            raise ValueError("after must be a '<year>-<month_index>' cursor")
+        after = (after_year, after_month)
 
-    entry.gross_pay = gross_pay
-    entry.taxed_amount = taxed_amount
-    entry.net_pay = net_pay
+    return year_from, year_to, fields, limit, after
 
+def _pay_data_response(stream, label):
+    """
+    Returns a stream's pay rows as a JSON list ordered by (year, month_index).
+    Only the requested columns are selected (no ORM objects are built), and when
+    'limit' is given the cursor for the next page is sent in the X-Next-Cursor header.
+    With ?stream=json|ndjson the rows are streamed in chunks instead (no 'limit').
+    """
     try:
-        db.session.commit()
-        personal_bp.logger.info(f"VA disability entry ID {entry_id} updated successfully.")
-        return jsonify({'message': 'VA disability entry updated successfully'})
-    except Exception as e:
-        db.session.rollback()
-        personal_bp.logger.error(f"Failed to update VA disability entry (ID: {entry_id}): {e}")
-        return jsonify({'error': 'Failed to update VA disability entry'}), 500
-    
-@personal_bp.route('/income/dividends')
-def dividends():
+        year_from, year_to, fields, limit, after = _parse_data_query(request.args)
+        stream_mode = get_stream_mode(request.args)
+        if stream_mode and limit:
+            raise ValueError('stream cannot be combined with limit')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if not stream_mode:
+        items, next_cursor = _load_pay_page(stream, year_from, year_to, fields, limit, after)
+        response = jsonify(items)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
+
+    query, serialize = _pay_data_query(stream, year_from, year_to, fields, after)
+    return streamed_response(query, serialize, stream_mode)
+
+@cached_query(LEDGER_TABLE)
+def _load_pay_page(stream, year_from, year_to, fields, limit, after):
     """
-    Renders the Cash Dividends income tracking page.
+    Loads one (or the only) page of pay rows as dicts plus the next cursor.
+    Cached by the full set of query parameters until the ledger is written.
     """
-    return render_template('html/personal_finances/income/dividends.html')
+    query, serialize = _pay_data_query(stream, year_from, year_to, fields, after)
+    rows = query.limit(limit + 1).all() if limit else query.all()
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = f"{rows[-1][-2]}-{rows[-1][-1]}"
+    return [serialize(row) for row in rows], next_cursor
 
-@personal_bp.route('/income/stocks')
-def stocks():
+def _pay_data_query(stream, year_from, year_to, fields, after):
     """
-    Renders the Stocks income tracking page.
+    Builds the projected, filtered and ordered pay query plus a function turning one row into a dict.
+    """
+    # month_name is derived from month_index; the cursor columns are always selected last
+    stored_fields = [field for field in fields if field != 'month_name']
+    columns = [getattr(IncomeLedgerEntry, field) for field in stored_fields]
+    query = (db.session.query(*columns, IncomeLedgerEntry.year, IncomeLedgerEntry.month_index)
+             .filter(IncomeLedgerEntry.stream == stream))
+    if year_from is not None:
+        query = query.filter(IncomeLedgerEntry.year >= year_from)
+    if year_to is not None:
+        query = query.filter(IncomeLedgerEntry.year <= year_to)
+    if after is not None:
+        query = query.filter(db.or_(
+            IncomeLedgerEntry.year > after[0],
+            db.and_(IncomeLedgerEntry.year == after[0], IncomeLedgerEntry.month_index > after[1])
+        ))
+    query = query.order_by(IncomeLedgerEntry.year, IncomeLedgerEntry.month_index)
+
+    # Money is formatted here so jsonify never needs its per-value fallback
+    money_fields = [field for field in stored_fields if field in MONEY_FIELDS]
+    with_month_name = 'month_name' in fields
+
+    def serialize(row):
+        item = dict(zip(stored_fields, row))
+        for field in money_fields:
+            item[field] = format_money(item[field])
+        if with_month_name:
+            item['month_name'] = calendar.month_name[row[-1]]
+        return item
+
+    return query, serialize
+
+def _parse_pay_edit(edit):
     """
-    return render_template('html/personal_finances/income/stocks.html')
\ No newline at end of file
+    Validates a single {'id', 'grossPay', 'taxedAmount'} edit.
+    Returns (entry_id, gross_pay, taxed_amount) or raises ValueError with a client-facing message.
+    """
+    if not isinstance(edit, dict):
+        raise ValueError('Edit must be an object')
+
+    entry_id = edit.get('id')
+    if not isinstance(entry_id, int) or isinstance(entry_id, bool):
+        raise ValueError('Invalid ID format')
+
+    try:
+        gross_pay = parse_money(edit.get('grossPay'))
+        taxed_amount = parse_money(edit.get('taxedAmount'))
+    except ValueError:
+        raise ValueError('Invalid or missing grossPay or taxedAmount')
+
+    if gross_pay < 0 or taxed_amount < 0:
+        raise ValueError('Gross pay and taxed amount must be non-negative')
+
+    return entry_id, gross_pay, taxed_amount
+
+def _apply_pay_batch(stream, label):
+    """
+    Validates every edit in the request, loads the affected rows with a single
+    IN query and applies the valid edits in one commit.
+    Invalid or unknown rows are reported back per index instead of failing the batch.
+    """
+    data = request.get_json(silent=True)
+    edits = data.get('entries') if isinstance(data, dict) else data
+
+    if not isinstance(edits, list) or not edits:
+        return jsonify({'error': 'Expected a non-empty list of entries'}), 400
+    if len(edits) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'Batch is limited to {MAX_BATCH_SIZE} entries'}), 400
+
+    errors = []
+    parsed = {}  # entry_id -> (index, gross_pay, taxed_amount); last edit for an id wins
+    for index, edit in enumerate(edits):
+        try:
+            entry_id, gross_pay, taxed_amount = _parse_pay_edit(edit)
+        except ValueError as e:
+            errors.append({'index': index, 'id': edit.get('id') if isinstance(edit, dict) else None, 'error': str(e)})
+            continue
+        parsed[entry_id] = (index, gross_pay, taxed_amount)
+
+    entries = {}
+    if parsed:
+        entries = {entry.id: entry for entry in IncomeLedgerEntry.query.filter(
+            IncomeLedgerEntry.stream == stream,
+            IncomeLedgerEntry.id.in_(parsed.keys())
+        ).all()}
+
+    updated = []
+    for entry_id, (index, gross_pay, taxed_amount) in parsed.items():
+        entry = entries.get(entry_id)
+        if not entry:
+            errors.append({'index': index, 'id': entry_id, 'error': 'Entry not found'})
+            continue
+        entry.gross_pay = gross_pay
+        entry.taxed_amount = taxed_amount
+        entry.net_pay = gross_pay - taxed_amount
+        updated.append(entry_id)
+
+    if updated:
+        try:
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            personal_bp.logger.error(f"Failed to apply {label} batch update ({len(updated)} entries): {e}")
+            return jsonify({'error': f'Failed to update {label} entries'}), 500
+
+    errors.sort(key=lambda err: err['index'])
+    if errors:
+        personal_bp.logger.warning(f"{label} batch update rejected {len(errors)} of {len(edits)} entries.")
+    personal_bp.logger.info(f"{label} batch update applied to {len(updated)} entries.")
+
+    status = 200 if updated or not errors else 400
+    return jsonify({
+        'message': f'{len(updated)} {label} entries updated successfully',
+        'updated': sorted(updated),
+        'errors': errors,
+        'totals': _pay_totals(stream) if updated else None
+    }), status
@@ -0,0 +1,54 @@
+# routes/search.py
+###########################################
+# - Full-Text Search API
+# - Ranked prefix search over documents and rental properties
+###########################################
+
+from flask import Blueprint, request, jsonify, url_for, current_app
+from services.search import search, SEARCH_SOURCES
+
+search_bp = Blueprint('search', __name__, url_prefix='/api/search')
+
+MAX_SEARCH_LIMIT = 100
+
+@search_bp.route('')
+def search_records():
+    """
+    GET /api/search?q=main st&kind=document,property&limit=20&offset=0
+
+    Every term matches as a prefix; results are ordered by relevance.
+    total counts every match; very broad queries rank only the newest matches.
+    Snippets are HTML-escaped with the matched terms wrapped in <mark>.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'q is required'}), 400
+    kinds = [kind for kind in request.args.get('kind', '').split(',') if kind]
+    unknown = [kind for kind in kinds if kind not in SEARCH_SOURCES]
+    if unknown:
+        return jsonify({'error': f"kind must be one of: {', '.join(SEARCH_SOURCES)}"}), 400
+    try:
+        limit = min(int(request.args.get('limit', 20)), MAX_SEARCH_LIMIT)
+        offset = int(request.args.get('offset', 0))
+        if limit < 1 or offset < 0:
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': f'limit must be 1-{MAX_SEARCH_LIMIT} and offset a non-negative integer'}), 400
+
+    try:
+        results, total, has_more = search(query, kinds=kinds, limit=limit, offset=offset)
+    except Exception as e:
+        current_app.logger.error(f"Search failed for {query!r}: {e}", exc_info=True)
+        return jsonify({'error': 'Search failed'}), 500
+
+    for result in results:
+        if result['kind'] == 'document':
+            result['url'] = url_for('uploads.download_file', file_id=result['id'])
+    return jsonify({
+        'query': query,
+        'results': results,
+        'total': total,
+        'limit': limit,
+        'offset': offset,
+        'next_offset': offset + limit if has_more else None
+    })
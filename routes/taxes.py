@@ -3,7 +3,10 @@
 # - Routes for Taxes
 ###########################################
 
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, jsonify, request
+from services.money import format_money, from_cents
+from services.tax_engine import TaxInputError, TAX_YEARS, FILING_STATUSES, RESULT_FIELDS, estimate, scenario_grid, \
+    latest_year
 
 # Create a Blueprint for taxes
 tax_bp = Blueprint('taxes', __name__, url_prefix='/taxes')
@@ -48,4 +51,67 @@ def taxes_thm_ug():
     """
     Renders the Two & Half Mex UG Tax Tracker page.
     """
-    return render_template('html/taxes/thm_ug_tax_tracker.html')
\ No newline at end of file
+    return render_template('html/taxes/thm_ug_tax_tracker.html')
+
+#------------------------------------------
+# 1040 tax engine API (services/tax_engine.py)
+#------------------------------------------
+RATE_FIELDS = ('marginal_rate', 'effective_rate')
+
+def _output_value(field, value):
+    return round(float(value), 4) if field in RATE_FIELDS else format_money(from_cents(int(value)))
+
+@tax_bp.route('/api/1040/years')
+def tax_years():
+    """
+    Tax years with tables, the filing statuses, and each year's published figures.
+    """
+    return jsonify({'years': sorted(TAX_YEARS), 'latest': latest_year(), 'filing_statuses': list(FILING_STATUSES),
+                    'figures': {str(year): figures for year, figures in TAX_YEARS.items()}})
+
+@tax_bp.route('/api/1040/estimate', methods=['POST'])
+def tax_estimate():
+    """
+    Estimates one return. JSON body: year, filing_status, dependents, wages,
+    capital_gain, business_income, educator_expenses (dollars) and deduction
+    ('standard' or the itemized amount). Returns the 1040 lines as money strings.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+    try:
+        year, result = estimate(data)
+    except TaxInputError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({'year': year, **{field: _output_value(field, value) for field, value in result.items()}})
+
+@tax_bp.route('/api/1040/what_if', methods=['POST'])
+def tax_what_if():
+    """
+    Batch what-if planning: the fields of /estimate, any of which may be a list;
+    every combination is computed in one vectorized call. The optional
+    'outputs' list picks the result columns (default: all).
+    Returns columns with one entry per scenario: the listed inputs, then the results.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+    # Checked before the grid is computed
+    outputs = data.get('outputs')
+    if outputs is not None and (not isinstance(outputs, list) or not all(isinstance(field, str) for field in outputs)):
+        return jsonify({"error": "outputs must be a list of result names"}), 400
+    outputs = outputs or list(RESULT_FIELDS)
+    unknown = [field for field in outputs if field not in RESULT_FIELDS]
+    if unknown:
+        return jsonify({"error": f"Unknown outputs: {', '.join(unknown)}"}), 400
+    try:
+        year, inputs, result = scenario_grid(data)
+    except TaxInputError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify({
+        'year': year,
+        'scenarios': len(result['total_tax']),
+        'inputs': inputs,
+        'results': {field: [_output_value(field, value) for value in result[field].tolist()] for field in outputs},
+    })
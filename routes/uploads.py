@@ -5,14 +5,22 @@
 ###########################################
 
 from flask import Blueprint, render_template, request, jsonify, current_app, redirect, url_for
-from werkzeug.utils import secure_filename
 from models import db
-from models import UploadedFile
-import os
+from models import UploadedFile, UploadSession, DocumentJob, DocumentLink
+from services.file_serving import send_upload, send_stored_file
+from services.document_jobs import queue_document_jobs
+from services.document_links import ENTITY_TYPES, entity_exists, link_file, unlink_file, files_for_entity_query
+from services.storage import (save_upload, delete_upload, delete_uploads, remove_files_later, discard_new_blobs,
+                              start_upload, upload_offset, append_chunk, abort_upload)
+from services.streaming import get_stream_mode, streamed_response
+from services.versioning import conditional_get
+from services.cache import cached_query
 from urllib.parse import unquote
 
 # Create uploads blueprint
 uploads_bp = Blueprint('uploads', __name__, url_prefix='/uploads')
+
+MAX_BATCH_FILES = 500 # Files per batch upload / ids per bulk delete
 ###########################################
 # -------- File Upload Logic --------
 @uploads_bp.route('/test')
@@ -33,26 +41,147 @@ def upload_file():
         return jsonify({'error': 'No file uploaded'}), 400
 
     try:
-        filename = secure_filename(file.filename)
-        save_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        file.save(save_path)
-
-        uploaded_file = UploadedFile(
-            filename=filename,
-            filetype=file.content_type,
+        # Streamed to the content-addressed blob store in chunks while hashing (see services/storage.py)
+        uploaded_file, deduplicated = save_upload(
+            file,
             related_page=related_page,
             related_id=int(related_id) if related_id else None,  # ← Parse if provided
             notes=notes
         )
-        db.session.add(uploaded_file)
         db.session.commit()
 
-        return jsonify({'message': 'Upload successful', 'file': uploaded_file.to_dict()}), 200
+        return jsonify({'message': 'Upload successful', 'deduplicated': deduplicated,
+                        'file': uploaded_file.to_dict()}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        discard_new_blobs()
+        return jsonify({'error': f'Upload failed: {str(e)}'}), 500
+
+@uploads_bp.route('/upload_files', methods=['POST'])
+def upload_files():
+    """
+    Uploads many files in one multipart request (field "files", repeated).
+    related_page / related_id / notes apply to every file. Each file is streamed
+    to storage in turn, and all rows are inserted in one transaction: either every
+    file is recorded or none is.
+    """
+    files = [file for file in request.files.getlist('files') if file and file.filename]
+    related_page = request.form.get('related_page', 'unspecified')
+    notes = request.form.get('notes', '')
+    related_id = request.form.get('related_id')
+
+    if not files:
+        return jsonify({'error': 'No files uploaded'}), 400
+    if len(files) > MAX_BATCH_FILES:
+        return jsonify({'error': f'At most {MAX_BATCH_FILES} files per request'}), 400
+    try:
+        related_id = int(related_id) if related_id else None
+    except ValueError:
+        return jsonify({'error': 'related_id must be an integer'}), 400
+
+    saved = []
+    try:
+        for file in files:
+            saved.append(save_upload(file, related_page=related_page, related_id=related_id, notes=notes))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        discard_new_blobs() # Blobs nothing refers to after the rollback
+        current_app.logger.error(f"Batch upload failed: {e}", exc_info=True)
+        return jsonify({'error': f'Upload failed: {str(e)}'}), 500
+
+    return jsonify({
+        'message': f'{len(saved)} files uploaded',
+        'deduplicated': sum(1 for _, deduplicated in saved if deduplicated),
+        'files': [uploaded_file.to_dict() for uploaded_file, _ in saved]
+    }), 200
+
+# -------- Resumable Chunked Uploads --------
+# POST   /api/chunked                 {filename, size, filetype?, related_page?, related_id?, notes?} -> {upload_id, offset}
+# GET    /api/chunked/<upload_id>     -> {offset, size}  (where to resume)
+# PUT    /api/chunked/<upload_id>     raw bytes, header Upload-Offset: <byte offset> -> {offset, complete, file?}
+# DELETE /api/chunked/<upload_id>     abort
+
+@uploads_bp.route('/api/chunked', methods=['POST'])
+def start_chunked_upload():
+    data = request.get_json(silent=True) or {}
+    try:
+        total_size = int(data.get('size'))
+        related_id = int(data['related_id']) if data.get('related_id') else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'size (and related_id, if given) must be integers'}), 400
+    if not data.get('filename') or total_size <= 0:
+        return jsonify({'error': 'filename and a positive size are required'}), 400
+    if total_size > current_app.config['MAX_UPLOAD_SIZE']:
+        return jsonify({'error': f"File exceeds the {current_app.config['MAX_UPLOAD_SIZE']} byte limit"}), 413
+
+    try:
+        upload_session = start_upload(
+            data['filename'], total_size,
+            filetype=data.get('filetype'),
+            related_page=data.get('related_page', 'unspecified'),
+            related_id=related_id,
+            notes=data.get('notes', '')
+        )
+        db.session.commit()
+        return jsonify({'upload_id': upload_session.id, 'offset': 0, 'size': total_size,
+                        'chunk_size': current_app.config['UPLOAD_CHUNK_SIZE']}), 201
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error starting chunked upload: {e}", exc_info=True)
+        return jsonify({'error': f'Upload failed: {str(e)}'}), 500
+
+@uploads_bp.route('/api/chunked/<string:upload_id>', methods=['GET'])
+def get_chunked_upload(upload_id):
+    upload_session = db.session.get(UploadSession, upload_id)
+    if not upload_session:
+        return jsonify({'error': 'Upload not found'}), 404
+    return jsonify({'upload_id': upload_id, 'offset': upload_offset(upload_session), 'size': upload_session.total_size})
 
+@uploads_bp.route('/api/chunked/<string:upload_id>', methods=['PUT'])
+def put_chunked_upload(upload_id):
+    upload_session = db.session.get(UploadSession, upload_id)
+    if not upload_session:
+        return jsonify({'error': 'Upload not found'}), 404
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+    except ValueError:
+        return jsonify({'error': 'Upload-Offset header (byte offset) is required'}), 400
+    length = request.content_length
+    if length is not None and length > current_app.config['UPLOAD_CHUNK_SIZE']:
+        return jsonify({'error': f"Chunks are limited to {current_app.config['UPLOAD_CHUNK_SIZE']} bytes"}), 413
+
+    try:
+        # request.stream reads the raw body as it arrives; nothing is spooled by the form parser
+        offset, uploaded_file = append_chunk(upload_session, offset, request.stream, length)
+        db.session.commit()
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e), 'offset': upload_offset(upload_session)}), 409
     except Exception as e:
         db.session.rollback()
+        discard_new_blobs()
+        current_app.logger.error(f"Error storing chunk for upload {upload_id}: {e}", exc_info=True)
         return jsonify({'error': f'Upload failed: {str(e)}'}), 500
 
+    if uploaded_file is None:
+        return jsonify({'upload_id': upload_id, 'offset': offset, 'complete': False})
+    return jsonify({'upload_id': upload_id, 'offset': offset, 'complete': True, 'file': uploaded_file.to_dict()}), 201
+
+@uploads_bp.route('/api/chunked/<string:upload_id>', methods=['DELETE'])
+def abort_chunked_upload(upload_id):
+    upload_session = db.session.get(UploadSession, upload_id)
+    if not upload_session:
+        return jsonify({'error': 'Upload not found'}), 404
+    try:
+        abort_upload(upload_session)
+        db.session.commit()
+        return jsonify({'message': 'Upload aborted'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to abort upload: {str(e)}'}), 500
+
 
 ###########################################
 # -------- File Upload Routes --------
@@ -70,8 +199,8 @@ def list_uploaded_files_for_property(property_id):
     if not rental:
         return render_template('html/uploads/list.html', files=[], property_id=property_id)
     
-    # Now filter documents using the numeric database ID (related_id)
-    files = UploadedFile.query.filter_by(related_id=rental.id).order_by(UploadedFile.date_uploaded.desc()).all()
+    # Now list the documents linked to the property's numeric database ID
+    files = files_for_entity_query('rental_property', rental.id).all()
     
     return render_template('html/uploads/list.html', files=files, property_id=property_id)
 
@@ -82,25 +211,175 @@ def delete_uploaded_file(file_id):
     """
     file = UploadedFile.query.get_or_404(file_id)
     try:
-        # Delete the physical file
-        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], file.filename)
-        if os.path.exists(filepath):
-            os.remove(filepath)
-
-        # Remove from database
-        db.session.delete(file)
+        # Remove from database; the blob and thumbnail go too unless another upload shares their content
+        filepaths = delete_upload(file)
         db.session.commit()
-        return redirect(url_for('uploads.list_uploaded_files'))
+        remove_files_later(filepaths)
+        # Back to the list the form was posted from
+        return redirect(request.referrer or url_for('dashboard.home'))
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': f'Failed to delete file: {str(e)}'}), 500
 
+@uploads_bp.route('/api/files/delete', methods=['POST'])
+def delete_uploaded_files():
+    """
+    Bulk delete. JSON: {"ids": [1, 2, 3]}.
+    All rows go in one transaction (nothing is deleted if an id is unknown);
+    unreferenced blobs and thumbnails are removed in the background afterwards.
+    """
+    data = request.get_json(silent=True) or {}
+    ids = data.get('ids')
+    if not isinstance(ids, list) or not ids or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        return jsonify({'error': 'ids must be a non-empty list of integers'}), 400
+    if len(ids) > MAX_BATCH_FILES:
+        return jsonify({'error': f'At most {MAX_BATCH_FILES} ids per request'}), 400
+
+    ids = sorted(set(ids))
+    files = UploadedFile.query.filter(UploadedFile.id.in_(ids)).all()
+    missing = sorted(set(ids) - {file.id for file in files})
+    if missing:
+        return jsonify({'error': 'Some files were not found; nothing was deleted', 'missing': missing}), 404
+
+    try:
+        filepaths = delete_uploads(files)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Bulk delete failed: {e}", exc_info=True)
+        return jsonify({'error': f'Failed to delete files: {str(e)}'}), 500
+    remove_files_later(filepaths)
+    return jsonify({'message': f'{len(ids)} files deleted', 'deleted': ids})
+
+@uploads_bp.route('/file/<int:file_id>')
+def download_file(file_id):
+    """
+    Serves an uploaded file's bytes under its original name and type.
+    Supports byte ranges and conditional requests.
+    """
+    file = UploadedFile.query.get_or_404(file_id)
+    # Range requests and a SHA-256 ETag; revalidated, since ids can be reused (see services/file_serving.py)
+    return send_upload(file)
+
+@uploads_bp.route('/file/<int:file_id>/thumbnail')
+def file_thumbnail(file_id):
+    """
+    Serves the JPEG preview generated by the background document jobs.
+    """
+    file = UploadedFile.query.get_or_404(file_id)
+    if not file.thumbnail_path:
+        return jsonify({'error': 'No thumbnail', 'processing_status': file.processing_status}), 404
+    return send_stored_file(file.thumbnail_path, mimetype='image/jpeg', download_name=f"{file.filename}.jpg",
+                            immutable=False) # Keyed by file id, like the file itself
+
+@uploads_bp.route('/api/file/<int:file_id>/jobs')
+def get_file_jobs(file_id):
+    """
+    Background job status of one file (thumbnail, text extraction).
+    """
+    file = UploadedFile.query.get_or_404(file_id)
+    jobs = DocumentJob.query.filter_by(file_id=file_id).order_by(DocumentJob.id).all()
+    return jsonify({'file_id': file_id, 'processing_status': file.processing_status,
+                    'jobs': [job.to_dict() for job in jobs]})
+
+@uploads_bp.route('/api/file/<int:file_id>/process', methods=['POST'])
+def process_file(file_id):
+    """
+    Queues (or re-queues) thumbnail and text extraction, e.g. for files uploaded before the job queue existed.
+    """
+    file = UploadedFile.query.get_or_404(file_id)
+    try:
+        queue_document_jobs(file)
+        db.session.commit()
+        return jsonify({'message': 'Processing queued', 'file': file.to_dict()}), 202
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error queueing document jobs for file {file_id}: {e}", exc_info=True)
+        return jsonify({'error': f'Failed to queue processing: {str(e)}'}), 500
+
+# -------- Document Links (attach files to records) --------
+
+@uploads_bp.route('/api/links/<string:entity_type>/<int:entity_id>')
+def get_linked_files(entity_type, entity_id):
+    """
+    Files attached to one record, newest first.
+    """
+    if entity_type not in ENTITY_TYPES:
+        return jsonify({'error': f"entity_type must be one of: {', '.join(ENTITY_TYPES)}"}), 400
+    return conditional_get(
+        [UploadedFile.__tablename__, DocumentLink.__tablename__],
+        lambda: jsonify([file.to_dict() for file in files_for_entity_query(entity_type, entity_id).all()])
+    )
+
+@uploads_bp.route('/api/file/<int:file_id>/links', methods=['POST'])
+def add_file_link(file_id):
+    """
+    Attaches a file to a record. JSON: {entity_type, entity_id}.
+    """
+    UploadedFile.query.get_or_404(file_id)
+    data = request.get_json(silent=True) or {}
+    entity_type = data.get('entity_type')
+    if entity_type not in ENTITY_TYPES:
+        return jsonify({'error': f"entity_type must be one of: {', '.join(ENTITY_TYPES)}"}), 400
+    try:
+        entity_id = int(data.get('entity_id'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'entity_id must be an integer'}), 400
+    if not entity_exists(entity_type, entity_id):
+        return jsonify({'error': f'Record {entity_type}:{entity_id} not found'}), 404
+
+    try:
+        created = link_file(file_id, entity_type, entity_id)
+        db.session.commit()
+        link = {'file_id': file_id, 'entity_type': entity_type, 'entity_id': entity_id}
+        return jsonify({'message': 'Linked' if created else 'Already linked', 'link': link}), 201 if created else 200
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error linking file {file_id} to {entity_type}:{entity_id}: {e}", exc_info=True)
+        return jsonify({'error': f'Failed to link file: {str(e)}'}), 500
+
+@uploads_bp.route('/api/file/<int:file_id>/links/<string:entity_type>/<int:entity_id>', methods=['DELETE'])
+def remove_file_link(file_id, entity_type, entity_id):
+    """
+    Detaches a file from a record; the file itself is kept.
+    """
+    try:
+        if not unlink_file(file_id, entity_type, entity_id):
+            return jsonify({'error': 'Link not found'}), 404
+        db.session.commit()
+        return jsonify({'message': 'Unlinked'})
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error unlinking file {file_id} from {entity_type}:{entity_id}: {e}", exc_info=True)
+        return jsonify({'error': f'Failed to unlink file: {str(e)}'}), 500
+
 @uploads_bp.route('/api/files/<string:related_page>')
 def get_files_by_page(related_page):
     """
     API to return uploaded files filtered by related_page.
+    ?stream=json|ndjson streams them in chunks instead of building the whole list.
+    """
+    try:
+        stream_mode = get_stream_mode(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    def build_response():
+        if stream_mode:
+            query = UploadedFile.query.filter_by(related_page=related_page).order_by(UploadedFile.date_uploaded.desc())
+            return streamed_response(query, UploadedFile.to_dict, stream_mode)
+        return jsonify(_file_dicts_for_page(related_page))
+
+    # 304 Not Modified (no file query at all) while the table is unchanged
+    return conditional_get([UploadedFile.__tablename__], build_response)
+
+@cached_query(UploadedFile.__tablename__)
+def _file_dicts_for_page(related_page):
+    """
+    Files of one related_page as dicts, newest first; cached until the table is written.
     """
     files = UploadedFile.query.filter_by(related_page=related_page).order_by(UploadedFile.date_uploaded.desc()).all()
-    return jsonify([file.to_dict() for file in files])
+    return [file.to_dict() for file in files]
 
 #@uploads_bp.route('/list/<int:related_id>')
 #def list_property_documents(related_id):
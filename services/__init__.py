@@ -0,0 +1,4 @@
+# services/__init__.py
+###########################################
+# - Shared Business Logic used by the Blueprints
+###########################################
@@ -0,0 +1,470 @@
+# services/analytics.py
+###########################################
+# - Columnar Analytics Snapshot (NumPy)
+###########################################
+#
+# The financial health dashboards chart monthly / yearly rollups, moving
+# averages and year-over-year deltas of the income ledger, the bank
+# transactions and the rental properties. Instead of scanning those tables on
+# every request, an in-memory snapshot keeps each one as NumPy column arrays
+# (ids, integer cents, month keys, category codes) and every rollup is a few
+# vectorized operations (bincount, cumsum, shifted differences).
+#
+# Keeping the snapshot current without re-reading whole tables:
+#   inserts          : rows with id > the snapshot's largest id
+#   updates, deletes : SQLite triggers append (table, row id) to row_changes;
+#                      the snapshot re-reads just those ids past its last seq
+# Triggers also see Core bulk statements, migrations and other processes.
+# The table versions (services/versioning.py) tell when anything changed, so
+# an unchanged database costs one primary-key lookup per request.
+###########################################
+
+from models import db, RowChange
+from services.versioning import get_table_versions
+from services.money import from_cents, format_money
+from datetime import date
+import logging
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CHANGE_LOG = RowChange.__tablename__
+CHANGE_LOG_RETENTION = 200000 # Newest log entries kept; an older snapshot reloads its tables in full
+CHANGE_LOG_PRUNE_EVERY = 1000 # Entries between two trims of the log (done by the triggers themselves)
+ID_CHUNK_SIZE = 500 # Changed ids re-read per IN (...) query
+GRANULARITIES = ('month', 'year')
+MAX_WINDOW = 36
+YEAR_RANGE = (1900, 2200) # Accepted year_from / year_to: series arrays are sized by the requested span
+MAX_YEAR_SPAN = 100
+
+#-----------------------------------------
+# Mirrored tables: column -> kind
+#   code  : string stored as an int32 index into a per-column vocabulary (-1 = NULL)
+#   int   : int64
+#   money : int64 cents (NULL = 0)
+#   date  : datetime64[D] (NULL = NaT)
+# Changing any listed column logs the row (AFTER UPDATE OF ... trigger).
+#-----------------------------------------
+SOURCES = {
+    'income_ledger': {'stream': 'code', 'year': 'int', 'month_index': 'int',
+                      'gross_pay': 'money', 'taxed_amount': 'money', 'net_pay': 'money'},
+    'bank_transactions': {'account': 'code', 'posted_date': 'date', 'amount': 'money', 'category': 'code'},
+    'rental_properties': {'ownership_association': 'code', 'state': 'code', 'purchase_date': 'date',
+                          'purchase_price': 'money', 'down_payment': 'money'},
+}
+
+def _trigger_statements(table, columns):
+    # last_insert_rowid() is the seq just logged while the trigger runs
+    log = (f"INSERT INTO {CHANGE_LOG}(table_name, row_id) VALUES ('{table}', old.id); "
+           f"DELETE FROM {CHANGE_LOG} WHERE last_insert_rowid() % {CHANGE_LOG_PRUNE_EVERY} = 0 "
+           f"AND seq <= last_insert_rowid() - {CHANGE_LOG_RETENTION};")
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {CHANGE_LOG}_{table}_au AFTER UPDATE OF {', '.join(columns)} "
+        f"ON {table} BEGIN {log} END",
+        f"CREATE TRIGGER IF NOT EXISTS {CHANGE_LOG}_{table}_ad AFTER DELETE ON {table} BEGIN {log} END",
+    ]
+
+def ensure_change_log():
+    """
+    Creates the row_changes table and triggers if missing. Must run after the source tables exist.
+    """
+    with db.engine.begin() as conn:
+        RowChange.__table__.create(conn, checkfirst=True)
+        for table, columns in SOURCES.items():
+            for statement in _trigger_statements(table, columns):
+                conn.execute(db.text(statement))
+
+#-----------------------------------------
+# Column tables
+#-----------------------------------------
+class ColumnTable:
+    """
+    Immutable column arrays of one table, sorted by id. patched() returns a new
+    table, so a reader holding a snapshot never sees half-applied changes.
+    Vocabularies of 'code' columns are shared and append-only (codes never change).
+    """
+
+    def __init__(self, name, kinds, vocabularies, ids, columns):
+        self.name = name
+        self.kinds = kinds
+        self.vocabularies = vocabularies # column -> (list of values, dict value -> code)
+        self.ids = ids
+        self.columns = columns
+
+    @classmethod
+    def empty(cls, name, kinds):
+        vocabularies = {column: ([], {}) for column, kind in kinds.items() if kind == 'code'}
+        table = cls(name, kinds, vocabularies, np.empty(0, np.int64), {})
+        table.columns = table._arrays([])[1]
+        return table
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def max_id(self):
+        return int(self.ids[-1]) if len(self.ids) else 0
+
+    def code(self, column, value):
+        """
+        Code of a value in a 'code' column, or None when no row has that value.
+        """
+        return self.vocabularies[column][1].get(value)
+
+    def values(self, column):
+        """
+        Vocabulary of a 'code' column (index = code).
+        """
+        return self.vocabularies[column][0]
+
+    def _encode(self, column, values):
+        vocabulary, codes = self.vocabularies[column]
+        encoded = np.empty(len(values), np.int32)
+        for index, value in enumerate(values):
+            if value is None:
+                encoded[index] = -1
+                continue
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(vocabulary)
+                vocabulary.append(value)
+            encoded[index] = code
+        return encoded
+
+    def _arrays(self, rows):
+        """
+        Converts (id, *columns) result rows to (ids, {column: array}).
+        """
+        ids = np.fromiter((row[0] for row in rows), np.int64, len(rows))
+        columns = {}
+        for position, (column, kind) in enumerate(self.kinds.items(), start=1):
+            values = [row[position] for row in rows]
+            if kind == 'code':
+                columns[column] = self._encode(column, values)
+            elif kind == 'int':
+                columns[column] = np.array(values, np.int64)
+            elif kind == 'money':
+                # int() also covers legacy REAL cells holding whole cents
+                columns[column] = np.fromiter((0 if value is None else int(value) for value in values),
+                                              np.int64, len(values))
+            else:
+                columns[column] = np.array(['NaT' if value is None else value for value in values], 'datetime64[D]')
+        return ids, columns
+
+    def loaded(self, rows):
+        ids, columns = self._arrays(rows)
+        order = np.argsort(ids, kind='stable')
+        return ColumnTable(self.name, self.kinds, self.vocabularies, ids[order],
+                           {column: array[order] for column, array in columns.items()})
+
+    def patched(self, drop_ids, rows):
+        """
+        Returns a copy without the rows in drop_ids and with rows (fresh reads of
+        changed or new rows) merged in id order.
+        """
+        keep = ~np.isin(self.ids, np.asarray(drop_ids, np.int64))
+        new_ids, new_columns = self._arrays(rows)
+        ids = np.concatenate([self.ids[keep], new_ids])
+        columns = {column: np.concatenate([array[keep], new_columns[column]]) for column, array in self.columns.items()}
+        if len(new_ids) and len(ids) > len(new_ids) and new_ids.min() <= ids[len(ids) - len(new_ids) - 1]:
+            order = np.argsort(ids, kind='stable') # A changed (or reused) id landed out of order
+            ids, columns = ids[order], {column: array[order] for column, array in columns.items()}
+        return ColumnTable(self.name, self.kinds, self.vocabularies, ids, columns)
+
+#-----------------------------------------
+# Snapshot store
+#-----------------------------------------
+class AnalyticsStore:
+    """
+    Process-wide snapshot of the SOURCES tables, refreshed on read when their versions moved.
+    """
+
+    def __init__(self):
+        self.tables = {}
+        self._versions = None # ETag of the source tables the snapshot reflects
+        self._seq = 0         # Last row_changes entry applied
+        self._lock = threading.Lock()
+        self._triggers_ready = False
+        self.stats = {'full_loads': 0, 'delta_refreshes': 0, 'rows_reread': 0}
+
+    def snapshot(self):
+        """
+        Returns {table name: ColumnTable}, brought up to date first if anything was written.
+        Must be called inside an application context.
+        """
+        versions, _ = get_table_versions(list(SOURCES))
+        if versions != self._versions:
+            with self._lock:
+                if versions != self._versions:
+                    self._refresh()
+                    self._versions = versions
+        return self.tables
+
+    def reset(self):
+        with self._lock:
+            self.tables, self._versions, self._seq = {}, None, 0
+
+    def _select(self, table, where='', params=None):
+        columns = ', '.join(('id', *SOURCES[table]))
+        return db.session.execute(db.text(f"SELECT {columns} FROM {table} {where}"), params or {}).all()
+
+    def _refresh(self):
+        if not self._triggers_ready:
+            ensure_change_log()
+            self._triggers_ready = True
+        latest, oldest = db.session.execute(db.text(f"SELECT max(seq), min(seq) FROM {CHANGE_LOG}")).one()
+        latest = latest or 0
+        # Entries this snapshot still needed were trimmed (or the log was reset): reload everything
+        stale = latest < self._seq or (oldest is not None and oldest > self._seq + 1)
+
+        tables = dict(self.tables)
+        for name, kinds in SOURCES.items():
+            table = tables.get(name)
+            if table is None or stale:
+                tables[name] = (table if table is not None else ColumnTable.empty(name, kinds)).loaded(self._select(name))
+                self.stats['full_loads'] += 1
+                continue
+            changed = [row_id for (row_id,) in db.session.execute(db.text(
+                f"SELECT DISTINCT row_id FROM {CHANGE_LOG} WHERE table_name = :table AND seq > :seq AND seq <= :latest"
+            ), {'table': name, 'seq': self._seq, 'latest': latest})]
+            rows = self._select(name, 'WHERE id > :max_id', {'max_id': table.max_id})
+            reread = [row_id for row_id in changed if row_id <= table.max_id] # Newer ids came with the rows above
+            for start in range(0, len(reread), ID_CHUNK_SIZE):
+                chunk = reread[start:start + ID_CHUNK_SIZE]
+                rows += self._select(name, f"WHERE id IN ({', '.join(str(int(row_id)) for row_id in chunk)})")
+            if changed or rows:
+                tables[name] = table.patched(changed + [row[0] for row in rows], rows)
+                self.stats['delta_refreshes'] += 1
+                self.stats['rows_reread'] += len(rows)
+        self.tables = tables
+        self._seq = latest
+
+# Process-wide snapshot
+analytics_store = AnalyticsStore()
+
+#-----------------------------------------
+# Vectorized helpers
+#-----------------------------------------
+def _month_keys(dates):
+    """
+    datetime64[D] -> year * 12 + month - 1 (NaT -> a large negative number, outside any range).
+    """
+    return dates.astype('datetime64[M]').astype(np.int64) + 1970 * 12
+
+def _rollup(keys, values, start, end):
+    """
+    Sums values (int cents) per key in [start, end]; returns an int64 array indexed by key - start.
+    float64 weights are exact for sums below 2**53 cents.
+    """
+    mask = (keys >= start) & (keys <= end)
+    sums = np.bincount(keys[mask] - start, weights=values[mask], minlength=end - start + 1)
+    return np.rint(sums).astype(np.int64)
+
+def moving_average(series, window):
+    """
+    Trailing moving average; the first window - 1 periods are NaN.
+    """
+    result = np.full(len(series), np.nan)
+    if window <= len(series):
+        sums = np.cumsum(np.concatenate([[0.0], series.astype(np.float64)]))
+        result[window - 1:] = (sums[window:] - sums[:-window]) / window
+    return result
+
+def year_over_year(series, lag):
+    """
+    (delta, ratio) against the same period lag steps earlier; NaN where there is no base.
+    """
+    delta, ratio = np.full(len(series), np.nan), np.full(len(series), np.nan)
+    if lag < len(series):
+        current, base = series[lag:].astype(np.float64), series[:-lag].astype(np.float64)
+        delta[lag:] = current - base
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio[lag:] = np.where(base != 0, (current - base) / np.abs(base), np.nan)
+    return delta, ratio
+
+def _money_list(values):
+    return [None if np.isnan(value) else format_money(from_cents(int(round(value))))
+            for value in np.asarray(values, np.float64)]
+
+def _ratio_list(values):
+    return [None if np.isnan(value) else round(float(value), 4) for value in values]
+
+def _periods(start, end, granularity):
+    if granularity == 'year':
+        return [str(key) for key in range(start, end + 1)]
+    return [f"{key // 12}-{key % 12 + 1:02d}" for key in range(start, end + 1)]
+
+def _range(keys, granularity, year_from, year_to):
+    """
+    Period keys [start, end] to report: the requested years, else the span of the data.
+    """
+    if year_from is None or year_to is None:
+        valid = keys[keys >= 0]
+        if not len(valid):
+            return None
+    if granularity == 'year':
+        start = year_from if year_from is not None else int(valid.min())
+        end = year_to if year_to is not None else int(valid.max())
+    else:
+        start = year_from * 12 if year_from is not None else int(valid.min())
+        end = year_to * 12 + 11 if year_to is not None else int(valid.max())
+    return (start, end) if start <= end else None
+
+def _trend(series, granularity, window, prefix):
+    """
+    Moving average and year-over-year fields for one series.
+    """
+    delta, ratio = year_over_year(series, 1 if granularity == 'year' else 12)
+    return {
+        f'{prefix}_moving_average': _money_list(moving_average(series, window)),
+        f'{prefix}_yoy_delta': _money_list(delta),
+        f'{prefix}_yoy_pct': _ratio_list(ratio),
+    }
+
+#-----------------------------------------
+# Dashboard series
+#-----------------------------------------
+def income_series(granularity='month', window=3, stream=None, year_from=None, year_to=None):
+    """
+    Gross / taxed / net income per period across the income ledger (or one stream),
+    with the net pay's moving average and year-over-year change.
+    """
+    table = analytics_store.snapshot()['income_ledger']
+    years = table.columns['year']
+    keys = years if granularity == 'year' else years * 12 + table.columns['month_index'] - 1
+    mask = np.ones(len(table), bool)
+    if stream is not None:
+        mask = table.columns['stream'] == (table.code('stream', stream) if table.code('stream', stream) is not None else -2)
+    keys = np.where(mask, keys, -1)
+    span = _range(keys, granularity, year_from, year_to)
+    result = {'granularity': granularity, 'periods': []}
+    if span is None:
+        return result
+    start, end = span
+    net = _rollup(keys, table.columns['net_pay'], start, end)
+    result.update({
+        'periods': _periods(start, end, granularity),
+        'gross': _money_list(_rollup(keys, table.columns['gross_pay'], start, end)),
+        'taxed': _money_list(_rollup(keys, table.columns['taxed_amount'], start, end)),
+        'net': _money_list(net),
+        **_trend(net, granularity, window, 'net'),
+    })
+    return result
+
+def cash_flow_series(granularity='month', window=3, account=None, category=None, year_from=None, year_to=None):
+    """
+    Money in / money out / net cash flow of the bank transactions per period,
+    the spending's moving average and year-over-year change, and spending per
+    category over the whole range. category='' selects uncategorized rows.
+    """
+    table = analytics_store.snapshot()['bank_transactions']
+    dates = table.columns['posted_date']
+    keys = dates.astype('datetime64[Y]').astype(np.int64) + 1970 if granularity == 'year' else _month_keys(dates)
+    mask = np.ones(len(table), bool)
+    for column, value in (('account', account), ('category', category)):
+        if value is not None:
+            code = -1 if value == '' else table.code(column, value)
+            mask &= table.columns[column] == (code if code is not None else -2)
+    keys = np.where(mask, keys, -1)
+    span = _range(keys, granularity, year_from, year_to)
+    result = {'granularity': granularity, 'periods': [], 'spending_by_category': []}
+    if span is None:
+        return result
+    start, end = span
+    amounts = table.columns['amount']
+    money_in = _rollup(keys, np.maximum(amounts, 0), start, end)
+    money_out = _rollup(keys, np.maximum(-amounts, 0), start, end)
+
+    # Spending per category code over the range (code -1 = uncategorized, shifted to bin 0)
+    in_range = (keys >= start) & (keys <= end) & (amounts < 0)
+    codes = table.columns['category'][in_range] + 1
+    by_code = np.rint(np.bincount(codes, weights=-amounts[in_range], minlength=len(table.values('category')) + 1))
+    categories = [None] + table.values('category')
+    spending = sorted(((categories[code], total) for code, total in enumerate(by_code) if total), key=lambda item: -item[1])
+
+    result.update({
+        'periods': _periods(start, end, granularity),
+        'money_in': _money_list(money_in),
+        'money_out': _money_list(money_out),
+        'net': _money_list(money_in - money_out),
+        **_trend(money_out, granularity, window, 'money_out'),
+        'spending_by_category': [{'category': name, 'total_spent': format_money(from_cents(int(total)))}
+                                 for name, total in spending],
+    })
+    return result
+
+def property_acquisitions():
+    """
+    Rental property purchases per year (count, purchase price, down payment,
+    financed amount) with running totals, plus totals per ownership association.
+    """
+    table = analytics_store.snapshot()['rental_properties']
+    price, down = table.columns['purchase_price'], table.columns['down_payment']
+    dated = ~np.isnat(table.columns['purchase_date'])
+    years = table.columns['purchase_date'][dated].astype('datetime64[Y]').astype(np.int64) + 1970
+    result = {'years': [], 'undated_count': int((~dated).sum()), 'by_ownership': []}
+    if len(years):
+        start, end = int(years.min()), int(years.max())
+        counts = np.bincount(years - start, minlength=end - start + 1)
+        price_sums = _rollup(years, price[dated], start, end)
+        down_sums = _rollup(years, down[dated], start, end)
+        # Per property, as the portfolio summary and loan_terms() count it: a down payment above the price finances nothing
+        financed_sums = _rollup(years, np.maximum(price[dated] - down[dated], 0), start, end)
+        result['years'] = [{
+            'year': start + index,
+            'count': int(counts[index]),
+            'purchase_price': format_money(from_cents(int(price_sums[index]))),
+            'down_payment': format_money(from_cents(int(down_sums[index]))),
+            'financed': format_money(from_cents(int(financed_sums[index]))),
+            'cumulative_count': int(cumulative_count),
+            'cumulative_purchase_price': format_money(from_cents(int(cumulative_price))),
+            'cumulative_down_payment': format_money(from_cents(int(cumulative_down))),
+        } for index, (cumulative_count, cumulative_price, cumulative_down)
+          in enumerate(zip(np.cumsum(counts), np.cumsum(price_sums), np.cumsum(down_sums)))]
+
+    owners = table.columns['ownership_association']
+    if len(owners):
+        bins = len(table.values('ownership_association'))
+        counts = np.bincount(owners[owners >= 0], minlength=bins)
+        price_sums = np.rint(np.bincount(owners[owners >= 0], weights=price[owners >= 0], minlength=bins))
+        result['by_ownership'] = [{
+            'ownership_association': name,
+            'count': int(counts[code]),
+            'purchase_price': format_money(from_cents(int(price_sums[code]))),
+        } for code, name in enumerate(table.values('ownership_association')) if counts[code]]
+    return result
+
+def overview(today=None):
+    """
+    Trailing-twelve-month figures for the overview dashboards, each with the
+    change against the twelve months before.
+    """
+    today = today or date.today()
+    current = today.year * 12 + today.month - 1
+    tables = analytics_store.snapshot()
+    income, transactions = tables['income_ledger'], tables['bank_transactions']
+    income_keys = income.columns['year'] * 12 + income.columns['month_index'] - 1
+    transaction_keys = _month_keys(transactions.columns['posted_date'])
+    amounts = transactions.columns['amount']
+
+    def trailing(keys, values):
+        # [previous 12 months, last 12 months] ending with the current month
+        last, previous = _rollup(keys, values, current - 23, current).reshape(2, 12).sum(axis=1)[::-1]
+        delta, ratio = year_over_year(np.array([previous, last]), 1)
+        return {'last_12_months': format_money(from_cents(int(last))),
+                'previous_12_months': format_money(from_cents(int(previous))),
+                'change_pct': _ratio_list(ratio)[1]}
+
+    properties = tables['rental_properties']
+    return {
+        'as_of': today.isoformat(),
+        'income_net': trailing(income_keys, income.columns['net_pay']),
+        'money_in': trailing(transaction_keys, np.maximum(amounts, 0)),
+        'spending': trailing(transaction_keys, np.maximum(-amounts, 0)),
+        'properties': {
+            'count': len(properties),
+            'purchase_price': format_money(from_cents(int(properties.columns['purchase_price'].sum()))),
+            'down_payment': format_money(from_cents(int(properties.columns['down_payment'].sum()))),
+        },
+    }
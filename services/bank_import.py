@@ -0,0 +1,369 @@
+# services/bank_import.py
+###########################################
+# - Bank / Credit Card Statement Import (CSV & OFX)
+###########################################
+#
+# Pipeline, one pass over the uploaded file:
+#   parse     : a generator per file format (PARSERS) yields one record per
+#               transaction, reading the file line by line or in fixed-size chunks
+#   normalize : per-institution CSV layouts (CSV_PROFILES) map columns to
+#               date / amount / description; amounts become signed Decimals
+#   dedup     : every row gets a hashed natural key, unique per account, so an
+#               overlapping or repeated export only adds the rows not yet stored
+#   categorize: each batch goes through the compiled category rules
+#               (services/categorization.py) before it is written
+#   insert    : rows are written in batches of IMPORT_BATCH_SIZE with one
+#               INSERT ... ON CONFLICT DO NOTHING executemany per batch
+#
+# The whole import is one transaction: a failing file leaves the ledger untouched.
+# Memory is the current batch plus, for rows without a bank id (CSV), one
+# digest per row for the occurrence counter in dedup_keys() (~130 bytes/row).
+###########################################
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, BankTransaction, TransactionImport
+from services.money import parse_money
+from services.categorization import load_matcher
+from services.versioning import bump_table_versions
+from datetime import datetime
+import csv
+import hashlib
+import html
+import io
+import re
+
+IMPORT_BATCH_SIZE = 2000
+MAX_REPORTED_ERRORS = 50 # Row errors returned to the client; the rest are only counted
+OFX_READ_SIZE = 64 * 1024
+
+#-----------------------------------------
+# Accounts with a statement ledger. Adding an account only needs an entry here.
+#   label       - Human readable name used in API messages and logs
+#   kind        - 'bank' or 'credit_card'
+#   csv_profile - Key of CSV_PROFILES describing the institution's CSV export
+#-----------------------------------------
+BANK_ACCOUNTS = {
+    'n26': {'label': 'N26', 'kind': 'bank', 'csv_profile': 'n26'},
+    'scu': {'label': 'SCU', 'kind': 'bank', 'csv_profile': 'generic'},
+    'usaa': {'label': 'USAA', 'kind': 'bank', 'csv_profile': 'usaa'},
+    'chase': {'label': 'Chase', 'kind': 'credit_card', 'csv_profile': 'chase'},
+    'capital_one': {'label': 'Capital One', 'kind': 'credit_card', 'csv_profile': 'capital_one'},
+}
+
+def get_bank_account(account):
+    """
+    Returns the registry entry for an account key, or None if the account is unknown.
+    """
+    return BANK_ACCOUNTS.get(account)
+
+#-----------------------------------------
+# CSV layouts. Each field lists the header names it may appear under (first
+# match wins, compared case-insensitively). A layout has either 'amount'
+# (signed) or 'debit' / 'credit' (unsigned, debit = money out).
+#-----------------------------------------
+CSV_PROFILES = {
+    'n26': {
+        'date': ('Booking Date', 'Date', 'Value Date'),
+        'amount': ('Amount (EUR)', 'Amount'),
+        'description': ('Partner Name', 'Payee'),
+        'memo': ('Payment Reference', 'Payment reference'),
+        'date_formats': ('%Y-%m-%d',),
+    },
+    'usaa': {
+        'date': ('Date',),
+        'amount': ('Amount',),
+        'description': ('Description',),
+        'memo': ('Original Description',),
+        'date_formats': ('%Y-%m-%d', '%m/%d/%Y'),
+    },
+    'chase': {
+        'date': ('Post Date', 'Posting Date', 'Transaction Date'),
+        'amount': ('Amount',),
+        'description': ('Description',),
+        'memo': ('Memo',),
+        'date_formats': ('%m/%d/%Y',),
+    },
+    'capital_one': {
+        'date': ('Posted Date', 'Transaction Date'),
+        'debit': ('Debit',),
+        'credit': ('Credit',),
+        'description': ('Description',),
+        'date_formats': ('%Y-%m-%d', '%m/%d/%Y'),
+    },
+    'generic': {
+        'date': ('Date', 'Posted Date', 'Posting Date', 'Transaction Date'),
+        'amount': ('Amount',),
+        'debit': ('Debit', 'Withdrawal', 'Withdrawals'),
+        'credit': ('Credit', 'Deposit', 'Deposits'),
+        'description': ('Description', 'Payee', 'Name'),
+        'memo': ('Memo', 'Notes'),
+        'date_formats': ('%Y-%m-%d', '%m/%d/%Y', '%m/%d/%y', '%d.%m.%Y'),
+    },
+}
+
+class StatementError(ValueError):
+    """
+    The file as a whole cannot be imported (unknown format, missing columns).
+    """
+
+def _date_parser(formats):
+    """
+    Returns a date parser for one file. Exports repeat the same few hundred
+    dates across many rows, so each distinct string goes through strptime once.
+    """
+    parsed = {}
+
+    def parse(value):
+        posted_date = parsed.get(value)
+        if posted_date is None:
+            for date_format in formats:
+                try:
+                    posted_date = datetime.strptime(value.strip(), date_format).date()
+                    break
+                except ValueError:
+                    continue
+            else:
+                raise ValueError(f'Unrecognized date: {value!r}')
+            parsed[value] = posted_date
+        return posted_date
+
+    return parse
+
+def _parse_amount(value):
+    # Exports write thousands separators, currency signs and (12.50) for negatives
+    value = value.strip().replace(',', '').replace('$', '').replace('€', '')
+    if value.startswith('(') and value.endswith(')'):
+        value = '-' + value[1:-1]
+    return parse_money(value)
+
+def _find_columns(header, profile):
+    """
+    Maps each profile field to its column index in the header row.
+    """
+    positions = {name.strip().lower(): index for index, name in enumerate(header)}
+    columns = {}
+    for field in ('date', 'amount', 'debit', 'credit', 'description', 'memo'):
+        for name in profile.get(field, ()):
+            if name.lower() in positions:
+                columns[field] = positions[name.lower()]
+                break
+    if 'date' not in columns or 'description' not in columns:
+        raise StatementError('CSV header needs a date and a description column')
+    if 'amount' not in columns and 'debit' not in columns and 'credit' not in columns:
+        raise StatementError('CSV header needs an amount column (or debit / credit columns)')
+    return columns
+
+def parse_csv(text, profile):
+    """
+    Yields one record per CSV data row: {'line', 'posted_date', 'amount',
+    'description', 'memo', 'fitid'}, or {'line', 'error'} for a row that cannot be read.
+    """
+    reader = csv.reader(text)
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = _find_columns(header, profile)
+    parse_date = _date_parser(profile['date_formats'])
+    date_col, description_col = columns['date'], columns['description']
+    amount_col, debit_col, credit_col = columns.get('amount'), columns.get('debit'), columns.get('credit')
+    memo_col = columns.get('memo')
+    width = max(columns.values()) + 1
+
+    for row in reader:
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        line = reader.line_num
+        if len(row) < width:
+            yield {'line': line, 'error': 'Row has too few columns'}
+            continue
+        try:
+            if amount_col is not None and row[amount_col].strip():
+                amount = _parse_amount(row[amount_col])
+            else:
+                debit = row[debit_col].strip() if debit_col is not None else ''
+                credit = row[credit_col].strip() if credit_col is not None else ''
+                amount = _parse_amount(credit) if credit else -abs(_parse_amount(debit))
+            yield {
+                'line': line,
+                'posted_date': parse_date(row[date_col]),
+                'amount': amount,
+                'description': row[description_col].strip(),
+                'memo': row[memo_col].strip() if memo_col is not None else None,
+                'fitid': None
+            }
+        except ValueError as e:
+            yield {'line': line, 'error': str(e)}
+
+_OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+
+def _ofx_tags(text):
+    """
+    Yields (closing, tag, value) for every tag of an OFX file, reading it in
+    OFX_READ_SIZE chunks. Works for SGML (OFX 1.x, unclosed leaf tags) and XML (2.x).
+    """
+    pending = ''
+    while True:
+        chunk = text.read(OFX_READ_SIZE)
+        buffer = pending + chunk
+        # Keep a possibly incomplete last tag for the next chunk
+        cut = max(buffer.rfind('<'), 0) if chunk else len(buffer)
+        for match in _OFX_TAG.finditer(buffer, 0, cut):
+            # Values are SGML/XML text: 'AT&amp;T' is stored (and matched by rules) as 'AT&T'
+            yield match.group(1) == '/', match.group(2).upper(), html.unescape(match.group(3).strip())
+        if not chunk:
+            return
+        pending = buffer[cut:]
+
+def parse_ofx(text, profile=None):
+    """
+    Yields one record per <STMTTRN> of an OFX / QFX file (same shape as parse_csv).
+    """
+    parse_date = _date_parser(('%Y%m%d',))
+    current, count = None, 0
+    for closing, tag, value in _ofx_tags(text):
+        if tag == 'STMTTRN':
+            if not closing:
+                current, count = {}, count + 1
+                continue
+            record, current = current, None
+            if record is None:
+                continue
+            try:
+                yield {
+                    'line': count, # Transaction number; OFX has no meaningful lines
+                    'posted_date': parse_date(record.get('DTPOSTED', '')[:8]),
+                    'amount': _parse_amount(record.get('TRNAMT', '')),
+                    'description': record.get('NAME') or record.get('PAYEE') or record.get('MEMO') or '',
+                    'memo': record.get('MEMO'),
+                    'fitid': record.get('FITID') or None
+                }
+            except ValueError as e:
+                yield {'line': count, 'error': str(e)}
+        elif current is not None and not closing and value:
+            current[tag] = value
+
+PARSERS = {
+    'csv': parse_csv,
+    'ofx': parse_ofx,
+}
+
+def detect_format(filename, head):
+    """
+    Picks the parser for an upload from its extension, falling back to its first bytes.
+    """
+    extension = (filename or '').rsplit('.', 1)[-1].lower()
+    if extension in ('ofx', 'qfx'):
+        return 'ofx'
+    if extension == 'csv':
+        return 'csv'
+    return 'ofx' if head.lstrip().upper().startswith((b'OFXHEADER', b'<?XML', b'<OFX')) else 'csv'
+
+#-----------------------------------------
+# Deduplication
+#-----------------------------------------
+def _natural_key(account, record):
+    if record['fitid']:
+        return f"{account}\x1ffitid\x1f{record['fitid']}"
+    description = ' '.join(record['description'].lower().split())
+    return f"{account}\x1f{record['posted_date'].isoformat()}\x1f{record['amount']}\x1f{description}"
+
+def dedup_keys(account, records):
+    """
+    Adds 'dedup_key' to each record: a 128-bit hash of the bank's FITID when
+    present, otherwise of (date, amount, normalized description) plus the
+    occurrence number of that triple in the file, so two identical coffees on
+    the same day stay two rows, yet re-importing the file adds neither again.
+    """
+    seen = {}
+    for record in records:
+        if 'error' not in record:
+            digest = hashlib.blake2b(_natural_key(account, record).encode(), digest_size=16).digest()
+            if not record['fitid']: # A bank id is unique by itself
+                occurrence = seen.get(digest, 0)
+                seen[digest] = occurrence + 1
+                if occurrence:
+                    digest = hashlib.blake2b(digest + occurrence.to_bytes(4, 'big'), digest_size=16).digest()
+            record['dedup_key'] = digest.hex()
+        yield record
+
+#-----------------------------------------
+# Import
+#-----------------------------------------
+INSERT_COLUMNS = ('account', 'posted_date', 'amount', 'description', 'memo', 'fitid', 'dedup_key', 'import_id',
+                  'category', 'category_rule_id', 'category_source')
+
+def _insert_statement():
+    statement = sqlite_insert(BankTransaction.__table__).values(
+        {column: db.bindparam(column) for column in INSERT_COLUMNS}
+    ).on_conflict_do_nothing(index_elements=['account', 'dedup_key'])
+    return str(statement.compile(dialect=db.engine.dialect, compile_kwargs={'render_postcompile': True}))
+
+def _categorized(batch, matcher):
+    """
+    Appends (category, category_rule_id, category_source) to each parameter tuple of a batch.
+    """
+    results = matcher.match_many([row[3] for row in batch])
+    return [row + (category, rule_id, 'rule' if rule_id else None)
+            for row, (category, rule_id) in zip(batch, results)]
+
+def _insert_batch(sql, rows):
+    """
+    Inserts a batch of parameter tuples (values already in storage form: ISO
+    dates, integer cents as the Money type stores them), skipping rows whose (account, dedup_key) is already
+    stored. Goes straight to the driver's executemany, since per-row type
+    processing would otherwise cost more than the insert itself.
+    Returns the number of rows actually inserted.
+    """
+    return max(db.session.connection().exec_driver_sql(sql, rows).rowcount, 0)
+
+def import_statement(account, stream, filename=None, file_format=None):
+    """
+    Imports a CSV or OFX statement (a seekable binary file object) into an account's ledger (not committed).
+    Returns (TransactionImport, errors) where errors lists the first
+    MAX_REPORTED_ERRORS rejected rows as {'line', 'error'}.
+    Raises ValueError when the account, format or file layout is not supported.
+    """
+    info = get_bank_account(account)
+    if info is None:
+        raise StatementError(f'Unknown account: {account}')
+    if file_format is None:
+        file_format = detect_format(filename, stream.read(64))
+        stream.seek(0)
+    parser = PARSERS.get(file_format)
+    if parser is None:
+        raise StatementError(f"format must be one of: {', '.join(PARSERS)}")
+
+    log = TransactionImport(account=account, filename=filename, file_format=file_format)
+    db.session.add(log)
+    db.session.flush() # Assigns log.id for the rows below
+
+    # newline='' lets the csv module handle quoted line breaks; utf-8-sig drops Excel's BOM
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', errors='replace', newline='')
+    sql = _insert_statement()
+    matcher = load_matcher()
+    errors, batch = [], []
+    rows_read = inserted = rejected = 0
+    try:
+        for record in dedup_keys(account, parser(text, CSV_PROFILES[info['csv_profile']])):
+            rows_read += 1
+            if 'error' in record:
+                rejected += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append(record)
+                continue
+            batch.append((account, record['posted_date'].isoformat(), int(record['amount'].scaleb(2)),
+                          record['description'][:255], record['memo'], record['fitid'],
+                          record['dedup_key'], log.id))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                inserted += _insert_batch(sql, _categorized(batch, matcher))
+                batch = []
+        if batch:
+            inserted += _insert_batch(sql, _categorized(batch, matcher))
+    finally:
+        text.detach() # Leave the caller's stream open
+
+    log.rows_read, log.inserted, log.rejected = rows_read, inserted, rejected
+    log.duplicates = rows_read - rejected - inserted
+    if inserted:
+        bump_table_versions(db.session, [BankTransaction.__tablename__])
+    return log, errors
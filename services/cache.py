@@ -0,0 +1,174 @@
+# services/cache.py
+###########################################
+# - In-process Query Result Cache
+###########################################
+#
+# Read helpers decorated with @cached_query(<table>, ...) keep their results in
+# a small LRU cache keyed by function + arguments. Entries expire after a TTL
+# and are dropped as soon as a transaction that wrote one of their tables
+# commits (services/versioning.py records the written tables in
+# session.info['changed_tables']; the after_commit listener below evicts them).
+#
+# Cached values are shared between requests: only cache plain data (dicts,
+# lists, Decimals), never ORM instances, and never mutate a cached result.
+# In a multi-process deployment other workers only see a commit once the TTL
+# runs out, so keep QUERY_CACHE_TTL short there.
+###########################################
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from collections import OrderedDict
+from functools import wraps
+import threading
+import time
+
+class QueryCache:
+    """
+    Thread-safe LRU cache with per-entry TTL and table-based invalidation.
+    """
+
+    def __init__(self, max_entries=256, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = True
+        self._entries = OrderedDict() # key -> (value, expires_at, tables)
+        self._keys_by_table = {}       # table -> set of keys
+        self._generations = {}         # table -> number of invalidations so far
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+        self._namespaces = {}          # namespace -> {'hits': n, 'misses': n}
+
+    def init_app(self, app):
+        """
+        Reads QUERY_CACHE_ENABLED, QUERY_CACHE_MAX_ENTRIES and QUERY_CACHE_TTL from the app config.
+        """
+        self.enabled = app.config.get('QUERY_CACHE_ENABLED', True)
+        self.max_entries = app.config.get('QUERY_CACHE_MAX_ENTRIES', self.max_entries)
+        self.ttl = app.config.get('QUERY_CACHE_TTL', self.ttl)
+        self.clear()
+
+    def get(self, key):
+        """
+        Returns (True, value) on a hit, (False, None) on a miss or expired entry.
+        """
+        with self._lock:
+            namespace = self._namespaces.setdefault(key[0], {'hits': 0, 'misses': 0})
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] < time.monotonic():
+                self._remove(key)
+                self._stats['expirations'] += 1
+                entry = None
+            if entry is None:
+                self._stats['misses'] += 1
+                namespace['misses'] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            namespace['hits'] += 1
+            return True, entry[0]
+
+    def generation(self, tables):
+        """
+        Returns a token describing the invalidation state of the given tables.
+        Take it before running the query and pass it to set().
+        """
+        with self._lock:
+            return tuple(self._generations.get(table, 0) for table in tables)
+
+    def set(self, key, value, tables, generation):
+        """
+        Stores a value that depends on the given tables, evicting least recently used entries.
+        The value is dropped if one of the tables was invalidated since generation() was taken,
+        so a query racing with a commit cannot cache pre-commit data.
+        """
+        with self._lock:
+            if generation != tuple(self._generations.get(table, 0) for table in tables):
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + self.ttl, tables)
+            for table in tables:
+                self._keys_by_table.setdefault(table, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self._stats['evictions'] += 1
+
+    def invalidate_tables(self, tables):
+        """
+        Drops every entry that depends on any of the given tables.
+        """
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+                for key in self._keys_by_table.pop(table, ()):
+                    if key in self._entries:
+                        self._remove(key)
+                        self._stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_table.clear()
+
+    def stats(self):
+        """
+        Returns hit/miss counters for monitoring, overall and per cached function.
+        """
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {
+                **self._stats,
+                'hit_rate': round(self._stats['hits'] / lookups, 4) if lookups else None,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'enabled': self.enabled,
+                'by_function': {name: dict(counts) for name, counts in self._namespaces.items()},
+            }
+
+    def _remove(self, key):
+        # Caller holds the lock
+        _, _, tables = self._entries.pop(key)
+        for table in tables:
+            keys = self._keys_by_table.get(table)
+            if keys:
+                keys.discard(key)
+
+# Process-wide cache used by @cached_query
+query_cache = QueryCache()
+
+def cached_query(*tables):
+    """
+    Caches a read helper's return value, keyed by its qualified name and arguments
+    (which must be hashable). The entry is invalidated when any of the given tables is written.
+    """
+    def decorator(func):
+        namespace = f"{func.__module__}.{func.__qualname__}"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not query_cache.enabled:
+                return func(*args, **kwargs)
+            key = (namespace, args, tuple(sorted(kwargs.items())))
+            hit, value = query_cache.get(key)
+            if hit:
+                return value
+            generation = query_cache.generation(tables)
+            value = func(*args, **kwargs)
+            query_cache.set(key, value, tables, generation)
+            return value
+        return wrapper
+    return decorator
+
+#-----------------------------------------
+# Write-through invalidation
+#-----------------------------------------
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed_tables(session):
+    changed = session.info.pop('changed_tables', None)
+    if changed:
+        query_cache.invalidate_tables(changed)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back_tables(session):
+    session.info.pop('changed_tables', None)
@@ -0,0 +1,241 @@
+# services/categorization.py
+###########################################
+# - Transaction Categorization Rules
+###########################################
+#
+# A CategoryRule maps a description pattern to a spending category:
+#   contains : case-insensitive substring, e.g. 'starbucks' -> 'Dining'
+#   regex    : case-insensitive regular expression (no capturing groups)
+# When several rules match a description, the lowest priority number wins (then the oldest rule).
+#
+# All rules are compiled into one RuleMatcher instead of being tried one by
+# one per row. Keyword rules become a single trie-shaped regex, e.g. amazon,
+# amzn and uber -> (?:am(?:azon|zn)|uber), so each position of a description
+# costs one walk down the trie whatever the number of rules. The trie sits in
+# a lookahead, so every start position is tried (keywords may overlap), and the
+# longest keyword found at a position stands for all of its prefixes: each
+# keyword carries the strongest rank among the keywords it starts with.
+# Regex rules are joined into alternations of named groups; after a hit, only
+# the rules stronger than it are searched again, until none of them matches.
+# Batches are matched over their distinct descriptions only.
+#
+# Transactions remember the rule that categorized them (category_rule_id), so
+# after a rule changes only the rows it used to match, plus the rows its new
+# pattern matches, are re-evaluated (recategorize). Rows categorized by hand
+# (category_source = 'manual') are never touched by rules.
+###########################################
+
+from models import db, BankTransaction, CategoryRule
+from services.versioning import bump_table_versions
+from functools import lru_cache
+import bisect
+import re
+
+MATCH_TYPES = ('contains', 'regex')
+DEFAULT_PRIORITY = 100
+RECATEGORIZE_CHUNK_SIZE = 5000
+UNCATEGORIZED = (None, None) # (category, rule_id)
+
+def validate_rule(data, partial=False):
+    """
+    Checks a rule payload ({'category', 'pattern', 'match_type', 'priority'}).
+    Returns the cleaned fields or raises ValueError with a client-facing message.
+    With partial=True only the fields present are checked (updates).
+    """
+    if not isinstance(data, dict):
+        raise ValueError('Expected a JSON object')
+    cleaned = {}
+    if 'category' in data or not partial:
+        category = data.get('category')
+        if not isinstance(category, str) or not category.strip() or len(category.strip()) > 50:
+            raise ValueError('category must be a non-empty string of at most 50 characters')
+        cleaned['category'] = category.strip()
+    if 'match_type' in data or not partial:
+        match_type = data.get('match_type') or 'contains'
+        if match_type not in MATCH_TYPES:
+            raise ValueError(f"match_type must be one of: {', '.join(MATCH_TYPES)}")
+        cleaned['match_type'] = match_type
+    if 'pattern' in data or not partial:
+        pattern = data.get('pattern')
+        if not isinstance(pattern, str) or not pattern.strip() or len(pattern) > 255:
+            raise ValueError('pattern must be a non-empty string of at most 255 characters')
+        cleaned['pattern'] = pattern.strip()
+    if 'priority' in data or not partial:
+        priority = data.get('priority', DEFAULT_PRIORITY)
+        if not isinstance(priority, int) or isinstance(priority, bool):
+            raise ValueError('priority must be an integer')
+        cleaned['priority'] = priority
+    if cleaned.get('match_type', 'contains') == 'regex' and 'pattern' in cleaned:
+        try:
+            # Compiled the way RuleMatcher embeds it, so e.g. a mid-pattern inline flag '(?i)' is caught here
+            compiled = re.compile(f"(?P<r0>{cleaned['pattern']})", re.IGNORECASE)
+        except re.error as e:
+            raise ValueError(f'Invalid regex: {e}')
+        if compiled.groups > 1:
+            raise ValueError('regex rules cannot use capturing groups; use (?:...) instead')
+    return cleaned
+
+def _trie_regex(words):
+    """
+    Builds a regex matching any of the (lowercase) words, shaped as a trie so
+    shared prefixes are tested once. At a given position it matches the longest word.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f'(?:{pattern})?' if '' in node else pattern
+
+    return build(trie)
+
+class RuleMatcher:
+    """
+    Compiled form of a rule set. rules are (id, category, pattern, match_type)
+    tuples ordered from the strongest to the weakest rule.
+    """
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self._keyword_rank = {} # lowercase keyword -> rank of the strongest rule using it
+        self._regex_parts = [] # (rank, named group) of the regex rules, strongest first
+        for rank, (rule_id, category, pattern, match_type) in enumerate(self.rules):
+            if match_type == 'regex':
+                self._regex_parts.append((rank, f'(?P<r{rank}>{pattern})'))
+            else:
+                self._keyword_rank.setdefault(pattern.lower(), rank)
+        # A match stands for every keyword it starts with: keep the strongest rank among them
+        self._prefix_rank = {keyword: min(self._keyword_rank.get(keyword[:length], rank)
+                                          for length in range(1, len(keyword) + 1))
+                             for keyword, rank in self._keyword_rank.items()}
+        # Zero-width lookahead: finditer tries every start position, so overlapping keywords are all seen
+        self._keywords = re.compile(f'(?=({_trie_regex(self._keyword_rank)}))') if self._keyword_rank else None
+        self._regex_ranks = [rank for rank, _part in self._regex_parts]
+        self._regexes = {} # n -> alternation of the n strongest regex rules, compiled on demand
+        # The full alternation is compiled now: a rule set that cannot be combined fails when it is loaded
+        # (e.g. while saving the rule), not on a later import
+        if self._regex_parts:
+            self._regex_alternation(len(self._regex_parts))
+
+    def _regex_alternation(self, count):
+        regex = self._regexes.get(count)
+        if regex is None:
+            regex = self._regexes[count] = re.compile(
+                '|'.join(part for _rank, part in self._regex_parts[:count]), re.IGNORECASE)
+        return regex
+
+    def _best_rank(self, description):
+        best = None
+        if self._keywords is not None:
+            for match in self._keywords.finditer(description.lower()):
+                rank = self._prefix_rank[match.group(1)]
+                if best is None or rank < best:
+                    best = rank
+        # A search only reports one of the regex rules that match; retry with the rules
+        # stronger than each hit (and than the best keyword) until none of them matches
+        while True:
+            count = len(self._regex_ranks) if best is None else bisect.bisect_left(self._regex_ranks, best)
+            if not count:
+                return best
+            match = self._regex_alternation(count).search(description)
+            if match is None:
+                return best
+            best = int(match.lastgroup[1:])
+
+    def match(self, description):
+        """
+        Returns (category, rule_id) of the strongest matching rule, or (None, None).
+        """
+        rank = self._best_rank(description or '')
+        if rank is None:
+            return UNCATEGORIZED
+        rule_id, category, _pattern, _match_type = self.rules[rank]
+        return category, rule_id
+
+    def match_many(self, descriptions):
+        """
+        Categorizes a batch, matching each distinct description once.
+        Returns a list of (category, rule_id) aligned with descriptions.
+        """
+        results = {description: self.match(description) for description in set(descriptions)}
+        return [results[description] for description in descriptions]
+
+    def matches_any(self, description):
+        """
+        True when at least one rule of this set matches (any rank).
+        """
+        return self._best_rank(description or '') is not None
+
+@lru_cache(maxsize=8)
+def _compile(rules):
+    return RuleMatcher(rules)
+
+def load_matcher(rule_ids=None):
+    """
+    Returns the RuleMatcher for the stored rules (or only the given rule ids).
+    The rule table is tiny, so it is read every time; compiling is what is cached.
+    """
+    query = db.session.query(CategoryRule.id, CategoryRule.category, CategoryRule.pattern, CategoryRule.match_type)
+    if rule_ids is not None:
+        query = query.filter(CategoryRule.id.in_(rule_ids))
+    rules = query.order_by(CategoryRule.priority, CategoryRule.id).all()
+    return _compile(tuple(tuple(rule) for rule in rules))
+
+def _escape_like(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def recategorize(changed_rule_ids=None):
+    """
+    Re-applies the rules to rule-categorized and uncategorized transactions (not committed).
+    With changed_rule_ids (rules just created, edited or deleted) only rows that
+    one of those rules categorized before, or whose description one of them
+    matches now, are re-evaluated; otherwise every row is.
+    Rows are read in id order in chunks and only rows whose category changes are written.
+    Returns the number of rows updated.
+    """
+    matcher = load_matcher()
+    table = BankTransaction.__table__
+    scope = db.or_(table.c.category_source.is_(None), table.c.category_source != 'manual')
+    probe = None
+    if changed_rule_ids is not None:
+        changed = set(changed_rule_ids)
+        changed_rules = db.session.query(CategoryRule.match_type, CategoryRule.pattern).filter(
+            CategoryRule.id.in_(changed)).all()
+        if all(match_type == 'contains' and pattern.isascii() for match_type, pattern in changed_rules):
+            # LIKE is case-insensitive for ASCII, so SQLite can pick the candidate rows by itself
+            scope = db.and_(scope, db.or_(table.c.category_rule_id.in_(changed), *[
+                table.c.description.like(f"%{_escape_like(pattern)}%", escape='\\')
+                for _match_type, pattern in changed_rules]))
+        else:
+            probe = load_matcher(changed)
+    update_sql = ("UPDATE bank_transactions SET category = ?, category_rule_id = ?, category_source = ? "
+                  "WHERE id = ?")
+    updated, last_id = 0, 0
+    while True:
+        rows = db.session.execute(
+            db.select(table.c.id, table.c.description, table.c.category, table.c.category_rule_id)
+            .where(table.c.id > last_id, scope)
+            .order_by(table.c.id).limit(RECATEGORIZE_CHUNK_SIZE)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        if probe is not None:
+            rows = [row for row in rows if row.category_rule_id in changed or probe.matches_any(row.description)]
+        results = matcher.match_many([row.description for row in rows])
+        changes = [(category, rule_id, 'rule' if rule_id else None, row.id)
+                   for row, (category, rule_id) in zip(rows, results)
+                   if (category, rule_id) != (row.category, row.category_rule_id)]
+        if changes:
+            db.session.connection().exec_driver_sql(update_sql, changes)
+            updated += len(changes)
+    if updated:
+        bump_table_versions(db.session, [BankTransaction.__tablename__])
+    return updated
@@ -0,0 +1,318 @@
+# services/document_jobs.py
+###########################################
+# - Background Document Jobs (thumbnails & text extraction)
+###########################################
+#
+# New uploads get one DocumentJob row per kind, written in the same
+# transaction as the UploadedFile, so queued work survives restarts. A small
+# pool of worker threads claims jobs atomically (single UPDATE ... RETURNING),
+# runs them outside any request, and rolls the per-job results up into
+# UploadedFile.processing_status.
+#
+#   thumbnail    : JPEG preview of an image, or of the first page image of a scanned PDF
+#   extract_text : PDF text layer, plain text files, OCR for images when pytesseract is installed
+#
+# Pillow / pypdf / pytesseract are optional at runtime: a job whose library
+# is missing is marked 'skipped' instead of failing. Failed jobs are retried
+# with a growing delay up to MAX_ATTEMPTS.
+###########################################
+
+from flask import current_app
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session, exc as orm_exc
+from models import db, UploadedFile, DocumentJob
+from datetime import datetime, timedelta
+import logging
+import os
+import threading
+
+JOB_KINDS = ('thumbnail', 'extract_text')
+MAX_ATTEMPTS = 3
+RETRY_DELAY_SECONDS = 30  # Multiplied by the attempt number
+LEASE_SECONDS = 600       # A 'running' job older than this is assumed orphaned by a crash
+THUMBNAIL_SIZE = (320, 320)
+MAX_TEXT_CHARS = 1_000_000
+
+logger = logging.getLogger(__name__)
+
+class JobSkipped(Exception):
+    """
+    Raised by a handler when the job cannot apply (file type, missing optional library).
+    """
+
+#-----------------------------------------
+# Queueing
+#-----------------------------------------
+def queue_document_jobs(uploaded_file):
+    """
+    Adds one pending job per kind for a file to the session (not committed).
+    The worker is woken once the surrounding transaction commits.
+    """
+    if uploaded_file.id is None:
+        db.session.flush() # Assigns uploaded_file.id
+    for kind in JOB_KINDS:
+        db.session.add(DocumentJob(file_id=uploaded_file.id, kind=kind))
+    uploaded_file.processing_status = 'pending'
+    db.session.info['document_jobs_queued'] = True
+
+@event.listens_for(Session, 'after_commit')
+def _wake_worker(session):
+    if session.info.pop('document_jobs_queued', False):
+        document_worker.notify()
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_queued_flag(session):
+    session.info.pop('document_jobs_queued', None)
+
+#-----------------------------------------
+# Handlers
+#-----------------------------------------
+def _upload_path(relative):
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], relative)
+
+def _is_pdf(path):
+    with open(path, 'rb') as source:
+        return source.read(5) == b'%PDF-'
+
+def _thumbnail_name(uploaded_file):
+    # Content-addressed like the blob itself, so duplicate uploads share one preview
+    if uploaded_file.sha256:
+        return f"thumbs/{uploaded_file.sha256[:2]}/{uploaded_file.sha256}.jpg"
+    return f"thumbs/file-{uploaded_file.id}.jpg"
+
+def _open_preview_image(path):
+    """
+    Returns a PIL image to preview, or None when the file has nothing to show.
+    """
+    from PIL import Image, UnidentifiedImageError
+    if _is_pdf(path):
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            raise JobSkipped('pypdf is not installed')
+        reader = PdfReader(path)
+        if not reader.pages:
+            return None
+        # Scanned documents carry each page as one embedded image
+        images = reader.pages[0].images
+        return images[0].image if images else None
+    try:
+        return Image.open(path)
+    except UnidentifiedImageError:
+        return None
+
+def make_thumbnail(uploaded_file):
+    try:
+        import PIL # noqa: F401
+    except ImportError:
+        raise JobSkipped('Pillow is not installed')
+    relative = _thumbnail_name(uploaded_file)
+    target = _upload_path(relative)
+    if not os.path.exists(target):
+        image = _open_preview_image(_upload_path(uploaded_file.stored_name))
+        if image is None:
+            raise JobSkipped('No preview available for this file')
+        image.thumbnail(THUMBNAIL_SIZE)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp_path = f"{target}.{threading.get_ident()}.tmp"
+        image.convert('RGB').save(tmp_path, 'JPEG', quality=80)
+        os.replace(tmp_path, target)
+    uploaded_file.thumbnail_path = relative
+
+def extract_text(uploaded_file):
+    if uploaded_file.sha256:
+        # Identical content was already extracted for another upload
+        previous = db.session.execute(
+            select(UploadedFile.extracted_text).where(
+                UploadedFile.sha256 == uploaded_file.sha256,
+                UploadedFile.id != uploaded_file.id,
+                UploadedFile.extracted_text.is_not(None)
+            ).limit(1)
+        ).scalar()
+        if previous is not None:
+            uploaded_file.extracted_text = previous
+            return
+
+    path = _upload_path(uploaded_file.stored_name)
+    filetype = uploaded_file.filetype or ''
+    if _is_pdf(path):
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            raise JobSkipped('pypdf is not installed')
+        parts, length = [], 0
+        for page in PdfReader(path).pages:
+            text = page.extract_text() or ''
+            parts.append(text)
+            length += len(text)
+            if length >= MAX_TEXT_CHARS:
+                break
+        text = '\n'.join(parts)
+    elif filetype.startswith('text/') or uploaded_file.filename.lower().endswith(('.txt', '.csv')):
+        with open(path, 'r', encoding='utf-8', errors='replace') as source:
+            text = source.read(MAX_TEXT_CHARS)
+    elif filetype.startswith('image/'):
+        try:
+            import pytesseract
+            from PIL import Image
+        except ImportError:
+            raise JobSkipped('OCR needs Pillow and pytesseract')
+        text = pytesseract.image_to_string(Image.open(path))
+    else:
+        raise JobSkipped('No text extractor for this file type')
+    uploaded_file.extracted_text = text[:MAX_TEXT_CHARS].strip()
+
+JOB_HANDLERS = {
+    'thumbnail': make_thumbnail,
+    'extract_text': extract_text,
+}
+
+#-----------------------------------------
+# Running jobs
+#-----------------------------------------
+def _claim_next_job():
+    """
+    Atomically marks the oldest runnable job as running and returns its id (or None).
+    SQLite serializes writers, so two workers can never claim the same row.
+    """
+    now = datetime.utcnow()
+    jobs = DocumentJob.__table__
+    next_id = (select(jobs.c.id)
+               .where(jobs.c.status == 'pending', jobs.c.run_after <= now)
+               .order_by(jobs.c.id).limit(1).scalar_subquery())
+    job_id = db.session.execute(
+        update(jobs)
+        .where(jobs.c.id == next_id, jobs.c.status == 'pending')
+        .values(status='running', attempts=jobs.c.attempts + 1, started_at=now)
+        .returning(jobs.c.id)
+    ).scalar()
+    db.session.commit()
+    return job_id
+
+def _file_status(file_id):
+    statuses = set(db.session.execute(
+        select(DocumentJob.status).where(DocumentJob.file_id == file_id)
+    ).scalars())
+    if statuses & {'pending', 'running'}:
+        return 'processing'
+    return 'failed' if 'failed' in statuses else 'done'
+
+def run_job(job_id):
+    """
+    Runs one claimed job and records its outcome (and the file's rolled-up status).
+    """
+    job = db.session.get(DocumentJob, job_id)
+    if job is None: # Deleted together with its file
+        return
+    uploaded_file = db.session.get(UploadedFile, job.file_id)
+    try:
+        if uploaded_file is not None: # The file may have been deleted since it was queued
+            JOB_HANDLERS[job.kind](uploaded_file)
+        job.status, job.error = 'done', None
+    except JobSkipped as e:
+        job.status, job.error = 'skipped', str(e)
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f"Document job {job_id} ({job.kind}) failed: {e}", exc_info=True)
+        job = db.session.get(DocumentJob, job_id)
+        if job is None:
+            return
+        uploaded_file = db.session.get(UploadedFile, job.file_id)
+        job.error = str(e)
+        if job.attempts >= MAX_ATTEMPTS:
+            job.status = 'failed'
+        else:
+            job.status = 'pending'
+            job.run_after = datetime.utcnow() + timedelta(seconds=RETRY_DELAY_SECONDS * job.attempts)
+    job.finished_at = datetime.utcnow()
+    try:
+        if uploaded_file is not None:
+            db.session.flush()
+            uploaded_file.processing_status = _file_status(uploaded_file.id)
+        db.session.commit()
+    except orm_exc.StaleDataError:
+        # The file (and its jobs) were deleted while the job ran; nothing left to record
+        db.session.rollback()
+
+def requeue_orphaned_jobs():
+    """
+    Puts jobs left 'running' by a crashed or restarted worker back in the queue.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=LEASE_SECONDS)
+    db.session.execute(
+        update(DocumentJob.__table__)
+        .where(DocumentJob.status == 'running', DocumentJob.started_at < cutoff)
+        .values(status='pending')
+    )
+    db.session.commit()
+
+class DocumentWorker:
+    """
+    Daemon thread pool that drains the document job queue.
+    Started lazily (first request or first queued job), woken on commit, polls as a fallback.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.enabled = True
+        self.threads = 2
+        self.poll_seconds = 5
+        self._workers = []
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """
+        Reads DOCUMENT_WORKER_ENABLED, DOCUMENT_WORKER_THREADS and DOCUMENT_WORKER_POLL_SECONDS.
+        """
+        self.app = app
+        self.enabled = app.config.get('DOCUMENT_WORKER_ENABLED', True)
+        self.threads = app.config.get('DOCUMENT_WORKER_THREADS', self.threads)
+        self.poll_seconds = app.config.get('DOCUMENT_WORKER_POLL_SECONDS', self.poll_seconds)
+        app.before_request(self.start)
+
+    def start(self):
+        if self._workers or not self.enabled or self.app is None:
+            return
+        with self._lock:
+            if self._workers:
+                return
+            with self.app.app_context():
+                try:
+                    requeue_orphaned_jobs()
+                except Exception as e:
+                    db.session.rollback()
+                    logger.warning(f"Could not requeue orphaned document jobs: {e}")
+            for n in range(self.threads):
+                thread = threading.Thread(target=self._run, name=f"document-worker-{n}", daemon=True)
+                thread.start()
+                self._workers.append(thread)
+
+    def notify(self):
+        self.start()
+        self._wake.set()
+
+    def run_pending(self):
+        """
+        Runs queued jobs in the calling thread until none is runnable. Returns how many ran.
+        """
+        count = 0
+        with self.app.app_context():
+            while (job_id := _claim_next_job()) is not None:
+                run_job(job_id)
+                count += 1
+        return count
+
+    def _run(self):
+        while True:
+            try:
+                worked = self.run_pending()
+            except Exception as e:
+                logger.error(f"Document worker error: {e}", exc_info=True)
+                worked = 0
+            if not worked:
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+
+# Process-wide worker, bound to the app in app.py
+document_worker = DocumentWorker()
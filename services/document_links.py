@@ -0,0 +1,84 @@
+# services/document_links.py
+###########################################
+# - Document Links (files attached to records)
+###########################################
+#
+# A DocumentLink row attaches one UploadedFile to one record, identified by
+# (entity_type, entity_id). Links are many-to-many, so a receipt can belong to
+# several properties. The type keeps ids from different tables apart.
+#
+# UploadedFile.related_page / related_id is the older single-link scheme. Old
+# clients still send it, and it is turned into a link on upload
+# (RELATED_PAGE_ENTITY_TYPES).
+###########################################
+
+from models import db, UploadedFile, DocumentLink, RentalProperty
+
+# entity_type -> model whose primary key entity_id refers to
+ENTITY_TYPES = {
+    'rental_property': RentalProperty,
+}
+
+# Legacy related_page values whose related_id is a primary key of an entity type
+RELATED_PAGE_ENTITY_TYPES = {
+    'rental_properties': 'rental_property',
+}
+
+def entity_exists(entity_type, entity_id):
+    """
+    True when entity_type is registered and a record with that primary key exists.
+    """
+    model = ENTITY_TYPES.get(entity_type)
+    return model is not None and db.session.get(model, entity_id) is not None
+
+def link_file(file_id, entity_type, entity_id):
+    """
+    Attaches a file to a record (not committed). Returns False if the link already exists.
+    Raises ValueError for an unknown entity type.
+    """
+    if entity_type not in ENTITY_TYPES:
+        raise ValueError(f"entity_type must be one of: {', '.join(ENTITY_TYPES)}")
+    exists = DocumentLink.query.filter_by(entity_type=entity_type, entity_id=entity_id, file_id=file_id).first()
+    if exists:
+        return False
+    db.session.add(DocumentLink(file_id=file_id, entity_type=entity_type, entity_id=entity_id))
+    return True
+
+def link_related_record(uploaded_file):
+    """
+    Creates the link described by an upload's legacy related_page / related_id, if any (not committed).
+    """
+    entity_type = RELATED_PAGE_ENTITY_TYPES.get(uploaded_file.related_page)
+    if entity_type and uploaded_file.related_id is not None:
+        if uploaded_file.id is None:
+            db.session.flush() # Assigns uploaded_file.id
+        link_file(uploaded_file.id, entity_type, uploaded_file.related_id)
+
+def unlink_file(file_id, entity_type, entity_id):
+    """
+    Removes one link (not committed). Returns False if it did not exist.
+    """
+    link = DocumentLink.query.filter_by(entity_type=entity_type, entity_id=entity_id, file_id=file_id).first()
+    if link is None:
+        return False
+    db.session.delete(link)
+    return True
+
+def unlink_entity(entity_type, entity_id):
+    """
+    Removes every link to a record that is being deleted (not committed). The files stay.
+    """
+    for link in DocumentLink.query.filter_by(entity_type=entity_type, entity_id=entity_id).all():
+        db.session.delete(link)
+
+def files_for_entity_query(entity_type, entity_id):
+    """
+    Files attached to a record, newest first.
+    The unique (entity_type, entity_id, file_id) index yields the file ids without
+    reading document_links rows; files are then fetched by primary key, so the cost
+    depends on the number of attachments, not on the size of either table.
+    """
+    return (UploadedFile.query
+            .join(DocumentLink, DocumentLink.file_id == UploadedFile.id)
+            .filter(DocumentLink.entity_type == entity_type, DocumentLink.entity_id == entity_id)
+            .order_by(UploadedFile.date_uploaded.desc()))
@@ -0,0 +1,104 @@
+# services/file_serving.py
+###########################################
+# - Uploaded Document Serving
+###########################################
+#
+# Documents are served with:
+#   - byte ranges (Range / If-Range -> 206), so PDF viewers fetch only the pages they show
+#   - a strong ETag equal to the stored SHA-256 (mtime/size ETag for legacy files)
+#   - Cache-Control: immutable only when the URL itself is a content-addressed blob
+#     path (/uploads/blobs/<aa>/<sha256>), whose bytes can never change. URLs keyed
+#     by row id (/uploads/file/<id>) are revalidated (no-cache) against the ETag:
+#     SQLite reuses the highest id after a delete, so the same URL can later name
+#     another document. Legacy files saved under their own name are revalidated too.
+#
+# UPLOAD_SENDFILE_MODE hands the byte streaming to a front proxy instead of a
+# Python worker:
+#   'x-sendfile'       : Apache mod_xsendfile / lighttpd; header carries the absolute path
+#   'x-accel-redirect' : nginx; header carries UPLOAD_ACCEL_REDIRECT_PREFIX + stored name, e.g.
+#                          location /protected_uploads/ { internal; alias /srv/app/static/uploads/; }
+# The proxy then answers range and conditional requests itself; the app still
+# checks If-None-Match so a cached document costs no proxy file access at all.
+###########################################
+
+from flask import current_app, request, send_file, abort
+from werkzeug.security import safe_join
+from services.storage import TMP_DIR
+import mimetypes
+import os
+import re
+
+BLOB_MAX_AGE = 365 * 24 * 3600 # Content-addressed bytes never change
+_BLOB_NAME = re.compile(r'^blobs/[0-9a-f]{2}/([0-9a-f]{64})$')
+
+def blob_sha256(stored_name):
+    """
+    Returns the content hash encoded in a blob path, or None for a legacy file name.
+    """
+    match = _BLOB_NAME.match(stored_name.replace(os.sep, '/'))
+    return match.group(1) if match else None
+
+def send_upload(uploaded_file):
+    """
+    Serves an UploadedFile under its original name and type. The URL is keyed by
+    row id, so it is revalidated against the SHA-256 ETag rather than cached as immutable.
+    """
+    return send_stored_file(uploaded_file.stored_name, mimetype=uploaded_file.filetype,
+                            download_name=uploaded_file.filename, sha256=uploaded_file.sha256, immutable=False)
+
+def send_stored_file(stored_name, mimetype=None, download_name=None, sha256=None, immutable=None):
+    """
+    Serves a file stored inside UPLOAD_FOLDER (see module notes for headers and sendfile modes).
+    immutable defaults to whether stored_name is a blob path, i.e. whether the file is
+    requested by its content-addressed path; pass False when the URL names something else.
+    """
+    path = safe_join(os.path.abspath(current_app.config['UPLOAD_FOLDER']), stored_name)
+    if path is None or not os.path.isfile(path) or stored_name.replace(os.sep, '/').startswith(TMP_DIR + '/'):
+        abort(404) # Unfinished uploads are never served
+    sha256 = sha256 or blob_sha256(stored_name)
+    if immutable is None:
+        immutable = blob_sha256(stored_name) is not None
+    download_name = download_name or os.path.basename(stored_name)
+    mimetype = mimetype or mimetypes.guess_type(download_name)[0] or 'application/octet-stream'
+
+    mode = current_app.config.get('UPLOAD_SENDFILE_MODE')
+    if mode:
+        response = _proxy_response(mode, path, stored_name, mimetype, download_name, sha256)
+    else:
+        # conditional=True: If-None-Match / If-Modified-Since -> 304, Range / If-Range -> 206
+        response = send_file(path, mimetype=mimetype, download_name=download_name,
+                             conditional=True, etag=sha256 or True)
+        response.headers.setdefault('Accept-Ranges', 'bytes') # Werkzeug only sets it on 206 responses
+    _set_cache_control(response, immutable=immutable)
+    return response
+
+def _proxy_response(mode, path, stored_name, mimetype, download_name, sha256):
+    """
+    Builds an empty response whose header tells the proxy which file to send.
+    """
+    response = current_app.response_class(mimetype=mimetype)
+    if mode == 'x-sendfile':
+        response.headers['X-Sendfile'] = path
+    elif mode == 'x-accel-redirect':
+        prefix = current_app.config.get('UPLOAD_ACCEL_REDIRECT_PREFIX', '/protected_uploads/')
+        response.headers['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + stored_name.replace(os.sep, '/')
+    else:
+        raise ValueError(f"Unknown UPLOAD_SENDFILE_MODE: {mode!r}")
+    response.headers.set('Content-Disposition', 'inline', filename=download_name)
+    if sha256:
+        response.set_etag(sha256)
+    else:
+        stat = os.stat(path)
+        response.set_etag(f"{int(stat.st_mtime)}-{stat.st_size}")
+    return response.make_conditional(request)
+
+def _set_cache_control(response, immutable):
+    # Personal documents: browser cache only, never shared caches
+    response.cache_control.private = True
+    if immutable:
+        response.cache_control.no_cache = None # send_file defaults to no-cache without a max_age
+        response.cache_control.max_age = BLOB_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.max_age = None
+        response.cache_control.no_cache = True
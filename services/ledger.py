@@ -0,0 +1,69 @@
+# services/ledger.py
+###########################################
+# - Income Stream Registry & Ledger Migration
+###########################################
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, IncomeLedgerEntry, USAFRetirementPay, VADisabilityPay
+from services.versioning import bump_table_versions
+import logging
+
+logger = logging.getLogger(__name__)
+
+#-----------------------------------------
+# Every monthly income stream stored in IncomeLedgerEntry.
+# Adding a stream only needs an entry here; the /personal/api/<stream>/... endpoints pick it up.
+#   label        - Human readable name used in API messages and logs
+#   legacy_model - Pre-ledger per-stream table to migrate rows from (or None)
+#-----------------------------------------
+INCOME_STREAMS = {
+    'usaf_retirement': {'label': 'USAF retirement', 'legacy_model': USAFRetirementPay},
+    'va_disability': {'label': 'VA disability', 'legacy_model': VADisabilityPay},
+    'dividends': {'label': 'cash dividends', 'legacy_model': None},
+    'stocks': {'label': 'stock income', 'legacy_model': None},
+}
+
+def get_income_stream(stream):
+    """
+    Returns the registry entry for a stream key, or None if the stream is unknown.
+    """
+    return INCOME_STREAMS.get(stream)
+
+def _dollars_to_cents(column):
+    """
+    SQL expression converting a NUMERIC dollar column to integer cents.
+    """
+    return db.cast(db.func.round(column * 100), db.Integer)
+
+def migrate_legacy_income_tables():
+    """
+    Copies rows from the legacy per-stream tables into the income ledger.
+    Uses INSERT ... SELECT ... ON CONFLICT DO NOTHING, so it is safe to run on
+    every startup: months already present in the ledger are left untouched.
+    Returns the number of rows copied.
+    """
+    copied = 0
+    for stream, info in INCOME_STREAMS.items():
+        legacy = info['legacy_model']
+        if legacy is None:
+            continue
+
+        # Legacy tables hold NUMERIC dollars; the ledger stores integer cents
+        source = (db.select(db.literal(stream), legacy.year, legacy.month_index,
+                            _dollars_to_cents(legacy.gross_pay),
+                            _dollars_to_cents(legacy.taxed_amount),
+                            _dollars_to_cents(legacy.net_pay))
+                  .where(db.true()))  # SQLite needs a WHERE before ON CONFLICT in INSERT ... SELECT
+        statement = sqlite_insert(IncomeLedgerEntry).from_select(
+            ['stream', 'year', 'month_index', 'gross_pay', 'taxed_amount', 'net_pay'], source
+        ).on_conflict_do_nothing(index_elements=['stream', 'year', 'month_index'])
+
+        result = db.session.execute(statement)
+        if result.rowcount:
+            logger.info(f"Migrated {result.rowcount} {info['label']} rows from {legacy.__tablename__} into the income ledger.")
+        copied += max(result.rowcount, 0)
+
+    if copied:
+        bump_table_versions(db.session, [IncomeLedgerEntry.__tablename__])
+    db.session.commit()
+    return copied
@@ -0,0 +1,197 @@
+# services/loans.py
+###########################################
+# - Mortgage Amortization for Rental Properties
+###########################################
+#
+# A property with a purchase date carries a fixed-rate mortgage:
+#   principal : purchase_price - down_payment
+#   rate      : interest_rate (annual percent), compounded monthly
+#   term      : months from purchase_date to maturity_date (DEFAULT_TERM_MONTHS when unset)
+#   payments  : monthly from the month after purchase, on the purchase day
+#               (or the month's last day when it is shorter)
+#
+# build_schedules() amortizes any number of loans in one NumPy pass: a
+# (loans x months) grid of balances from the closed-form formula, from which
+# the interest and principal of every payment follow by shifting the grid.
+# Amounts are integer cents: balances are rounded each month and a payment's
+# principal is the drop in balance, so a schedule's principal sums to the loan.
+#
+# Schedules are cached by their LoanTerms. An edit that leaves the loan fields
+# alone keeps using the cached schedule; a changed loan gets a new entry and
+# update_rental_property drops the old one (forget_schedule).
+###########################################
+
+from services.money import to_cents
+from collections import OrderedDict, namedtuple
+import threading
+import numpy as np
+
+DEFAULT_TERM_MONTHS = 360
+MAX_CACHED_SCHEDULES = 4096
+
+LoanTerms = namedtuple('LoanTerms', 'principal annual_rate term_months purchase_date') # principal in cents
+
+class Schedule(namedtuple('Schedule', 'terms due balance interest principal interest_paid')):
+    """
+    Amortization of one loan; arrays are read-only and shared through the cache.
+      due           : (term,) datetime64[D] due date of each payment
+      balance       : (term + 1,) cents owed after 0, 1, ... payments
+      interest      : (term,) cents of interest in each payment
+      principal     : (term,) cents of principal in each payment
+      interest_paid : (term + 1,) cents of interest paid after 0, 1, ... payments
+    """
+
+    def payments_made(self, as_of):
+        """
+        Number of payments due on or before as_of (a date).
+        """
+        return int(np.searchsorted(self.due, np.datetime64(as_of, 'D'), side='right'))
+
+    @property
+    def monthly_payment(self):
+        return int(self.interest[0] + self.principal[0])
+
+def term_months(purchase_date, maturity_date):
+    if maturity_date is None:
+        return DEFAULT_TERM_MONTHS
+    return max((maturity_date.year - purchase_date.year) * 12 + maturity_date.month - purchase_date.month, 1)
+
+def loan_terms(rental_property):
+    """
+    LoanTerms of a RentalProperty, or None when it has no purchase date or nothing was financed.
+    """
+    if rental_property.purchase_date is None:
+        return None
+    principal = to_cents(rental_property.purchase_price or 0) - to_cents(rental_property.down_payment or 0)
+    if principal <= 0:
+        return None
+    return LoanTerms(principal, float(rental_property.interest_rate or 0),
+                     term_months(rental_property.purchase_date, rental_property.maturity_date),
+                     rental_property.purchase_date)
+
+#-----------------------------------------
+# Vectorized amortization
+#-----------------------------------------
+def loan_balances(principal, monthly_rate, term, payments):
+    """
+    Outstanding principal of fixed-rate loans after a number of monthly payments.
+    Arguments broadcast; principal in cents. Returns float cents.
+    """
+    payments = np.clip(payments, 0, term)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        full, paid = (1 + monthly_rate) ** term, (1 + monthly_rate) ** payments
+        amortizing = principal * (full - paid) / (full - 1)
+    return np.where(monthly_rate > 0, amortizing, principal * (1 - payments / term))
+
+def due_dates(purchase_dates, months):
+    """
+    (loans x months) due dates of payments 1..months: the purchase day of each
+    following month, clipped to the month's last day.
+    """
+    purchased = np.asarray(purchase_dates, 'datetime64[D]')
+    first_month = purchased.astype('datetime64[M]') + 1
+    # Calendar of every month involved, then integer gathers instead of per-cell date casts
+    calendar = np.arange(first_month.min(), first_month.max() + months)
+    month_starts = calendar.astype('datetime64[D]')
+    month_lengths = ((calendar + 1).astype('datetime64[D]') - month_starts).astype(np.int64)
+    index = (first_month - calendar[0]).astype(np.int64)[:, None] + np.arange(months)[None, :]
+    day_offset = (purchased - purchased.astype('datetime64[M]')).astype(np.int64)[:, None]
+    return month_starts[index] + np.minimum(day_offset, month_lengths[index] - 1)
+
+def build_schedules(terms_list):
+    """
+    Amortizes a list of LoanTerms in one pass; returns their Schedules in order.
+    """
+    if not terms_list:
+        return []
+    principal = np.array([terms.principal for terms in terms_list], np.float64)
+    rate = np.array([terms.annual_rate for terms in terms_list]) / 1200 # Annual percent -> monthly fraction
+    term = np.array([terms.term_months for terms in terms_list], np.int64)
+    months = int(term.max())
+
+    # Balances after 0..months payments; past a loan's term they stay at 0
+    balance = np.rint(loan_balances(principal[:, None], rate[:, None], term[:, None],
+                                    np.arange(months + 1)[None, :])).astype(np.int64)
+    interest = np.rint(balance[:, :-1] * rate[:, None]).astype(np.int64)
+    paid_down = balance[:, :-1] - balance[:, 1:]
+    interest_paid = np.concatenate([np.zeros((len(terms_list), 1), np.int64), np.cumsum(interest, axis=1)], axis=1)
+    due = due_dates([terms.purchase_date for terms in terms_list], months)
+
+    schedules = []
+    for row, terms in enumerate(terms_list):
+        n = terms.term_months
+        arrays = (due[row, :n], balance[row, :n + 1], interest[row, :n], paid_down[row, :n], interest_paid[row, :n + 1])
+        for array in arrays:
+            array.flags.writeable = False
+        schedules.append(Schedule(terms, *arrays))
+    return schedules
+
+#-----------------------------------------
+# Schedule cache
+#-----------------------------------------
+_schedules = OrderedDict() # LoanTerms -> Schedule, least recently used first
+_schedules_lock = threading.Lock()
+
+def get_schedules(terms_list):
+    """
+    Schedules for a list of LoanTerms, from the cache; the missing ones are amortized together.
+    """
+    with _schedules_lock:
+        found = {}
+        for terms in terms_list:
+            if terms in _schedules:
+                _schedules.move_to_end(terms)
+                found[terms] = _schedules[terms]
+    missing = [terms for terms in dict.fromkeys(terms_list) if terms not in found]
+    if missing:
+        built = build_schedules(missing)
+        with _schedules_lock:
+            for schedule in built:
+                _schedules[schedule.terms] = found[schedule.terms] = schedule
+            while len(_schedules) > MAX_CACHED_SCHEDULES:
+                _schedules.popitem(last=False)
+    return [found[terms] for terms in terms_list]
+
+def forget_schedule(terms):
+    """
+    Drops a cached schedule (its loan was edited or deleted).
+    """
+    if terms is not None:
+        with _schedules_lock:
+            _schedules.pop(terms, None)
+
+#-----------------------------------------
+# Portfolio rollups
+#-----------------------------------------
+def portfolio_series(schedules, first_month=None, last_month=None):
+    """
+    Sums the loans per calendar month, all loans x all months as one grid.
+    Months are numpy datetime64[M]; by default from the first purchase to the last payoff.
+    Returns (months, outstanding principal at month end, interest paid, principal paid), in cents.
+    """
+    if not schedules:
+        return np.empty(0, 'datetime64[M]'), *(np.empty(0, np.int64),) * 3
+    purchased = np.array([schedule.terms.purchase_date for schedule in schedules], 'datetime64[M]')
+    term = np.array([schedule.terms.term_months for schedule in schedules], np.int64)
+    first_month = purchased.min() if first_month is None else first_month
+    last_month = (purchased + term).max() if last_month is None else last_month
+    months = np.arange(first_month, last_month + 1)
+
+    # Pad the cached schedules to one (loans x longest term) grid
+    longest = int(term.max())
+    balance = np.zeros((len(schedules), longest + 1), np.int64)
+    interest = np.zeros((len(schedules), longest + 1), np.int64)
+    paid_down = np.zeros((len(schedules), longest + 1), np.int64)
+    for row, schedule in enumerate(schedules):
+        balance[row, :len(schedule.balance)] = schedule.balance
+        interest[row, :len(schedule.interest)] = schedule.interest
+        paid_down[row, :len(schedule.principal)] = schedule.principal
+
+    # Payment k (0-based) falls in month purchase + k + 1; before the purchase a loan owes nothing
+    elapsed = (months[None, :] - purchased[:, None]).astype(np.int64)
+    owned = elapsed >= 0
+    made = np.clip(elapsed, 0, term[:, None])
+    index = np.where((elapsed >= 1) & (elapsed <= term[:, None]), elapsed - 1, longest) # longest = padding (zeros)
+    outstanding = np.where(owned, np.take_along_axis(balance, made, axis=1), 0).sum(axis=0)
+    return (months, outstanding, np.take_along_axis(interest, index, axis=1).sum(axis=0),
+            np.take_along_axis(paid_down, index, axis=1).sum(axis=0))
@@ -0,0 +1,66 @@
+# services/migrations.py
+###########################################
+# - One-off Data Migrations
+###########################################
+#
+# sync_schema() (models.py) only creates tables and indexes. Changes that have to
+# rewrite existing rows are listed in MIGRATIONS and run once per database; the
+# names of applied migrations are stored in the schema_migrations table.
+###########################################
+
+from models import db, SchemaMigration
+from services.versioning import bump_table_versions
+import logging
+
+logger = logging.getLogger(__name__)
+
+def _money_to_cents():
+    """
+    Money columns moved from NUMERIC/REAL dollars to INTEGER cents (services/money.py).
+    Existing values are converted in place; NULLs stay NULL.
+    """
+    money_columns = {
+        'income_ledger': ('gross_pay', 'taxed_amount', 'net_pay'),
+        'rental_properties': ('purchase_price', 'down_payment'),
+    }
+    for table, columns in money_columns.items():
+        assignments = ', '.join(f"{column} = CAST(ROUND({column} * 100) AS INTEGER)" for column in columns)
+        db.session.execute(db.text(f"UPDATE {table} SET {assignments}"))
+    bump_table_versions(db.session, money_columns.keys())
+
+def _document_links_from_related_id():
+    """
+    Files attached to a rental property through uploaded_file.related_id become
+    DocumentLink rows (services/document_links.py); related_id itself is left as is.
+    """
+    db.session.execute(db.text(
+        "INSERT OR IGNORE INTO document_links (file_id, entity_type, entity_id, created_at) "
+        "SELECT id, 'rental_property', related_id, date_uploaded FROM uploaded_file "
+        "WHERE related_page = 'rental_properties' AND related_id IS NOT NULL"
+    ))
+    bump_table_versions(db.session, ['document_links'])
+
+# Applied in order; never rename or reorder entries that have shipped
+MIGRATIONS = [
+    ('0001_money_to_cents', _money_to_cents),
+    ('0002_document_links_from_related_id', _document_links_from_related_id),
+]
+
+def apply_data_migrations():
+    """
+    Runs every migration not yet recorded in schema_migrations, each in its own transaction.
+    Must run after sync_schema() and before anything writes to the migrated tables.
+    """
+    applied = {name for (name,) in db.session.query(SchemaMigration.name).all()}
+    for name, migration in MIGRATIONS:
+        if name in applied:
+            continue
+        try:
+            migration()
+            db.session.add(SchemaMigration(name=name))
+            db.session.commit()
+            logger.info(f"Applied data migration {name}.")
+        except Exception:
+            db.session.rollback()
+            logger.error(f"Data migration {name} failed.", exc_info=True)
+            raise
@@ -0,0 +1,91 @@
+# services/money.py
+###########################################
+# - Exact Money Handling (storage, parsing & JSON)
+###########################################
+#
+# Money flows through the app as:
+#   storage : INTEGER cents           (Money column type)
+#   Python  : Decimal with 2 places   (e.g. Decimal('1234.50'))
+#   JSON    : fixed-point string      (e.g. "1234.50")
+###########################################
+
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy.types import TypeDecorator, Integer
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+CENTS = Decimal('0.01')
+ZERO = Decimal('0.00')
+MAX_AMOUNT = Decimal('999999999999.99') # Keeps cents well inside SQLite's 64-bit INTEGER
+
+def parse_money(value):
+    """
+    Converts user input (str, int, float or Decimal) to a Decimal rounded to cents.
+    Floats go through str() so 0.1 becomes Decimal('0.10'), not its binary expansion.
+    Raises ValueError for missing, non-numeric or non-finite values.
+    """
+    if value is None or isinstance(value, bool):
+        raise ValueError('Amount is required')
+    try:
+        amount = Decimal(value if isinstance(value, (str, Decimal)) else str(value))
+        if not amount.is_finite() or abs(amount) > MAX_AMOUNT:
+            raise ValueError
+        return amount.quantize(CENTS, rounding=ROUND_HALF_UP)
+    except (InvalidOperation, ValueError):
+        raise ValueError(f'Invalid amount: {value!r}')
+
+def to_cents(amount):
+    """
+    Converts a money amount to integer cents.
+    """
+    return int(parse_money(amount) * 100)
+
+def from_cents(cents):
+    """
+    Converts integer cents to a Decimal with 2 places.
+    scaleb() only shifts the exponent, so no division or rounding is needed.
+    """
+    return Decimal(cents).scaleb(-2)
+
+def format_money(amount):
+    """
+    Formats a money amount as the fixed-point string used on the wire ('1234.50').
+    """
+    return format(amount, 'f') if isinstance(amount, Decimal) else format(parse_money(amount), 'f')
+
+#-----------------------------------------
+# Column type: stores integer cents, returns Decimal
+#-----------------------------------------
+class Money(TypeDecorator):
+    """
+    Money column stored as INTEGER cents so sums and comparisons in SQLite are exact.
+    Accepts Decimal/int/float/str on write and always returns a 2-place Decimal (or None).
+    """
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else to_cents(value)
+
+    def process_result_value(self, value, dialect):
+        # int() also covers rows in pre-migration REAL columns that hold whole cents as floats
+        return None if value is None else from_cents(int(value))
+
+#-----------------------------------------
+# Flask JSON provider
+#-----------------------------------------
+class MoneyJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider that writes Decimals as fixed-point strings and skips key sorting.
+
+    The default provider sorts every object's keys and sends each Decimal through a
+    generic fallback that tries several types first. Here Decimal is checked first,
+    and hot endpoints format money to strings while building rows, so json.dumps stays
+    on its C fast path with no fallback calls at all.
+    """
+    sort_keys = False
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, Decimal):
+            return format(o, 'f')
+        return DefaultJSONProvider.default(o)
@@ -0,0 +1,242 @@
+# services/net_worth.py
+###########################################
+# - Materialized Net Worth Series
+###########################################
+#
+# net worth = cash + income + property value - loan balance
+#   cash           : running balance of the imported bank transactions
+#   income         : net pay of the income ledger, counted from the 1st of its month
+#   property value : purchase price of each property from its purchase date (no appreciation)
+#   loan balance   : outstanding mortgage principal (see services/loans.py)
+#
+# The series is stored in net_worth_series, one row per day and per month, so
+# the chart is a primary-key range read whatever the length of the history.
+# SQLite triggers on the source tables lower net_worth_state.dirty_from to the
+# earliest date a write touches (old and new values for updates; Core bulk
+# writes included). refresh_net_worth() recomputes from that day onward only,
+# starting from the stored balances of the day before, and extends the series
+# to today.
+###########################################
+
+from models import db, NetWorthPoint, NetWorthState
+from services.versioning import bump_table_versions
+from services.loans import DEFAULT_TERM_MONTHS, loan_balances
+from services.analytics import YEAR_RANGE
+from datetime import date, timedelta
+import logging
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SERIES = NetWorthPoint.__tablename__
+STATE = NetWorthState.__tablename__
+FAR_FUTURE = '9999-12-31' # Stands in for "no date" in trigger comparisons
+PROPERTY_CHUNK_SIZE = 64 # Properties per (properties x days) block when computing loan balances
+COLUMNS = ('cash', 'income', 'property_value', 'loan_balance', 'net_worth')
+SERIES_FLOOR = date(YEAR_RANGE[0], 1, 1) # Earliest stored day: a mistyped 0202-05-01 must not add 666k rows
+
+#-----------------------------------------
+# Sources: table -> (date of a row, with {row} = new / old; columns whose updates matter)
+#-----------------------------------------
+SOURCES = {
+    'bank_transactions': ("{row}.posted_date", ('posted_date', 'amount')),
+    'income_ledger': ("printf('%04d-%02d-01', {row}.year, {row}.month_index)", ('year', 'month_index', 'net_pay')),
+    'rental_properties': ("{row}.purchase_date",
+                          ('purchase_date', 'purchase_price', 'down_payment', 'interest_rate', 'maturity_date')),
+}
+
+def _trigger_statements(table):
+    expression, columns = SOURCES[table]
+
+    def day(row):
+        return f"coalesce({expression.format(row=row)}, '{FAR_FUTURE}')"
+
+    events = {
+        'ai': ('INSERT', day('new')),
+        'au': (f"UPDATE OF {', '.join(columns)}", f"min({day('old')}, {day('new')})"),
+        'ad': ('DELETE', day('old')),
+    }
+    # WHEN keeps bulk writes cheap: the state row is only written when the date moves earlier
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {SERIES}_{table}_{suffix} AFTER {event} ON {table} "
+        f"WHEN {changed} < coalesce((SELECT dirty_from FROM {STATE} WHERE id = 1), '{FAR_FUTURE}') "
+        f"BEGIN UPDATE {STATE} SET dirty_from = {changed} WHERE id = 1; END"
+        for suffix, (event, changed) in events.items()
+    ]
+
+def ensure_net_worth_tracking():
+    """
+    Creates the series tables, the state row and the source triggers if missing.
+    Must run after the source tables exist.
+    """
+    with db.engine.begin() as conn:
+        for model in (NetWorthPoint, NetWorthState):
+            model.__table__.create(conn, checkfirst=True)
+        conn.execute(db.text(f"INSERT OR IGNORE INTO {STATE}(id) VALUES (1)"))
+        for table in SOURCES:
+            for statement in _trigger_statements(table):
+                conn.execute(db.text(statement))
+
+#-----------------------------------------
+# Vectorized components
+#-----------------------------------------
+def _month_keys(days):
+    return days.astype('datetime64[M]').astype(np.int64)
+
+def _day_of_month(days):
+    return (days - days.astype('datetime64[M]')).astype(np.int64) + 1
+
+def _daily_totals(rows, start, days):
+    """
+    Spreads (day, cents) rows over a zeroed int64 array indexed by day - start.
+    """
+    totals = np.zeros(days, np.int64)
+    if rows:
+        offsets = (np.array([row[0] for row in rows], 'datetime64[D]') - start).astype(np.int64)
+        np.add.at(totals, offsets, np.array([int(row[1]) for row in rows], np.int64))
+    return totals
+
+def _cash_deltas(start, end):
+    rows = db.session.execute(db.text(
+        "SELECT posted_date, sum(amount) FROM bank_transactions "
+        "WHERE posted_date >= :start AND posted_date <= :end GROUP BY posted_date"
+    ), {'start': str(start), 'end': str(end)}).all()
+    return _daily_totals(rows, start, (end - start).astype(np.int64) + 1)
+
+def _income_deltas(start, end):
+    # Months whose 1st falls in [start, end]
+    first, last = int(_month_keys(start - 1)) + 1, int(_month_keys(end))
+    rows = db.session.execute(db.text(
+        "SELECT printf('%04d-%02d-01', year, month_index), sum(net_pay) FROM income_ledger "
+        "WHERE year * 12 + month_index - 1 BETWEEN :first AND :last GROUP BY year, month_index"
+    ), {'first': first + 1970 * 12, 'last': last + 1970 * 12}).all()
+    return _daily_totals(rows, start, (end - start).astype(np.int64) + 1)
+
+def _property_values(days):
+    """
+    (property value, loan balance) in cents per day, summed over the properties.
+    """
+    rows = db.session.execute(db.text(
+        "SELECT purchase_date, purchase_price, down_payment, interest_rate, maturity_date "
+        "FROM rental_properties WHERE purchase_date IS NOT NULL")).all()
+    value, balance = np.zeros(len(days), np.int64), np.zeros(len(days))
+    day_keys, day_of_month = _month_keys(days), _day_of_month(days)
+    month_length = ((days.astype('datetime64[M]') + 1).astype('datetime64[D]') - days.astype('datetime64[M]')).astype(np.int64)
+    for chunk_start in range(0, len(rows), PROPERTY_CHUNK_SIZE):
+        chunk = rows[chunk_start:chunk_start + PROPERTY_CHUNK_SIZE]
+        purchased = np.array([row[0] for row in chunk], 'datetime64[D]')
+        price = np.array([int(row[1] or 0) for row in chunk], np.int64)
+        principal = np.maximum(price - np.array([int(row[2] or 0) for row in chunk], np.int64), 0)
+        rate = np.array([(row[3] or 0) / 1200 for row in chunk]) # Annual percent -> monthly fraction
+        matures = np.array([row[4] or 'NaT' for row in chunk], 'datetime64[D]')
+        purchase_keys = _month_keys(purchased)
+        term = np.where(np.isnat(matures), DEFAULT_TERM_MONTHS,
+                        np.maximum(_month_keys(matures) - purchase_keys, 1)).astype(np.float64)
+
+        owned = days[None, :] >= purchased[:, None]
+        # Payments fall on the purchase day of each following month (its last day when shorter)
+        due_day = np.minimum(_day_of_month(purchased)[:, None], month_length[None, :])
+        payments = day_keys[None, :] - purchase_keys[:, None] - (day_of_month[None, :] < due_day)
+        value += (owned * price[:, None]).sum(axis=0)
+        balance += np.where(owned, loan_balances(principal[:, None], rate[:, None], term[:, None], payments), 0).sum(axis=0)
+    return value, np.rint(balance).astype(np.int64)
+
+#-----------------------------------------
+# Refresh
+#-----------------------------------------
+_refresh_lock = threading.Lock()
+
+def _state():
+    return db.session.execute(db.text(f"SELECT built_through, dirty_from FROM {STATE} WHERE id = 1")).first()
+
+def _first_source_day():
+    first = db.session.execute(db.text(
+        "SELECT min(day) FROM ("
+        " SELECT min(posted_date) AS day FROM bank_transactions"
+        " UNION ALL SELECT min(printf('%04d-%02d-01', year, month_index)) FROM income_ledger"
+        " UNION ALL SELECT min(purchase_date) FROM rental_properties)")).scalar()
+    return date.fromisoformat(first) if first else None
+
+def _opening_before(day):
+    """
+    (cash, income) in cents accumulated before day, for sources dated before SERIES_FLOOR.
+    """
+    return tuple(int(total or 0) for total in db.session.execute(db.text(
+        "SELECT (SELECT sum(amount) FROM bank_transactions WHERE posted_date < :day),"
+        " (SELECT sum(net_pay) FROM income_ledger WHERE printf('%04d-%02d-01', year, month_index) < :day)"
+    ), {'day': str(day)}).first())
+
+def _needs_refresh(state, today):
+    if state is None or state[0] is None:
+        return True
+    built_through, dirty_from = date.fromisoformat(state[0]), state[1] and date.fromisoformat(state[1])
+    return built_through < today or (dirty_from is not None and dirty_from <= built_through)
+
+def refresh_net_worth(today=None):
+    """
+    Brings net_worth_series up to date and commits. Returns the first day
+    recomputed, or None when the series was already current.
+    """
+    today = today or date.today()
+    if not _needs_refresh(_state(), today):
+        return None
+    with _refresh_lock:
+        state = _state()
+        if state is None:
+            ensure_net_worth_tracking() # Not installed at startup; the first build reads everything anyway
+            state = _state()
+        if not _needs_refresh(state, today):
+            return None
+        built_through, dirty_from = (value and date.fromisoformat(value) for value in state)
+        start = built_through + timedelta(days=1) if built_through else None
+        if dirty_from is not None and (start is None or dirty_from < start):
+            start = dirty_from
+        previous = start and db.session.execute(db.text(
+            f"SELECT cash, income FROM {SERIES} WHERE granularity = 'day' AND period = :day"
+        ), {'day': str(start - timedelta(days=1))}).first()
+        if previous is None:
+            # Nothing stored before start (first build, or a change before the series began): rebuild it all
+            start, opening = _first_source_day(), (0, 0)
+            if start is not None and start < SERIES_FLOOR:
+                # Older rows (typically a mistyped year) are folded into the opening balances
+                start, opening = SERIES_FLOOR, _opening_before(SERIES_FLOOR)
+            db.session.execute(db.text(f"DELETE FROM {SERIES}"))
+        else:
+            opening = tuple(previous)
+            month_start = start.replace(day=1)
+            db.session.execute(db.text(
+                f"DELETE FROM {SERIES} WHERE (granularity = 'day' AND period >= :start) "
+                f"OR (granularity = 'month' AND period >= :month_start)"
+            ), {'start': str(start), 'month_start': str(month_start)})
+
+        rows = _compute_rows(start, today, opening) if start is not None and start <= today else []
+        if rows:
+            db.session.connection().exec_driver_sql(
+                f"INSERT INTO {SERIES} (granularity, period, {', '.join(COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        db.session.execute(db.text(f"UPDATE {STATE} SET built_through = :today, dirty_from = NULL WHERE id = 1"),
+                           {'today': str(today)})
+        bump_table_versions(db.session, [SERIES])
+        db.session.commit()
+        logger.info(f"Net worth series refreshed from {start} ({len(rows)} rows).")
+        return start
+
+def _compute_rows(start, end, opening):
+    """
+    Day rows for [start, end] plus the month rows from start's month on, as insert tuples.
+    """
+    first, last = np.datetime64(start, 'D'), np.datetime64(end, 'D')
+    days = np.arange(first, last + 1)
+    cash = opening[0] + np.cumsum(_cash_deltas(first, last))
+    income = opening[1] + np.cumsum(_income_deltas(first, last))
+    value, balance = _property_values(days)
+    columns = np.stack([cash, income, value, balance, cash + income + value - balance], axis=1).tolist()
+    labels = days.astype(str).tolist()
+    rows = [('day', label, *values) for label, values in zip(labels, columns)]
+
+    # Month rows: each month's last day (or end), keyed by its first day
+    months = np.arange(first.astype('datetime64[M]'), last.astype('datetime64[M]') + 1)
+    closing = np.minimum((months + 1).astype('datetime64[D]') - 1, last)
+    for month, offset in zip(months.astype('datetime64[D]').astype(str).tolist(), (closing - first).astype(np.int64).tolist()):
+        rows.append(('month', month, *columns[offset]))
+    return rows
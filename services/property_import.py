@@ -0,0 +1,303 @@
+# services/property_import.py
+###########################################
+# - Bulk Rental Property Import / Export (CSV & JSON)
+###########################################
+#
+# Import pipeline, one pass over the upload:
+#   parse    : a generator per file format (PARSERS) yields one record per row:
+#              CSV rows, or the objects of a JSON array / NDJSON file, which are
+#              decoded incrementally in JSON_READ_SIZE chunks
+#   validate : validate_property() turns a record into storage values
+#              (integer cents, ISO dates) or the list of what is wrong with it;
+#              clean_property_value() parses a single column (also used by PATCH)
+#   unique   : a property_id repeated in the file is rejected after its first
+#              row; ids already stored are found with one query for the whole file
+#   insert   : one executemany INSERT, in the caller's transaction
+#
+# Valid rows are held until the uniqueness query (a managed portfolio is a few
+# thousand rows at most). With atomic=True any rejected row cancels the import.
+#
+# export_csv() streams the table with the same columns, so an export can be
+# edited and re-imported as is.
+###########################################
+
+from models import db, RentalProperty
+from services.money import parse_money
+from services.versioning import bump_table_versions
+from datetime import date, datetime
+import csv
+import io
+import json
+
+MAX_REPORTED_ERRORS = 50 # Row errors returned to the client; the rest are only counted
+JSON_READ_SIZE = 64 * 1024
+EXPORT_CHUNK_SIZE = 500 # Rows fetched and written per chunk while exporting
+
+#-----------------------------------------
+# Columns, in export order
+#-----------------------------------------
+PROPERTY_COLUMNS = ('property_id', 'property_name', 'address', 'city', 'state', 'county', 'country', 'built_year',
+                    'purchase_date', 'ownership_association', 'purchase_price', 'down_payment', 'interest_rate',
+                    'mortgage_broker_name', 'maturity_date', 'loan_number')
+REQUIRED_COLUMNS = ('property_id', 'property_name', 'address', 'city', 'state', 'ownership_association')
+DATE_COLUMNS = ('purchase_date', 'maturity_date')
+MONEY_COLUMNS = ('purchase_price', 'down_payment')
+DATE_FORMATS = ('%Y-%m-%d', '%m/%d/%Y')
+
+class PropertyImportError(ValueError):
+    """
+    The file as a whole cannot be imported (unknown format, unreadable JSON, no property_id column).
+    """
+
+def _max_length(column):
+    return getattr(RentalProperty.__table__.c[column].type, 'length', None)
+
+def _parse_date(value):
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f'Unrecognized date: {value!r} (expected YYYY-MM-DD)')
+
+def clean_property_value(column, raw):
+    """
+    Parses one column value as read from CSV or JSON into its Python form
+    (date, Decimal money, float rate, stripped text), or None when blank.
+    Raises ValueError with a message naming the column.
+    """
+    if isinstance(raw, (dict, list, bool)):
+        # JSON objects, arrays and true/false have no column form (str() would store "['x']")
+        raise ValueError(f'{column} must be a string or a number, not {type(raw).__name__}')
+    text = '' if raw is None else str(raw).strip()
+    if not text:
+        return None
+    try:
+        if column in DATE_COLUMNS:
+            return _parse_date(text)
+        if column in MONEY_COLUMNS:
+            amount = parse_money(text.replace(',', '').replace('$', ''))
+            if amount < 0:
+                raise ValueError(f'{column} cannot be negative')
+            return amount
+        if column == 'interest_rate':
+            rate = float(text)
+            if not 0 <= rate <= 100:
+                raise ValueError('interest_rate must be a percentage between 0 and 100')
+            return rate
+        limit = _max_length(column)
+        if limit and len(text) > limit:
+            raise ValueError(f'{column} is longer than {limit} characters')
+        return text
+    except ValueError as e:
+        message = str(e)
+        raise ValueError(message if column in message else f'{column}: {message}') from None
+
+def validate_property(record):
+    """
+    Checks one record ({column: value}, values as read from CSV or JSON).
+    Returns (values, errors): a tuple in PROPERTY_COLUMNS order, in storage
+    form, and an empty list; or (None, [messages]).
+    """
+    values, errors = {}, []
+    for column in PROPERTY_COLUMNS:
+        try:
+            value = clean_property_value(column, record.get(column))
+        except ValueError as e:
+            errors.append(str(e))
+            continue
+        if value is None and column in REQUIRED_COLUMNS:
+            errors.append(f'{column} is required')
+        if column in DATE_COLUMNS and value is not None:
+            value = value.isoformat()
+        elif column in MONEY_COLUMNS and value is not None:
+            value = int(value.scaleb(2)) # Integer cents, as the Money type stores them
+        values[column] = value
+    if errors:
+        return None, errors
+    return tuple(values[column] for column in PROPERTY_COLUMNS), []
+
+#-----------------------------------------
+# Parsers
+#-----------------------------------------
+def _header_key(name):
+    # 'Property ID' / 'property-id' / 'property_id' all name the same column
+    return '_'.join(name.strip().lower().replace('-', ' ').split())
+
+def parse_csv(text):
+    """
+    Yields (line, record) per CSV data row; columns are matched by header name.
+    """
+    reader = csv.reader(text)
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = [(index, key) for index, key in enumerate(map(_header_key, header)) if key in PROPERTY_COLUMNS]
+    if 'property_id' not in {key for _, key in columns}:
+        raise PropertyImportError('CSV header needs a property_id column')
+    for row in reader:
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        yield reader.line_num, {key: row[index] if index < len(row) else None for index, key in columns}
+
+def _json_values(text):
+    """
+    Yields the top-level values of a JSON array, or of newline-delimited /
+    concatenated JSON documents, reading JSON_READ_SIZE chunks at a time.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, finished, in_array = '', 0, False, None
+    while True:
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position < len(buffer) or finished:
+                break
+            chunk = text.read(JSON_READ_SIZE)
+            buffer, position, finished = chunk, 0, not chunk
+        if position >= len(buffer):
+            if in_array:
+                raise PropertyImportError('Invalid JSON: unterminated array')
+            return
+        if in_array is None:
+            in_array = buffer[position] == '['
+            position += in_array
+            continue
+        if in_array and buffer[position] == ']':
+            return
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as e:
+            if finished:
+                raise PropertyImportError(f'Invalid JSON: {e.msg}')
+            # Most likely a value cut by the chunk boundary: read on and retry
+            chunk = text.read(JSON_READ_SIZE)
+            buffer, position, finished = buffer[position:] + chunk, 0, not chunk
+            continue
+        if end == len(buffer) and not finished and not isinstance(value, (dict, list)):
+            # A bare number may continue in the next chunk
+            chunk = text.read(JSON_READ_SIZE)
+            buffer, position, finished = buffer[position:] + chunk, 0, not chunk
+            continue
+        position = end
+        yield value
+
+def parse_json(text):
+    """
+    Yields (number, record) per object of a JSON array or NDJSON file.
+    """
+    for number, value in enumerate(_json_values(text), start=1):
+        yield number, value if isinstance(value, dict) else {'_invalid': value}
+
+PARSERS = {
+    'csv': parse_csv,
+    'json': parse_json,
+}
+
+def detect_format(filename, head):
+    """
+    Picks the parser for an upload from its extension, falling back to its first bytes.
+    """
+    extension = (filename or '').rsplit('.', 1)[-1].lower()
+    if extension in ('json', 'ndjson', 'jsonl'):
+        return 'json'
+    if extension == 'csv':
+        return 'csv'
+    return 'json' if head.lstrip(b'\xef\xbb\xbf \t\r\n').startswith((b'[', b'{')) else 'csv'
+
+#-----------------------------------------
+# Import
+#-----------------------------------------
+def _stored_property_ids(property_ids):
+    """
+    The given property_ids that already exist, with a single query whatever their number.
+    """
+    rows = db.session.execute(db.text(
+        "SELECT property_id FROM rental_properties WHERE property_id IN (SELECT value FROM json_each(:ids))"
+    ), {'ids': json.dumps(property_ids)})
+    return {property_id for (property_id,) in rows}
+
+def import_properties(stream, filename=None, file_format=None, atomic=False):
+    """
+    Imports rental properties from a CSV or JSON file object (binary, seekable); not committed.
+    Returns a report {'format', 'rows_read', 'inserted', 'rejected', 'errors'} where
+    errors lists the first MAX_REPORTED_ERRORS rejected rows as
+    {'line', 'property_id', 'errors'}. With atomic=True nothing is inserted when a row is rejected.
+    Raises PropertyImportError when the file itself cannot be read.
+    """
+    if file_format is None:
+        file_format = detect_format(filename, stream.read(64))
+        stream.seek(0)
+    parser = PARSERS.get(file_format)
+    if parser is None:
+        raise PropertyImportError(f"format must be one of: {', '.join(PARSERS)}")
+
+    rows, rejected, errors = {}, 0, [] # rows: property_id -> (line, values)
+    rows_read = 0
+
+    def reject(line, property_id, messages):
+        nonlocal rejected
+        rejected += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({'line': line, 'property_id': property_id, 'errors': messages})
+
+    # utf-8-sig drops Excel's BOM; newline='' lets the csv module handle quoted line breaks
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', errors='replace', newline='')
+    try:
+        for line, record in parser(text):
+            rows_read += 1
+            if '_invalid' in record:
+                reject(line, None, ['Expected a JSON object'])
+                continue
+            values, messages = validate_property(record)
+            if messages:
+                reject(line, record.get('property_id'), messages)
+            elif values[0] in rows:
+                reject(line, values[0], [f'Duplicate property_id (first on line {rows[values[0]][0]})'])
+            else:
+                rows[values[0]] = (line, values)
+    finally:
+        text.detach() # Leave the caller's stream open
+
+    for property_id in sorted(_stored_property_ids(list(rows)), key=lambda key: rows[key][0]):
+        reject(rows.pop(property_id)[0], property_id, ['Property ID already exists.'])
+    errors.sort(key=lambda error: error['line'])
+
+    inserted = 0
+    if rows and not (atomic and rejected):
+        db.session.connection().exec_driver_sql(
+            f"INSERT INTO rental_properties ({', '.join(PROPERTY_COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(PROPERTY_COLUMNS))})",
+            [values for _, values in rows.values()])
+        inserted = len(rows)
+        bump_table_versions(db.session, [RentalProperty.__tablename__])
+    return {'format': file_format, 'rows_read': rows_read, 'inserted': inserted, 'rejected': rejected,
+            'errors': errors}
+
+#-----------------------------------------
+# Export
+#-----------------------------------------
+def _export_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, date):
+        return value.isoformat()
+    return value # Decimal money prints as fixed-point ('1234.50')
+
+def export_csv(chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yields the properties as CSV text (header first), ordered by property_id,
+    reading and writing chunk_size rows at a time.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(PROPERTY_COLUMNS)
+    query = (db.session.query(*[getattr(RentalProperty, column) for column in PROPERTY_COLUMNS])
+             .order_by(RentalProperty.property_id).yield_per(chunk_size))
+    for count, row in enumerate(query, start=1):
+        writer.writerow([_export_value(value) for value in row])
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
@@ -0,0 +1,180 @@
+# services/search.py
+###########################################
+# - Full-Text Search (SQLite FTS5)
+###########################################
+#
+# One FTS5 table, search_index(title, body), holds every searchable record:
+#   document : title = filename,      body = notes + extracted document text
+#   property : title = property_name, body = property_id, address, city, state,
+#                                            county, loan number, mortgage broker
+#
+# The FTS rowid encodes the source row (id * ROWID_STRIDE + kind slot), so the
+# triggers below can replace or delete a record by rowid instead of scanning
+# the index. Triggers (rather than ORM events) keep the index in sync, which
+# also covers Core bulk statements and migrations.
+#
+# Queries match every term as a prefix ("main st" -> "main"* "st"*), are
+# ranked with bm25 (title hits weigh more than body hits) and paginated.
+# See search() for how the cost of very broad queries is bounded.
+###########################################
+
+from models import db
+from markupsafe import escape
+import re
+
+SEARCH_TABLE = 'search_index'
+ROWID_STRIDE = 8 # Room for more kinds without renumbering
+TITLE_WEIGHT, BODY_WEIGHT = 10.0, 1.0
+SNIPPET_TOKENS = 12
+MAX_RANKED_MATCHES = 2000 # Upper bound on rows scored per query (newest matches win beyond it)
+_TERM = re.compile(r'\w+', re.UNICODE)
+
+def _joined(*columns):
+    return " || ' ' || ".join(f"coalesce(new.{column}, '')" for column in columns)
+
+# kind -> (slot, source table, title column, body columns)
+SEARCH_SOURCES = {
+    'document': (0, 'uploaded_file', 'filename', ('notes', 'extracted_text')),
+    'property': (1, 'rental_properties', 'property_name',
+                 ('property_id', 'address', 'city', 'state', 'county', 'loan_number', 'mortgage_broker_name')),
+}
+KIND_BY_SLOT = {slot: kind for kind, (slot, *_rest) in SEARCH_SOURCES.items()}
+
+def _trigger_statements(kind):
+    slot, table, title_column, body_columns = SEARCH_SOURCES[kind]
+    title, body = f"new.{title_column}", _joined(*body_columns)
+    rowid = f"new.id * {ROWID_STRIDE} + {slot}"
+    insert = f"INSERT INTO {SEARCH_TABLE}(rowid, title, body) VALUES ({rowid}, {title}, {body});"
+    delete = f"DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id * {ROWID_STRIDE} + {slot};"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_{table}_ai AFTER INSERT ON {table} BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_{table}_ad AFTER DELETE ON {table} BEGIN {delete} END",
+        # Only edits of indexed columns rewrite the entry (not e.g. processing_status updates)
+        f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_{table}_au AFTER UPDATE OF "
+        f"{', '.join((title_column, *body_columns))} ON {table} BEGIN {delete} {insert} END",
+    ]
+
+def _populate_statement(kind):
+    slot, table, title_column, body_columns = SEARCH_SOURCES[kind]
+    return (f"INSERT INTO {SEARCH_TABLE}(rowid, title, body) "
+            f"SELECT new.id * {ROWID_STRIDE} + {slot}, new.{title_column}, {_joined(*body_columns)} "
+            f"FROM {table} AS new")
+
+def ensure_search_index():
+    """
+    Creates the FTS5 table and its sync triggers if missing, filling the index
+    from the existing rows when the table is new. Must run after the source tables exist.
+    """
+    with db.engine.begin() as conn:
+        exists = conn.execute(db.text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': SEARCH_TABLE}).first()
+        if not exists:
+            # prefix='2 3': dedicated indexes for short prefixes, the slowest prefix queries otherwise
+            conn.execute(db.text(
+                f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+                f"title, body, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"))
+        for kind in SEARCH_SOURCES:
+            for statement in _trigger_statements(kind):
+                conn.execute(db.text(statement))
+        if not exists:
+            for kind in SEARCH_SOURCES:
+                conn.execute(db.text(_populate_statement(kind)))
+
+def rebuild_search_index():
+    """
+    Re-creates the index contents from the source tables.
+    """
+    with db.engine.begin() as conn:
+        conn.execute(db.text(f"DELETE FROM {SEARCH_TABLE}"))
+        for kind in SEARCH_SOURCES:
+            conn.execute(db.text(_populate_statement(kind)))
+        conn.execute(db.text(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('optimize')"))
+
+def _search_terms(text):
+    return _TERM.findall(text or '')
+
+def build_match_query(text):
+    """
+    Turns free user input into an FTS5 MATCH expression of quoted prefix terms.
+    Returns None when the input has no searchable term.
+    """
+    terms = _search_terms(text)
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' for term in terms)
+
+def make_snippet(body, terms, tokens=SNIPPET_TOKENS):
+    """
+    Returns an HTML-escaped excerpt of body around the first hit, with every
+    word that starts with one of the terms wrapped in <mark>.
+    """
+    if not body:
+        return ''
+    hit = re.compile(r'\b(?:' + '|'.join(re.escape(term) for term in terms) + r')\w*', re.IGNORECASE | re.UNICODE)
+    first = hit.search(body)
+    center = first.start() if first else 0
+    # Only tokenize a window around the hit, so long document text costs nothing extra
+    window_start = max(0, center - 200)
+    words = list(_TERM.finditer(body, window_start, center + 400))
+    hit_index = next((i for i, word in enumerate(words) if word.start() >= center), 0)
+    begin = max(0, hit_index - tokens // 4)
+    words = words[begin:begin + tokens]
+    if not words:
+        return ''
+    parts, cursor = [], words[0].start()
+    for word in words:
+        parts.append(str(escape(body[cursor:word.start()])))
+        text = str(escape(word.group()))
+        parts.append(f"<mark>{text}</mark>" if hit.fullmatch(word.group()) else text)
+        cursor = word.end()
+    leading = '…' if words[0].start() > 0 else ''
+    trailing = '…' if words[-1].end() < len(body.rstrip()) else ''
+    return leading + ''.join(parts) + trailing
+
+def search(text, kinds=None, limit=20, offset=0):
+    """
+    Ranked search over documents and properties.
+    Returns (results, total, has_more); each result has kind, id, title,
+    snippet (HTML-escaped, hits in <mark>) and score.
+
+    bm25 is computed for at most MAX_RANKED_MATCHES rows: when a query matches
+    more (e.g. a two-letter prefix), only the newest matches are ranked, which
+    keeps every query in the low milliseconds. Snippets are built in Python for
+    the returned page only, since snippet() would run for every ranked row.
+    """
+    match = build_match_query(text)
+    if match is None:
+        return [], 0, False
+    kind_filter = ''
+    if kinds:
+        slots = [SEARCH_SOURCES[kind][0] for kind in kinds]
+        kind_filter = f"AND rowid % {ROWID_STRIDE} IN ({', '.join(str(slot) for slot in slots)})"
+    params = {'match': match, 'cap': MAX_RANKED_MATCHES, 'limit': limit + 1, 'offset': offset}
+
+    total = db.session.execute(db.text(
+        f"SELECT count(*) FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :match {kind_filter}"), params).scalar()
+    if total == 0:
+        return [], 0, False
+    ranked = db.session.execute(db.text(
+        f"SELECT rowid, score FROM ("
+        f"  SELECT rowid, bm25({SEARCH_TABLE}, {TITLE_WEIGHT}, {BODY_WEIGHT}) AS score FROM {SEARCH_TABLE}"
+        f"  WHERE {SEARCH_TABLE} MATCH :match {kind_filter} ORDER BY rowid DESC LIMIT :cap"
+        f") ORDER BY score LIMIT :limit OFFSET :offset"
+    ), params).all()
+    page, has_more = ranked[:limit], len(ranked) > limit
+    if not page:
+        return [], total, has_more
+
+    # Title and body of the page by rowid (direct lookups, no MATCH)
+    texts = {row.rowid: row for row in db.session.execute(db.text(
+        f"SELECT rowid, title, body FROM {SEARCH_TABLE} WHERE rowid IN ({', '.join(str(row.rowid) for row in page)})"
+    ))}
+    terms = _search_terms(text)
+    results = [{
+        'kind': KIND_BY_SLOT[row.rowid % ROWID_STRIDE],
+        'id': row.rowid // ROWID_STRIDE,
+        'title': texts[row.rowid].title,
+        'snippet': make_snippet(texts[row.rowid].body, terms),
+        'score': round(-row.score, 4), # bm25() is lower-is-better; flip so higher means more relevant
+    } for row in page]
+    return results, total, has_more
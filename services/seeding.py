@@ -0,0 +1,72 @@
+# services/seeding.py
+###########################################
+# - Default Pay Calendar Seeding
+###########################################
+
+from flask import current_app
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, IncomeLedgerEntry
+from services.versioning import bump_table_versions
+from services.ledger import migrate_legacy_income_tables
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Year window seeded around the current year; overridable through app.config
+DEFAULT_YEARS_BACK = 1
+DEFAULT_YEARS_AHEAD = 1
+
+def ensure_pay_calendar(stream):
+    """
+    Makes sure an income stream has a zeroed ledger row for every month up to the
+    end of the configured window (PAY_CALENDAR_YEARS_BACK / PAY_CALENDAR_YEARS_AHEAD).
+
+    - An empty stream is seeded from (current year - back) to (current year + ahead).
+    - A populated stream is only extended forward from its last seeded year; history is never back-filled.
+    - An empty stream first receives its legacy rows (migrate_legacy_income_tables), which app.py
+      only runs when started directly; zero rows seeded first would make that copy skip those months.
+
+    Rows are written with a single INSERT ... ON CONFLICT DO NOTHING against the
+    unique (stream, year, month_index) index, so concurrent first requests cannot create duplicates.
+    Returns the number of rows inserted.
+    """
+    years_back = current_app.config.get('PAY_CALENDAR_YEARS_BACK', DEFAULT_YEARS_BACK)
+    years_ahead = current_app.config.get('PAY_CALENDAR_YEARS_AHEAD', DEFAULT_YEARS_AHEAD)
+    current_year = datetime.now().year
+    last_year = current_year + years_ahead
+
+    # Index-backed MAX() keeps the common "nothing to do" path to one cheap query
+    last_seeded_year = (db.session.query(db.func.max(IncomeLedgerEntry.year))
+                        .filter(IncomeLedgerEntry.stream == stream)
+                        .scalar())
+    if last_seeded_year is None and migrate_legacy_income_tables():
+        last_seeded_year = (db.session.query(db.func.max(IncomeLedgerEntry.year))
+                            .filter(IncomeLedgerEntry.stream == stream)
+                            .scalar())
+    if last_seeded_year is not None and last_seeded_year >= last_year:
+        return 0
+
+    first_year = current_year - years_back if last_seeded_year is None else last_seeded_year + 1
+    rows = [
+        {
+            'stream': stream,
+            'year': year,
+            'month_index': month_index,
+            'gross_pay': 0,
+            'taxed_amount': 0,
+            'net_pay': 0
+        }
+        for year in range(first_year, last_year + 1)
+        for month_index in range(1, 13)
+    ]
+
+    statement = sqlite_insert(IncomeLedgerEntry).values(rows).on_conflict_do_nothing(
+        index_elements=['stream', 'year', 'month_index']
+    )
+    result = db.session.execute(statement)
+    if result.rowcount:
+        bump_table_versions(db.session, [IncomeLedgerEntry.__tablename__])
+    db.session.commit()
+    logger.info(f"Income stream '{stream}' calendar seeded for {first_year}-{last_year} ({result.rowcount} new rows).")
+    return result.rowcount
@@ -0,0 +1,94 @@
+# services/sqlite_engine.py
+###########################################
+# - SQLite Engine Profile (pragmas & pooling)
+###########################################
+#
+# SQLITE_ENGINE_PROFILE selects how connections to data/database.db are set up:
+#
+#   tuned   : WAL journal (readers no longer block on the writer and commits
+#             append to the log instead of rewriting the rollback journal),
+#             synchronous=NORMAL (fsync at checkpoints, not on every commit;
+#             safe with WAL), a sized page cache, memory-mapped reads, a busy
+#             timeout so writers queue instead of failing with "database is
+#             locked", and foreign key enforcement.
+#   default : SQLite / SQLAlchemy defaults (rollback journal, no pragmas).
+#
+# Pragmas are applied on every new DB-API connection through SQLAlchemy's
+# 'connect' event, so pooled connections all share the same settings.
+###########################################
+
+from sqlalchemy import event
+import logging
+
+SQLITE_ENGINE_PROFILES = ('tuned', 'default')
+
+def sqlite_pragmas(profile, cache_size_mb=64, mmap_size_mb=256, busy_timeout_ms=5000):
+    """
+    Returns the ordered PRAGMA name -> value pairs for a profile.
+    """
+    if profile == 'default':
+        return {}
+    return {
+        'journal_mode': 'WAL',                   # Persistent in the DB file, but harmless to repeat
+        'synchronous': 'NORMAL',
+        'cache_size': -cache_size_mb * 1024,     # Negative = size in KiB rather than pages
+        'mmap_size': mmap_size_mb * 1024 * 1024,
+        'busy_timeout': busy_timeout_ms,
+        'foreign_keys': 'ON',
+        'temp_store': 'MEMORY',
+    }
+
+def sqlite_engine_options(profile, busy_timeout_ms=5000, pool_size=10, max_overflow=10, pool_timeout=10):
+    """
+    Returns create_engine() keyword arguments (SQLALCHEMY_ENGINE_OPTIONS) for a profile.
+
+    SQLAlchemy already uses a QueuePool with check_same_thread=False for file databases.
+    The tuned profile sizes that pool for a threaded server: every request thread
+    keeps its own connection, and extra threads wait pool_timeout seconds for one.
+    """
+    if profile not in SQLITE_ENGINE_PROFILES:
+        raise ValueError(f"SQLITE_ENGINE_PROFILE must be one of: {', '.join(SQLITE_ENGINE_PROFILES)}")
+    if profile == 'default':
+        return {}
+    return {
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': pool_timeout,
+        'connect_args': {'timeout': busy_timeout_ms / 1000}, # sqlite3's own busy handler, in seconds
+    }
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """
+    Registers a 'connect' listener that runs the given pragmas on each new connection.
+    Does nothing for non-SQLite engines or an empty profile.
+    """
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            if 'journal_mode' in pragmas:
+                mode = cursor.execute("PRAGMA journal_mode").fetchone()[0]
+                if mode.lower() != str(pragmas['journal_mode']).lower():
+                    # e.g. in-memory databases cannot use WAL
+                    logging.getLogger(__name__).debug(f"SQLite journal_mode is {mode}, not {pragmas['journal_mode']}")
+        finally:
+            cursor.close()
+
+def init_sqlite_engine(app, db):
+    """
+    Applies the app's SQLITE_* settings to the Flask-SQLAlchemy engine.
+    Call after db.init_app(app); SQLALCHEMY_ENGINE_OPTIONS must be set before it.
+    """
+    pragmas = sqlite_pragmas(
+        app.config.get('SQLITE_ENGINE_PROFILE', 'tuned'),
+        cache_size_mb=app.config.get('SQLITE_CACHE_SIZE_MB', 64),
+        mmap_size_mb=app.config.get('SQLITE_MMAP_SIZE_MB', 256),
+        busy_timeout_ms=app.config.get('SQLITE_BUSY_TIMEOUT_MS', 5000),
+    )
+    with app.app_context():
+        apply_sqlite_pragmas(db.engine, pragmas)
@@ -0,0 +1,346 @@
+# services/storage.py
+###########################################
+# - Content-Addressed Upload Storage
+###########################################
+#
+# Uploaded bytes are copied to disk in fixed-size chunks while a SHA-256 is
+# computed, then moved to UPLOAD_FOLDER/blobs/<aa>/<sha256>. Identical
+# documents therefore share one blob (the second copy is discarded), and
+# two different files with the same name can no longer overwrite each other.
+# The user-facing name, type and notes stay on the UploadedFile row.
+#
+# Large scans can be sent as a resumable upload: start a session, append
+# chunks at the offset the server reports, and the last chunk turns the
+# session into an UploadedFile. The partial file on disk is the source of
+# truth for the offset, so an interrupted client just asks for it and resumes.
+#
+# Deleting a shared blob races with a new upload of the same content, which
+# finds the blob on disk and commits its row later. Under _blob_lock,
+# _commit_blob holds the blob for the uploading session until its transaction
+# ends. Under the same lock, _remove_unreferenced() re-checks the committed
+# rows and the held blobs just before unlinking anything. The upload then either
+# sees the blob gone and writes it again, or keeps it alive until its row commits.
+###########################################
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from werkzeug.utils import secure_filename
+from models import db, UploadedFile, UploadSession, DocumentJob, DocumentLink
+from services.document_jobs import queue_document_jobs
+from services.document_links import link_related_record
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import logging
+import os
+import secrets
+import threading
+
+CHUNK_SIZE = 1024 * 1024 # 1 MiB per read/write
+BLOB_DIR = 'blobs'
+TMP_DIR = 'tmp'
+
+def _upload_root():
+    return current_app.config['UPLOAD_FOLDER']
+
+def _tmp_path(name):
+    directory = os.path.join(_upload_root(), TMP_DIR)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, name)
+
+def blob_path(sha256):
+    """
+    Relative blob path inside UPLOAD_FOLDER for a content hash.
+    """
+    return f"{BLOB_DIR}/{sha256[:2]}/{sha256}"
+
+def _copy_chunks(source, target, limit=None):
+    """
+    Copies a readable stream into an open file CHUNK_SIZE bytes at a time.
+    Stops after limit bytes when given. Returns the number of bytes written.
+    """
+    written = 0
+    while limit is None or written < limit:
+        chunk = source.read(CHUNK_SIZE if limit is None else min(CHUNK_SIZE, limit - written))
+        if not chunk:
+            break
+        target.write(chunk)
+        written += len(chunk)
+    return written
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+_blob_lock = threading.Lock() # Serializes blob dedup against blob removal
+_held_blobs = Counter() # storage_path -> sessions holding it until their transaction ends
+
+def _hold_blob(storage_path):
+    # Caller holds _blob_lock
+    _held_blobs[storage_path] += 1
+    db.session.info.setdefault('held_blobs', []).append(storage_path)
+
+@event.listens_for(Session, 'after_transaction_end')
+def _release_held_blobs(session, transaction):
+    """
+    Once the outermost transaction ends (commit: the row now protects the blob;
+    rollback: nothing does), the session's blobs are no longer held.
+    """
+    if transaction.parent is None:
+        _release_blobs(session)
+
+def _release_blobs(session):
+    if not session.info.get('held_blobs'):
+        return
+    with _blob_lock:
+        for storage_path in session.info.pop('held_blobs'):
+            _held_blobs[storage_path] -= 1
+            if _held_blobs[storage_path] <= 0:
+                del _held_blobs[storage_path]
+
+def _commit_blob(tmp_path, sha256):
+    """
+    Moves a finished temp file into the blob store, or drops it if the blob already exists.
+    Either way the blob is held for the current session until its transaction ends.
+    Returns (storage_path, deduplicated).
+    """
+    storage_path = blob_path(sha256)
+    final_path = os.path.join(_upload_root(), storage_path)
+    with _blob_lock:
+        _hold_blob(storage_path)
+        if os.path.exists(final_path):
+            os.remove(tmp_path)
+            return storage_path, True
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(tmp_path, final_path) # Atomic on the same filesystem
+    return storage_path, False
+
+def store_stream(stream):
+    """
+    Streams a file-like object into the blob store, hashing while it writes.
+    Returns (sha256, size, storage_path, deduplicated).
+    """
+    tmp_path = _tmp_path(secrets.token_hex(16) + '.upload')
+    digest, size = hashlib.sha256(), 0
+    try:
+        with open(tmp_path, 'wb') as target:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                target.write(chunk)
+                size += len(chunk)
+        sha256 = digest.hexdigest()
+        storage_path, deduplicated = _commit_blob(tmp_path, sha256)
+        return sha256, size, storage_path, deduplicated
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _track_new_blob(storage_path, deduplicated):
+    # Lets discard_new_blobs() clean up if the transaction that should reference the blob fails
+    if not deduplicated:
+        db.session.info.setdefault('new_blobs', []).append(storage_path)
+
+@event.listens_for(Session, 'after_commit')
+def _forget_committed_blobs(session):
+    session.info.pop('new_blobs', None)
+
+def save_upload(file, related_page, related_id=None, notes=''):
+    """
+    Stores a Werkzeug FileStorage and adds its UploadedFile row to the session (not committed).
+    Returns (uploaded_file, deduplicated).
+    """
+    sha256, size, storage_path, deduplicated = store_stream(file.stream)
+    _track_new_blob(storage_path, deduplicated)
+    uploaded_file = UploadedFile(
+        filename=secure_filename(file.filename),
+        filetype=file.content_type,
+        related_page=related_page,
+        related_id=related_id,
+        notes=notes,
+        sha256=sha256,
+        size=size,
+        storage_path=storage_path
+    )
+    db.session.add(uploaded_file)
+    link_related_record(uploaded_file)
+    queue_document_jobs(uploaded_file) # Thumbnail + text extraction after commit
+    return uploaded_file, deduplicated
+
+def delete_uploads(uploaded_files):
+    """
+    Deletes UploadedFile rows with their jobs and links (not committed) and returns
+    the on-disk paths (blobs, thumbnails) no remaining row references. Remove them
+    after the commit with remove_files_later(), which checks again before unlinking.
+    """
+    if not uploaded_files:
+        return []
+    ids = [uploaded_file.id for uploaded_file in uploaded_files]
+    candidates = {}
+    for uploaded_file in uploaded_files:
+        names = [name for name in (uploaded_file.stored_name, uploaded_file.thumbnail_path) if name]
+        candidates.setdefault(uploaded_file.sha256 or f"id:{uploaded_file.id}", set()).update(names)
+    DocumentJob.query.filter(DocumentJob.file_id.in_(ids)).delete(synchronize_session=False)
+    DocumentLink.query.filter(DocumentLink.file_id.in_(ids)).delete(synchronize_session=False)
+    for uploaded_file in uploaded_files:
+        db.session.delete(uploaded_file)
+    db.session.flush()
+
+    # Checked after the flush, so files sharing a blob within the same batch don't keep it alive
+    hashes = [key for key in candidates if not key.startswith('id:')]
+    still_used = set(db.session.execute(
+        db.select(UploadedFile.sha256).where(UploadedFile.sha256.in_(hashes)).distinct()
+    ).scalars()) if hashes else set()
+    return [os.path.join(_upload_root(), name)
+            for key, names in candidates.items() if key not in still_used
+            for name in sorted(names)]
+
+def delete_upload(uploaded_file):
+    """
+    Single-file delete_uploads().
+    """
+    return delete_uploads([uploaded_file])
+
+def remove_files(paths):
+    """
+    Removes files from disk, ignoring ones already gone.
+    """
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.getLogger(__name__).warning(f"Could not remove {path}: {e}")
+
+def _remove_unreferenced(paths):
+    """
+    Removes the files (absolute paths inside UPLOAD_FOLDER) that no committed row
+    references and no open upload holds, deciding under _blob_lock.
+    """
+    root = _upload_root()
+    names = {os.path.relpath(path, root).replace(os.sep, '/'): path for path in paths}
+    if not names:
+        return
+    with _blob_lock:
+        used = set(db.session.execute(
+            db.select(UploadedFile.storage_path).where(UploadedFile.storage_path.in_(names))
+        ).scalars()) | set(db.session.execute(
+            db.select(UploadedFile.thumbnail_path).where(UploadedFile.thumbnail_path.in_(names))
+        ).scalars())
+        db.session.rollback() # End the read transaction; it must not outlive the lock
+        remove_files(path for name, path in names.items() if name not in used and name not in _held_blobs)
+
+# One background thread removes blobs after bulk deletes, so the response doesn't wait on disk I/O
+_cleanup_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='upload-cleanup')
+
+def _remove_unreferenced_in_app(app, paths):
+    with app.app_context():
+        try:
+            _remove_unreferenced(paths)
+        except Exception as e:
+            logging.getLogger(__name__).error(f"Upload cleanup failed: {e}", exc_info=True)
+        finally:
+            db.session.remove()
+
+def remove_files_later(paths):
+    """
+    Removes files in the background, re-checking that nothing references them by then.
+    Call only after the deleting transaction committed.
+    """
+    if paths:
+        _cleanup_executor.submit(_remove_unreferenced_in_app, current_app._get_current_object(), list(paths))
+
+def discard_new_blobs():
+    """
+    Call after db.session.rollback() of a failed upload: removes the blobs it wrote,
+    unless a committed row or another open upload (e.g. a concurrent identical one) uses them.
+    """
+    _release_blobs(db.session()) # Also when the failure came before any transaction began
+    storage_paths = db.session.info.pop('new_blobs', None)
+    if storage_paths:
+        _remove_unreferenced([os.path.join(_upload_root(), path) for path in storage_paths])
+
+#-----------------------------------------
+# Resumable chunked uploads
+#-----------------------------------------
+def _part_path(session_id):
+    return _tmp_path(f"{session_id}.part")
+
+def upload_offset(upload_session):
+    """
+    Bytes received so far for a session (size of its partial file).
+    """
+    path = _part_path(upload_session.id)
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+def start_upload(filename, total_size, filetype=None, related_page='unspecified', related_id=None, notes=''):
+    """
+    Creates an upload session (not committed) with an empty partial file.
+    """
+    upload_session = UploadSession(
+        id=secrets.token_hex(16),
+        filename=secure_filename(filename),
+        filetype=filetype,
+        total_size=total_size,
+        related_page=related_page,
+        related_id=related_id,
+        notes=notes
+    )
+    open(_part_path(upload_session.id), 'wb').close()
+    db.session.add(upload_session)
+    return upload_session
+
+def append_chunk(upload_session, offset, stream, length):
+    """
+    Appends one chunk read from stream at the given offset.
+    Raises ValueError if offset is not where the partial file ends (the client
+    should resume from upload_offset()) or the chunk would exceed total_size.
+    When the last byte arrives the blob is committed, the session deleted and the
+    new UploadedFile added to the db session (not committed). Returns (offset, uploaded_file or None).
+    """
+    current = upload_offset(upload_session)
+    if offset != current:
+        raise ValueError(f"Offset mismatch: upload is at byte {current}")
+    if length is None or current + length > upload_session.total_size:
+        raise ValueError(f"Chunk exceeds the announced size of {upload_session.total_size} bytes")
+
+    path = _part_path(upload_session.id)
+    with open(path, 'ab') as target:
+        written = _copy_chunks(stream, target, limit=length)
+    current += written
+    if current < upload_session.total_size:
+        return current, None
+
+    # Last chunk: hash once in a single sequential pass, then move into the blob store
+    sha256 = _hash_file(path)
+    storage_path, deduplicated = _commit_blob(path, sha256)
+    _track_new_blob(storage_path, deduplicated)
+    uploaded_file = UploadedFile(
+        filename=upload_session.filename,
+        filetype=upload_session.filetype,
+        related_page=upload_session.related_page,
+        related_id=upload_session.related_id,
+        notes=upload_session.notes,
+        sha256=sha256,
+        size=current,
+        storage_path=storage_path
+    )
+    db.session.add(uploaded_file)
+    db.session.delete(upload_session)
+    link_related_record(uploaded_file)
+    queue_document_jobs(uploaded_file)
+    return current, uploaded_file
+
+def abort_upload(upload_session):
+    """
+    Deletes a session (not committed) and its partial file.
+    """
+    path = _part_path(upload_session.id)
+    if os.path.exists(path):
+        os.remove(path)
+    db.session.delete(upload_session)
@@ -0,0 +1,66 @@
+# services/streaming.py
+###########################################
+# - Streamed JSON / NDJSON Responses
+###########################################
+#
+# Large table endpoints accept ?stream=json or ?stream=ndjson. Rows are read
+# from the database in chunks (yield_per) and written to the client as they
+# are serialized, so peak memory stays flat regardless of row count and the
+# first bytes go out before the query has finished.
+###########################################
+
+from flask import Response, current_app, stream_with_context
+
+STREAM_MODES = ('json', 'ndjson')
+STREAM_CHUNK_SIZE = 500 # Rows fetched from SQLite per round trip while streaming
+
+def get_stream_mode(args):
+    """
+    Returns the requested stream mode ('json' or 'ndjson'), None when the client
+    did not ask for streaming, or raises ValueError for an unknown mode.
+    """
+    mode = args.get('stream')
+    if not mode:
+        return None
+    if mode not in STREAM_MODES:
+        raise ValueError(f"stream must be one of: {', '.join(STREAM_MODES)}")
+    return mode
+
+def _json_array(rows, serialize, dumps):
+    """
+    Yields a JSON array one element at a time.
+    """
+    yield '['
+    first = True
+    for row in rows:
+        if first:
+            first = False
+            yield dumps(serialize(row))
+        else:
+            yield ',' + dumps(serialize(row))
+    yield ']'
+
+def _ndjson(rows, serialize, dumps):
+    """
+    Yields one JSON document per line.
+    """
+    for row in rows:
+        yield dumps(serialize(row)) + '\n'
+
+def streamed_response(query, serialize, mode, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Builds a streaming response from a SQLAlchemy query.
+
+    Args:
+        query: Query to stream; it is executed with yield_per(chunk_size)
+        serialize: Converts one result row to a JSON-serializable dict
+        mode: 'json' for a JSON array, 'ndjson' for newline-delimited JSON
+    """
+    dumps = current_app.json.dumps # Honors the app's provider (money as fixed-point strings)
+    rows = query.yield_per(chunk_size)
+    if mode == 'ndjson':
+        body, mimetype = _ndjson(rows, serialize, dumps), 'application/x-ndjson'
+    else:
+        body, mimetype = _json_array(rows, serialize, dumps), 'application/json'
+    # stream_with_context keeps the app context (and its DB session) alive while the generator runs
+    return Response(stream_with_context(body), mimetype=mimetype)
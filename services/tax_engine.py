@@ -0,0 +1,293 @@
+# services/tax_engine.py
+###########################################
+# - Federal Income Tax Engine (Form 1040 estimates)
+###########################################
+#
+# TAX_YEARS holds each year's published figures. The first time a year is used
+# it is compiled into TaxTables: for every filing status, the lower bound of
+# each bracket (cents), its rate, and the tax owed at that lower bound. The tax
+# on any amount is then a binary search for its bracket plus one multiply:
+#   tax = base[i] + (amount - lower[i]) * rate[i]
+# and the same expression evaluates a whole array of amounts at once.
+#
+# estimate_batch() computes any number of returns (arrays of inputs) in one
+# vectorized pass; estimate() is the single-return case of the same code, and
+# scenario_grid() expands what-if lists (filing status x income x deductions)
+# into those arrays. Amounts are integer cents.
+#
+# Modeled: wages; long-term capital gains, taxed at 0/15/20% stacked on top
+# of ordinary income, with net losses deductible up to the annual limit;
+# Schedule C profit, which is subject to SE tax up to the Social Security wage
+# base, with half of the SE tax deducted from income; educator expenses up to
+# the limit; the standard or an itemized deduction; and the child tax credit,
+# phased out and limited to income tax. Not modeled: the refundable part of the
+# credit, Additional Medicare Tax, NIIT, AMT and QBI.
+###########################################
+
+from services.money import to_cents
+from collections import namedtuple
+import math
+import threading
+import numpy as np
+
+FILING_STATUSES = ('single', 'married_jointly', 'married_separately', 'head_of_household', 'surviving_spouse')
+TABLE_STATUS = {'surviving_spouse': 'married_jointly'} # Statuses that use another status's figures
+
+SE_EARNINGS_FACTOR = 0.9235 # Net earnings from self-employment = 92.35% of Schedule C profit
+SE_MINIMUM_EARNINGS = 40000 # No SE tax below $400 of net earnings (cents)
+SOCIAL_SECURITY_RATE = 0.124
+MEDICARE_RATE = 0.029
+CAPITAL_LOSS_LIMIT = {'married_separately': 150000} # Cents; 300000 for every other status
+CHILD_CREDIT_PHASEOUT = {'married_jointly': 40000000} # AGI threshold in cents; 20000000 otherwise
+CHILD_CREDIT_PHASEOUT_STEP = 100000 # Credit drops $50 per $1,000 (or part) of AGI over the threshold
+CHILD_CREDIT_PHASEOUT_AMOUNT = 5000
+MAX_SCENARIOS = 250000
+
+#-----------------------------------------
+# Published figures, in dollars (brackets: (lower bound, rate) from the lowest up)
+#-----------------------------------------
+TAX_YEARS = {
+    2024: {
+        'brackets': {
+            'single': ((0, .10), (11600, .12), (47150, .22), (100525, .24), (191950, .32), (243725, .35), (609350, .37)),
+            'married_jointly': ((0, .10), (23200, .12), (94300, .22), (201050, .24), (383900, .32), (487450, .35), (731200, .37)),
+            'married_separately': ((0, .10), (11600, .12), (47150, .22), (100525, .24), (191950, .32), (243725, .35), (365600, .37)),
+            'head_of_household': ((0, .10), (16550, .12), (63100, .22), (100500, .24), (191950, .32), (243700, .35), (609350, .37)),
+        },
+        'capital_gains': {
+            'single': ((0, 0), (47025, .15), (518900, .20)),
+            'married_jointly': ((0, 0), (94050, .15), (583750, .20)),
+            'married_separately': ((0, 0), (47025, .15), (291850, .20)),
+            'head_of_household': ((0, 0), (63000, .15), (551350, .20)),
+        },
+        'standard_deduction': {'single': 14600, 'married_jointly': 29200, 'married_separately': 14600, 'head_of_household': 21900},
+        'social_security_wage_base': 168600,
+        'child_tax_credit': 2000,
+        'educator_expense_limit': 300,
+    },
+    2025: {
+        'brackets': {
+            'single': ((0, .10), (11925, .12), (48475, .22), (103350, .24), (197300, .32), (250525, .35), (626350, .37)),
+            'married_jointly': ((0, .10), (23850, .12), (96950, .22), (206700, .24), (394600, .32), (501050, .35), (751600, .37)),
+            'married_separately': ((0, .10), (11925, .12), (48475, .22), (103350, .24), (197300, .32), (250525, .35), (375800, .37)),
+            'head_of_household': ((0, .10), (17000, .12), (64850, .22), (103350, .24), (197300, .32), (250500, .35), (626350, .37)),
+        },
+        'capital_gains': {
+            'single': ((0, 0), (48350, .15), (533400, .20)),
+            'married_jointly': ((0, 0), (96700, .15), (600050, .20)),
+            'married_separately': ((0, 0), (48350, .15), (300000, .20)),
+            'head_of_household': ((0, 0), (64750, .15), (566700, .20)),
+        },
+        # As raised for 2025 by Public Law 119-21 (standard deduction and child tax credit)
+        'standard_deduction': {'single': 15750, 'married_jointly': 31500, 'married_separately': 15750, 'head_of_household': 23625},
+        'social_security_wage_base': 176100,
+        'child_tax_credit': 2200,
+        'educator_expense_limit': 300,
+    },
+}
+
+class TaxInputError(ValueError):
+    """
+    A return or scenario request cannot be computed (unknown year or filing status, bad amount).
+    """
+
+#-----------------------------------------
+# Compiled tables
+#-----------------------------------------
+# A bracket schedule for every filing status, as (statuses x brackets) arrays
+Brackets = namedtuple('Brackets', 'lower rate base')
+TaxTables = namedtuple('TaxTables', 'year brackets capital_gains standard_deduction social_security_wage_base '
+                                    'child_tax_credit educator_expense_limit capital_loss_limit child_credit_phaseout')
+
+def _compile_brackets(schedules):
+    lower = np.array([[bound * 100 for bound, _ in schedule] for schedule in schedules], np.float64)
+    rate = np.array([[rate for _, rate in schedule] for schedule in schedules], np.float64)
+    # Tax owed at each lower bound: the sum of every full bracket below it
+    base = np.concatenate([np.zeros((len(schedules), 1)), np.cumsum(np.diff(lower, axis=1) * rate[:, :-1], axis=1)],
+                          axis=1)
+    return Brackets(lower, rate, base)
+
+def compile_year(year):
+    """
+    Builds the TaxTables of one TAX_YEARS entry; rows follow FILING_STATUSES.
+    """
+    figures = TAX_YEARS[year]
+    statuses = [TABLE_STATUS.get(status, status) for status in FILING_STATUSES]
+    per_status = lambda amounts, default=None: np.array(
+        [amounts.get(status, default) for status in FILING_STATUSES], np.float64)
+    return TaxTables(
+        year=year,
+        brackets=_compile_brackets([figures['brackets'][status] for status in statuses]),
+        capital_gains=_compile_brackets([figures['capital_gains'][status] for status in statuses]),
+        standard_deduction=np.array([figures['standard_deduction'][status] * 100 for status in statuses], np.float64),
+        social_security_wage_base=figures['social_security_wage_base'] * 100,
+        child_tax_credit=figures['child_tax_credit'] * 100,
+        educator_expense_limit=figures['educator_expense_limit'] * 100,
+        capital_loss_limit=per_status(CAPITAL_LOSS_LIMIT, 300000),
+        child_credit_phaseout=per_status(CHILD_CREDIT_PHASEOUT, 20000000),
+    )
+
+_compiled = {} # year -> TaxTables, filled on first use
+_compiled_lock = threading.Lock()
+
+def tax_tables(year):
+    """
+    The compiled tables of a tax year (compiled once, then shared).
+    """
+    tables = _compiled.get(year)
+    if tables is None:
+        if year not in TAX_YEARS:
+            raise TaxInputError(f"No tax tables for {year} (available: {', '.join(map(str, sorted(TAX_YEARS)))})")
+        with _compiled_lock:
+            tables = _compiled.get(year)
+            if tables is None:
+                tables = _compiled[year] = compile_year(year)
+    return tables
+
+def latest_year():
+    return max(TAX_YEARS)
+
+#-----------------------------------------
+# Vectorized computation
+#-----------------------------------------
+def bracket_tax(brackets, status, amount):
+    """
+    Tax on amounts (cents, >= 0) under each one's filing status row.
+    Returns (tax, marginal rate). One searchsorted per filing status present.
+    """
+    index = np.empty(amount.shape, np.int64)
+    for row in np.unique(status):
+        selected = status == row
+        index[selected] = np.searchsorted(brackets.lower[row], amount[selected], side='right') - 1
+    return (brackets.base[status, index] + (amount - brackets.lower[status, index]) * brackets.rate[status, index],
+            brackets.rate[status, index])
+
+def estimate_batch(year, status, wages=0, capital_gain=0, business_income=0, educator_expenses=0,
+                   itemized_deduction=np.nan, dependents=0):
+    """
+    Computes returns from arrays of inputs (cents; broadcast together). status
+    holds indexes into FILING_STATUSES; itemized_deduction is NaN where the
+    standard deduction applies. Returns a dict of arrays: amounts as int64 cents,
+    marginal_rate and effective_rate as fractions.
+    """
+    tables = tax_tables(year)
+    status, wages, capital_gain, business_income, educator_expenses, itemized_deduction, dependents = np.broadcast_arrays(
+        np.asarray(status, np.int64), *(np.asarray(value, np.float64) for value in
+        (wages, capital_gain, business_income, educator_expenses, itemized_deduction, dependents)))
+
+    # Self-employment tax; half of it is an adjustment to income
+    se_earnings = np.maximum(business_income, 0) * SE_EARNINGS_FACTOR
+    se_earnings = np.where(se_earnings < SE_MINIMUM_EARNINGS, 0, se_earnings)
+    social_security_room = np.maximum(tables.social_security_wage_base - wages, 0)
+    se_tax = np.rint(np.minimum(se_earnings, social_security_room) * SOCIAL_SECURITY_RATE + se_earnings * MEDICARE_RATE)
+
+    # Net capital losses offset ordinary income only up to the limit
+    capital_income = np.maximum(capital_gain, -tables.capital_loss_limit[status])
+    educator_cap = tables.educator_expense_limit * np.where(status == FILING_STATUSES.index('married_jointly'), 2, 1)
+    adjustments = np.rint(se_tax / 2) + np.clip(educator_expenses, 0, educator_cap)
+    agi = wages + capital_income + business_income - adjustments
+
+    deduction = np.where(np.isnan(itemized_deduction), tables.standard_deduction[status], np.maximum(itemized_deduction, 0))
+    taxable_income = np.maximum(agi - deduction, 0)
+
+    # Gains sit on top of ordinary income: the part of the 0/15/20% schedule between the two
+    preferential = np.minimum(np.maximum(capital_gain, 0), taxable_income)
+    ordinary_income = taxable_income - preferential
+    ordinary_tax, marginal_rate = bracket_tax(tables.brackets, status, ordinary_income)
+    capital_gains_tax = (bracket_tax(tables.capital_gains, status, taxable_income)[0]
+                         - bracket_tax(tables.capital_gains, status, ordinary_income)[0])
+    income_tax = np.rint(ordinary_tax) + np.rint(capital_gains_tax)
+
+    over_threshold = np.maximum(agi - tables.child_credit_phaseout[status], 0)
+    phaseout = np.ceil(over_threshold / CHILD_CREDIT_PHASEOUT_STEP) * CHILD_CREDIT_PHASEOUT_AMOUNT
+    child_tax_credit = np.minimum(np.maximum(np.maximum(dependents, 0) * tables.child_tax_credit - phaseout, 0), income_tax)
+
+    total_tax = income_tax - child_tax_credit + se_tax
+    with np.errstate(divide='ignore', invalid='ignore'):
+        effective_rate = np.where(agi > 0, total_tax / agi, 0)
+    cents = lambda values: np.rint(values).astype(np.int64)
+    return {
+        'agi': cents(agi), 'adjustments': cents(adjustments), 'deduction': cents(deduction),
+        'taxable_income': cents(taxable_income), 'ordinary_tax': cents(ordinary_tax),
+        'capital_gains_tax': cents(capital_gains_tax), 'income_tax': cents(income_tax),
+        'self_employment_tax': cents(se_tax), 'child_tax_credit': cents(child_tax_credit),
+        'total_tax': cents(total_tax), 'marginal_rate': marginal_rate, 'effective_rate': effective_rate,
+    }
+
+#-----------------------------------------
+# Request inputs
+#-----------------------------------------
+INPUT_FIELDS = ('filing_status', 'wages', 'capital_gain', 'business_income', 'educator_expenses', 'deduction',
+                'dependents')
+MONEY_INPUTS = ('wages', 'capital_gain', 'business_income', 'educator_expenses')
+RESULT_FIELDS = ('agi', 'adjustments', 'deduction', 'taxable_income', 'ordinary_tax', 'capital_gains_tax', 'income_tax',
+                 'self_employment_tax', 'child_tax_credit', 'total_tax', 'marginal_rate', 'effective_rate')
+
+def _parse_input(field, value):
+    """
+    One input value: a FILING_STATUSES index, cents, a dependent count, or for
+    'deduction' the itemized cents (NaN for 'standard').
+    """
+    try:
+        if field == 'filing_status':
+            return FILING_STATUSES.index(value)
+        if field == 'deduction':
+            return np.nan if value in (None, '', 'standard') else max(to_cents(value), 0)
+        if field == 'dependents':
+            return max(int(value or 0), 0)
+        return to_cents(value or 0)
+    except (ValueError, TypeError, ArithmeticError):
+        if field == 'filing_status':
+            raise TaxInputError(f"filing_status must be one of: {', '.join(FILING_STATUSES)}")
+        raise TaxInputError(f"Invalid {field}: {value!r}")
+
+def _parse_year(data):
+    try:
+        return int(data.get('year') or latest_year())
+    except (TypeError, ValueError):
+        raise TaxInputError(f"Invalid year: {data.get('year')!r}")
+
+def estimate(data):
+    """
+    One return from a dict of INPUT_FIELDS (amounts in dollars; deduction is
+    'standard' or the itemized amount). Returns (year, {field: cents or rate}).
+    """
+    year = _parse_year(data)
+    inputs = {field: _parse_input(field, data.get(field, 'single' if field == 'filing_status' else None))
+              for field in INPUT_FIELDS}
+    result = estimate_batch(year, [inputs['filing_status']], [inputs['wages']], [inputs['capital_gain']],
+                            [inputs['business_income']], [inputs['educator_expenses']], [inputs['deduction']],
+                            [inputs['dependents']])
+    return year, {name: values[0].item() for name, values in result.items()}
+
+def scenario_grid(data):
+    """
+    What-if planning: any INPUT_FIELD may be a list, and the scenarios are every
+    combination of the listed values (e.g. filing_status x wages x deduction).
+    Returns (year, {field: input values per scenario}, results of estimate_batch).
+    """
+    year = _parse_year(data)
+    options = {}
+    for field in INPUT_FIELDS:
+        value = data.get(field, 'single' if field == 'filing_status' else None)
+        values = value if isinstance(value, list) else [value]
+        if not values:
+            raise TaxInputError(f"{field} cannot be an empty list")
+        options[field] = values
+    count = math.prod(len(values) for values in options.values()) # Python ints: no int64 overflow past the limit
+    if count > MAX_SCENARIOS:
+        raise TaxInputError(f"{count} scenarios requested; the limit is {MAX_SCENARIOS}")
+
+    # Parse each distinct value once, then expand the grid with index arithmetic
+    parsed = {field: np.array([_parse_input(field, value) for value in values],
+                              np.int64 if field in ('filing_status', 'dependents') else np.float64)
+              for field, values in options.items()}
+    shape = [len(values) for values in options.values()]
+    index = np.indices(shape).reshape(len(shape), -1)
+    columns = {field: parsed[field][index[axis]] for axis, field in enumerate(INPUT_FIELDS)}
+    result = estimate_batch(year, columns['filing_status'], columns['wages'], columns['capital_gain'],
+                            columns['business_income'], columns['educator_expenses'], columns['deduction'],
+                            columns['dependents'])
+    inputs = {field: [options[field][i] for i in index[axis]] for axis, field in enumerate(INPUT_FIELDS)
+              if len(options[field]) > 1}
+    return year, inputs, result
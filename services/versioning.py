@@ -0,0 +1,98 @@
+# services/versioning.py
+###########################################
+# - Table Change Counters & Conditional GET
+###########################################
+#
+# Every write bumps a per-table counter in table_versions inside the same
+# transaction. Read endpoints turn the counters into an ETag/Last-Modified
+# pair and answer If-None-Match / If-Modified-Since with a 304 before any
+# data query runs.
+#
+# ORM writes are tracked automatically (after_flush). Core statements that
+# bypass the ORM (bulk inserts, migrations) call bump_table_versions() themselves.
+###########################################
+
+from flask import request, current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, TableVersion
+from datetime import datetime
+from itertools import chain
+
+def _upsert_statement():
+    statement = sqlite_insert(TableVersion.__table__)
+    return statement.on_conflict_do_update(
+        index_elements=['table_name'],
+        set_={'version': TableVersion.__table__.c.version + 1, 'updated_at': statement.excluded.updated_at}
+    )
+
+def bump_table_versions(session, table_names):
+    """
+    Increments the change counter of each table in the session's transaction.
+    The caller's commit (or rollback) applies the bump together with the write.
+    The tables are also recorded in session.info['changed_tables'] so other
+    after_commit listeners (e.g. services/cache.py) know what changed.
+    """
+    table_names = sorted(set(table_names) - {TableVersion.__tablename__})
+    if not table_names:
+        return
+    session.info.setdefault('changed_tables', set()).update(table_names)
+    now = datetime.utcnow()
+    session.connection().execute(_upsert_statement(),
+                                 [{'table_name': name, 'version': 1, 'updated_at': now} for name in table_names])
+
+@event.listens_for(Session, 'after_flush')
+def _bump_flushed_tables(session, flush_context):
+    """
+    Bumps the tables of every ORM object inserted, updated or deleted by this flush.
+    (session.new/dirty/deleted still describe the flushed changes at this point.)
+    """
+    tables = {obj.__table__.name for obj in chain(session.new, session.dirty, session.deleted)
+              if hasattr(obj, '__table__')}
+    if tables:
+        bump_table_versions(session, tables)
+
+def get_table_versions(table_names):
+    """
+    Returns (etag, last_modified) for a set of tables with a single primary-key lookup.
+    Tables that were never written have version 0 and no modification time.
+    """
+    rows = db.session.execute(
+        db.select(TableVersion.table_name, TableVersion.version, TableVersion.updated_at)
+        .where(TableVersion.table_name.in_(table_names))
+    ).all()
+    versions = {name: (version, updated_at) for name, version, updated_at in rows}
+    etag = '-'.join(f"{name}.{versions.get(name, (0, None))[0]}" for name in sorted(table_names))
+    timestamps = [updated_at for _, updated_at in versions.values() if updated_at]
+    return etag, max(timestamps) if timestamps else None
+
+def conditional_get(table_names, build_response):
+    """
+    Serves a read endpoint with ETag/Last-Modified validators derived from table versions.
+
+    Returns 304 Not Modified when the client's If-None-Match (or, without it,
+    If-Modified-Since) still matches, without calling build_response(). Otherwise
+    calls build_response() and tags successful responses with the validators.
+    """
+    etag, last_modified = get_table_versions(table_names)
+
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    else:
+        since = request.if_modified_since
+        not_modified = bool(since and last_modified and last_modified.replace(microsecond=0) <= since.replace(tzinfo=None))
+
+    if not_modified:
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.make_response(build_response())
+        if response.status_code != 200:
+            return response
+
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    # Cache, but revalidate on every use so edits show up immediately
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
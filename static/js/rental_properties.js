@@ -71,6 +71,10 @@ function sortProperties() {
         if (sortBy === 'purchase_date') {
             return new Date(a[sortBy]) - new Date(b[sortBy]);
         }
+        if (sortBy === 'purchase_price') {
+            // Money arrives as a fixed-point string, e.g. "250000.00"
+            return parseFloat(a[sortBy] || 0) - parseFloat(b[sortBy] || 0);
+        }
         if (typeof a[sortBy] === 'string') {
             return a[sortBy].localeCompare(b[sortBy]);
         }
@@ -92,6 +96,7 @@ function editProperty(id) {
     document.getElementById('city').value = property.city;
     document.getElementById('state').value = property.state;
     document.getElementById('county').value = property.county || '';
+    document.getElementById('country').value = property.country || '';
     document.getElementById('built-year').value = property.built_year;
     document.getElementById('purchase-date').value = property.purchase_date;
     document.getElementById('ownership-association').value = property.ownership_association;
@@ -134,16 +139,7 @@ async function handleFormSubmission(event) {
     let errorMessage = '';
 
     if (currentEditPropertyId) {
-        // Editing is not the focus here, but we'll assume it sends JSON.
-        // For simplicity, this example focuses on fixing the 'add' functionality.
-        // The original edit logic would need to be adapted.
-        apiEndpoint = `/company_finances/api/rental_properties/update/${currentEditPropertyId}`;
-        method = 'PUT';
-        // For PUT with JSON, you would construct a JSON object, not use FormData.
-        // This part is left as an exercise, as the primary goal is fixing file upload on ADD.
-        showMessage("Edit functionality not covered in this fix.", "info");
-        return; 
-        
+        return patchProperty(currentEditPropertyId, formData);
     } else {
         // This is for ADDING a new property
         apiEndpoint = '/company_finances/api/rental_properties/add';
@@ -181,6 +177,49 @@ async function handleFormSubmission(event) {
     }
 }
 
+// Sends only the fields that differ from the loaded copy; If-Match carries the
+// version it was loaded at, so an edit made elsewhere in the meantime is refused (412)
+async function patchProperty(id, formData) {
+    const property = rentalPropertiesData.find(p => p.id == id);
+    if (!property) return showMessage("Property not found.", "error");
+
+    const changes = {};
+    for (const [field, value] of formData.entries()) {
+        if (field === 'id' || field === 'property_id' || field === 'file' || field === 'notes') continue;
+        const current = property[field] === null || property[field] === undefined ? '' : String(property[field]);
+        if (value.trim() !== current && !(value !== '' && current !== '' && Number(value) === Number(current))) {
+            changes[field] = value;
+        }
+    }
+    if (Object.keys(changes).length === 0) {
+        cancelEdit();
+        return showMessage("No changes to save.", "info");
+    }
+
+    try {
+        const response = await fetch(`/company_finances/api/rental_properties/${id}`, {
+            method: 'PATCH',
+            headers: { 'Content-Type': 'application/json', 'If-Match': `"${property.version}"` },
+            body: JSON.stringify(changes)
+        });
+        const result = await response.json();
+        if (response.status === 412) {
+            // Someone else saved first: reload their version rather than overwrite it
+            Object.assign(property, result.property);
+            editProperty(id);
+            return showMessage("This property was changed elsewhere. The form now shows the latest version; reapply your edit.", "error");
+        }
+        if (!response.ok) throw new Error(result.error || response.statusText);
+
+        showMessage(result.message, "success");
+        cancelEdit();
+        initializeApp();
+    } catch (err) {
+        console.error(err);
+        showMessage(`Failed to update property. ${err.message}`, "error");
+    }
+}
+
 async function deleteProperty(propertyId) {
     const confirmed = await showConfirm(`Are you sure you want to delete property: ${propertyId}?`);
     if (!confirmed) return;
@@ -212,7 +251,8 @@ async function deleteProperty(propertyId) {
 
 async function initializeApp() {
     try {
-        const response = await fetch('/company_finances/api/rental_properties/data');
+        // 'no-cache' revalidates with the cached ETag; an unchanged table costs a bodiless 304
+        const response = await fetch('/company_finances/api/rental_properties/data', { cache: 'no-cache' });
         if (!response.ok) throw new Error("Could not fetch property list.");
         rentalPropertiesData = await response.json();
         renderProperties(rentalPropertiesData);
@@ -4,6 +4,7 @@
 
 let monthlyAmountsData = []; // Will be populated from the database
 let yearCollapseState = {}; // Object to keep track of the collapse state for each year
+let yearlyTotals = {}; // year -> { gross_pay, taxed_amount, net_pay }, loaded from the totals API
 
 /**
  * Formats a number as currency (USD).
@@ -39,16 +40,21 @@ function showMessage(message, type = 'info') {
     }
 }
 
+let pendingEdits = new Map(); // id -> { id, grossPay, taxedAmount } awaiting the next batch flush
+let savedAmounts = new Map(); // id -> { gross_pay, taxed_amount } last values confirmed by the backend
+let flushTimer = null;
+const FLUSH_DELAY_MS = 600; // Debounce window for batching edits into a single request
+
 /**
  * Handles changes in monthly input fields (Gross Pay or Taxed Amount).
- * Updates local data, recalculates net pay, updates displayed net pay,
- * and sends changes to the backend API.
+ * Updates local data, recalculates net pay, updates displayed net pay and totals,
+ * and queues the change for the next debounced batch save.
  * @param {HTMLInputElement} inputElement - The input field that changed.
  * @param {number} id - The database ID of the monthly entry.
  * @param {number} year - The year of the entry.
  * @param {string} amountType - 'gross_pay' or 'taxed_amount', indicating which field changed.
  */
-async function handleAmountChange(inputElement, id, year, amountType) {
+function handleAmountChange(inputElement, id, year, amountType) {
     const newValue = parseFloat(inputElement.value);
     const monthEntry = monthlyAmountsData.find(m => m.id === id);
 
@@ -67,6 +73,15 @@ async function handleAmountChange(inputElement, id, year, amountType) {
         return;
     }
 
+    // Remember the last saved values so a failed flush can revert them
+    if (!savedAmounts.has(id)) {
+        savedAmounts.set(id, { gross_pay: monthEntry.gross_pay, taxed_amount: monthEntry.taxed_amount });
+    }
+
+    // Adjust the cached year totals by the change instead of re-summing the year
+    const delta = newValue - monthEntry[amountType];
+    adjustYearlyTotals(year, amountType === 'gross_pay' ? delta : 0, amountType === 'taxed_amount' ? delta : 0);
+
     // Update the local data immediately
     monthEntry[amountType] = newValue;
     // Recalculate net_pay based on the updated gross_pay and taxed_amount
@@ -78,42 +93,103 @@ async function handleAmountChange(inputElement, id, year, amountType) {
         netPayCell.textContent = formatCurrency(monthEntry.net_pay);
     }
 
-    // --- Send update to the backend API ---
+    // Totals are adjusted locally, so they can be refreshed before the save completes
+    updateRunningTotals();
+    updateYearlyTotals(year);
+
+    // --- Queue the update for the next batch ---
+    pendingEdits.set(id, {
+        id: id,
+        // Amounts go over the wire as fixed-point strings so the backend parses them exactly
+        grossPay: monthEntry.gross_pay.toFixed(2),
+        taxedAmount: monthEntry.taxed_amount.toFixed(2) // Send both gross and taxed amounts
+    });
+    clearTimeout(flushTimer);
+    flushTimer = setTimeout(flushPendingEdits, FLUSH_DELAY_MS);
+}
+
+/**
+ * Restores an entry's amounts (data, inputs and net pay cell) to the last saved values.
+ * @param {number} id - The database ID of the monthly entry.
+ */
+function revertEntry(id) {
+    const monthEntry = monthlyAmountsData.find(m => m.id === id);
+    const saved = savedAmounts.get(id);
+    if (!monthEntry || !saved) return;
+
+    adjustYearlyTotals(monthEntry.year, saved.gross_pay - monthEntry.gross_pay, saved.taxed_amount - monthEntry.taxed_amount);
+    monthEntry.gross_pay = saved.gross_pay;
+    monthEntry.taxed_amount = saved.taxed_amount;
+    monthEntry.net_pay = saved.gross_pay - saved.taxed_amount;
+
+    const suffix = `${monthEntry.month_name.substring(0, 3)}_${monthEntry.year}`;
+    const grossInput = document.getElementById(`USAF_Monthly_Gross_Income_${suffix}`);
+    const taxedInput = document.getElementById(`USAF_Monthly_Taxed_Amount_${suffix}`);
+    const netPayCell = document.getElementById(`USAF_Monthly_Net_Income_${suffix}`);
+    if (grossInput) grossInput.value = monthEntry.gross_pay.toFixed(2);
+    if (taxedInput) taxedInput.value = monthEntry.taxed_amount.toFixed(2);
+    if (netPayCell) netPayCell.textContent = formatCurrency(monthEntry.net_pay);
+    updateYearlyTotals(monthEntry.year);
+}
+
+/**
+ * Sends all queued edits to the backend in a single batch request.
+ * Rows rejected by the backend (or the whole batch on failure) are reverted.
+ */
+async function flushPendingEdits() {
+    flushTimer = null;
+    if (pendingEdits.size === 0) return;
+
+    const entries = Array.from(pendingEdits.values());
+    pendingEdits = new Map();
+
     try {
-        const response = await fetch('/personal/api/usaf_retirement/update', { // Updated API endpoint
+        const response = await fetch('/personal/api/usaf_retirement/update_batch', { // Updated API endpoint
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
             },
-            body: JSON.stringify({
-                id: id,
-                grossPay: monthEntry.gross_pay,
-                taxedAmount: monthEntry.taxed_amount // Send both gross and taxed amounts
-            })
+            body: JSON.stringify({ entries: entries })
         });
 
+        const result = await response.json();
         if (!response.ok) {
-            const errorData = await response.json();
-            throw new Error(`HTTP error! status: ${response.status}, message: ${errorData.error || response.statusText}`);
+            throw new Error(`HTTP error! status: ${response.status}, message: ${result.error || response.statusText}`);
         }
 
-        const result = await response.json();
-        showMessage(result.message, "success"); // Use custom message system
+        // The backend returns authoritative totals computed in the same request as the update
+        if (result.totals) {
+            applyServerTotals(result.totals);
+        }
 
-        // Re-render only the totals sections after successful update
-        updateRunningTotals();
-        updateYearlyTotals(year);
+        const failedIds = new Set(result.errors.map(err => err.id));
+        entries.forEach(entry => {
+            // Skip rows edited again while this request was in flight
+            if (pendingEdits.has(entry.id)) return;
+            if (failedIds.has(entry.id)) {
+                revertEntry(entry.id);
+            }
+            savedAmounts.delete(entry.id);
+        });
+
+        if (result.errors.length > 0) {
+            console.error("Some entries failed to save:", result.errors);
+            showMessage(`${result.errors.length} entries failed to save and were reverted.`, "error");
+        } else {
+            showMessage(result.message, "success"); // Use custom message system
+        }
 
     } catch (error) {
         console.error("Failed to save data:", error);
         showMessage("Failed to save data. Please check the console for details.", "error");
-        // Revert the input value if save failed
-        if (monthEntry) {
-            inputElement.value = monthEntry[amountType].toFixed(2);
-        }
-        // Consider re-fetching all data to ensure consistency with backend
-        // initializeApp(); // Uncomment if a full re-render is preferred on error
+        // Revert the values of every entry in the failed batch
+        entries.forEach(entry => {
+            if (pendingEdits.has(entry.id)) return;
+            revertEntry(entry.id);
+            savedAmounts.delete(entry.id);
+        });
     }
+    updateRunningTotals();
 }
 
 /**
@@ -149,57 +225,63 @@ function toggleYearVisibility(year) {
 }
 
 /**
- * Updates only the running totals in the header section for the current calendar year.
- * All data is now included in totals, as hiding is removed.
+ * Replaces the cached yearly totals with those returned by the totals API
+ * and refreshes every displayed total.
+ * @param {Object[]} totals - Per-year totals ({year, gross_total, taxed_total, net_total, ...}).
  */
-function updateRunningTotals() {
-    const today = new Date();
-    const currentYear = today.getFullYear();
+function applyServerTotals(totals) {
+    yearlyTotals = {};
+    totals.forEach(item => {
+        yearlyTotals[item.year] = {
+            gross_pay: parseFloat(item.gross_total),
+            taxed_amount: parseFloat(item.taxed_total),
+            net_pay: parseFloat(item.net_total)
+        };
+    });
+    Object.keys(yearlyTotals).forEach(updateYearlyTotals);
+    updateRunningTotals();
+}
 
-    let overallCurrentCalendarYearGrossTotal = 0;
-    let overallCurrentCalendarYearNetTotal = 0;
-    let overallCurrentCalendarYearTaxedTotal = 0;
+/**
+ * Applies a change in gross pay and/or taxed amount to a year's cached totals.
+ * @param {number} year - The year of the changed entry.
+ * @param {number} grossDelta - Change in gross pay.
+ * @param {number} taxedDelta - Change in taxed amount.
+ */
+function adjustYearlyTotals(year, grossDelta, taxedDelta) {
+    const totals = yearlyTotals[year] || (yearlyTotals[year] = { gross_pay: 0, taxed_amount: 0, net_pay: 0 });
+    totals.gross_pay += grossDelta;
+    totals.taxed_amount += taxedDelta;
+    totals.net_pay += grossDelta - taxedDelta;
+}
 
-    monthlyAmountsData.forEach(data => {
-        if (data.year === currentYear) {
-            // Sum all data for the current year, as hiding is removed
-            overallCurrentCalendarYearGrossTotal += data.gross_pay;
-            overallCurrentCalendarYearTaxedTotal += data.taxed_amount;
-            overallCurrentCalendarYearNetTotal += data.net_pay;
-        }
-    });
+/**
+ * Updates only the running totals in the header section for the current calendar year.
+ */
+function updateRunningTotals() {
+    const currentYear = new Date().getFullYear();
+    const totals = yearlyTotals[currentYear] || { gross_pay: 0, taxed_amount: 0, net_pay: 0 };
 
-    document.getElementById('running-gross-total').textContent = formatCurrency(overallCurrentCalendarYearGrossTotal);
-    document.getElementById('running-taxed-total').textContent = formatCurrency(overallCurrentCalendarYearTaxedTotal);
-    document.getElementById('running-net-total').textContent = formatCurrency(overallCurrentCalendarYearNetTotal);
+    document.getElementById('running-gross-total').textContent = formatCurrency(totals.gross_pay);
+    document.getElementById('running-taxed-total').textContent = formatCurrency(totals.taxed_amount);
+    document.getElementById('running-net-total').textContent = formatCurrency(totals.net_pay);
 }
 
 /**
- * Updates yearly totals for a specific year in the table.
- * All data is now included in totals, as hiding is removed.
+ * Updates yearly totals for a specific year in the table from the cached totals.
  * @param {number} year - The year for which to update totals.
  */
 function updateYearlyTotals(year) {
-    const yearData = monthlyAmountsData.filter(item => item.year === parseInt(year));
-    let yearGrossTotal = 0;
-    let yearTaxedTotal = 0;
-    let yearNetTotal = 0;
-
-    yearData.forEach(data => {
-        // Sum all data for the year, as hiding is removed
-        yearGrossTotal += data.gross_pay;
-        yearTaxedTotal += data.taxed_amount;
-        yearNetTotal += data.net_pay;
-    });
+    const totals = yearlyTotals[year] || { gross_pay: 0, taxed_amount: 0, net_pay: 0 };
 
     // Update the specific year's total row
     const yearTotalGrossCell = document.getElementById(`USAF_Yearly_Gross_Income_${year}`);
     const yearTotalTaxedCell = document.getElementById(`USAF_Yearly_Taxed_Amount_${year}`);
     const yearTotalNetCell = document.getElementById(`USAF_Yearly_Net_Income_${year}`);
 
-    if (yearTotalGrossCell) yearTotalGrossCell.textContent = formatCurrency(yearGrossTotal);
-    if (yearTotalTaxedCell) yearTotalTaxedCell.textContent = formatCurrency(yearTaxedTotal);
-    if (yearTotalNetCell) yearTotalNetCell.textContent = formatCurrency(yearNetTotal);
+    if (yearTotalGrossCell) yearTotalGrossCell.textContent = formatCurrency(totals.gross_pay);
+    if (yearTotalTaxedCell) yearTotalTaxedCell.textContent = formatCurrency(totals.taxed_amount);
+    if (yearTotalNetCell) yearTotalNetCell.textContent = formatCurrency(totals.net_pay);
 }
 
 /**
@@ -253,7 +335,8 @@ function updateMonthlyData() {
         mainTableBody.appendChild(yearHeaderRow); // Append to the main tbody
 
         // Set initial collapse state: current year is expanded, others are collapsed
-        const isYearCollapsed = (parseInt(year) !== currentYear);
+        // Keep any state the user chose when the table is re-rendered (e.g. after history loads)
+        const isYearCollapsed = (year in yearCollapseState) ? yearCollapseState[year] : (parseInt(year) !== currentYear);
         yearCollapseState[year] = isYearCollapsed; // Update state
 
         // Add click listener to the year header
@@ -322,7 +405,7 @@ function updateMonthlyData() {
             <td id="USAF_Yearly_Net_Income_${year}" class="rounded-br-lg">${formatCurrency(0)}</td>
         `;
         mainTableBody.appendChild(yearTotalRow); // Append to the main tbody
-        updateYearlyTotals(year); // Calculate and display totals for this year
+        updateYearlyTotals(year); // Display the cached totals for this year
     }
 
     // Update the running total displays for the current calendar year in the top section
@@ -370,41 +453,103 @@ function copyToClipboard(elementId) {
 }
 
 
+const DATA_API = '/personal/api/usaf_retirement/data';
+const TOTALS_API = '/personal/api/usaf_retirement/totals';
+const HISTORY_PAGE_SIZE = 240; // Months of older history fetched per background request
+
+/**
+ * Converts the API's string/number values into numbers for calculations and sorting.
+ * @param {Object} item - A monthly entry as returned by the API.
+ * @returns {Object} The same entry with numeric fields parsed.
+ */
+function normalizeEntry(item) {
+    item.month_index = parseInt(item.month_index);
+    item.year = parseInt(item.year);
+    item.gross_pay = parseFloat(item.gross_pay);
+    item.taxed_amount = parseFloat(item.taxed_amount);
+    item.net_pay = parseFloat(item.net_pay);
+    return item;
+}
+
+/**
+ * Fetches one page of monthly entries from the data API.
+ * @param {Object} params - Query parameters (year_from, year_to, limit, after).
+ * @returns {Promise<{items: Object[], nextCursor: string|null}>} The entries and the cursor for the next page.
+ */
+async function fetchPayPage(params) {
+    // 'no-cache' revalidates with the cached ETag; an unchanged table costs a bodiless 304
+    const response = await fetch(`${DATA_API}?${new URLSearchParams(params)}`, { cache: 'no-cache' });
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    const items = await response.json();
+    return { items: items.map(normalizeEntry), nextCursor: response.headers.get('X-Next-Cursor') };
+}
+
+/**
+ * Pages in the history older than the initially displayed years in the background
+ * and re-renders the table once it has all arrived.
+ * @param {number} lastYear - The most recent year to include.
+ */
+async function loadHistory(lastYear) {
+    try {
+        let history = [];
+        let cursor = null;
+        do {
+            const params = { year_to: lastYear, limit: HISTORY_PAGE_SIZE };
+            if (cursor) params.after = cursor;
+            const page = await fetchPayPage(params);
+            history = history.concat(page.items);
+            cursor = page.nextCursor;
+        } while (cursor);
+
+        if (history.length > 0) {
+            monthlyAmountsData = history.concat(monthlyAmountsData);
+            updateMonthlyData();
+        }
+    } catch (error) {
+        console.error("Error fetching history:", error);
+        showMessage("Failed to load older history. Please check the console and server.", "error");
+    }
+}
+
 /**
  * Initializes the application by fetching data from the backend.
+ * Only the visible years (last year onward) are loaded up front; older history is paged in lazily.
  */
 async function initializeApp() {
+    const firstVisibleYear = new Date().getFullYear() - 1;
     try {
         // Fetch data from Flask API endpoint for USAF Retirement
-        const response = await fetch('/personal/api/usaf_retirement/data');
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
+        const [page, totalsResponse] = await Promise.all([
+            fetchPayPage({ year_from: firstVisibleYear }),
+            fetch(TOTALS_API, { cache: 'no-cache' })
+        ]);
+        if (!totalsResponse.ok) {
+            throw new Error(`HTTP error! status: ${totalsResponse.status}`);
         }
-        const data = await response.json();
-        monthlyAmountsData = data; // Populate global variable with fetched data
-
-        // Ensure data types are correct for calculations and sorting
-        monthlyAmountsData.forEach(item => {
-            item.month_index = parseInt(item.month_index);
-            item.year = parseInt(item.year);
-            item.gross_pay = parseFloat(item.gross_pay);
-            item.taxed_amount = parseFloat(item.taxed_amount);
-            item.net_pay = parseFloat(item.net_pay);
-        });
+        monthlyAmountsData = page.items; // Populate global variable with fetched data
+        applyServerTotals(await totalsResponse.json());
 
         // Re-render the table with the fetched data
         updateMonthlyData();
+        loadHistory(firstVisibleYear - 1);
 
     } catch (error) {
         console.error("Error fetching initial data:", error);
         showMessage("Failed to load initial data. Please check the console and server.", "error");
-        // Attempt to render even if data fetch fails (will be empty or stale)
-        // updateMonthlyData(); // No need to call this here, as it will be called by window.onload
     }
 
     // Attach event listeners after initial render
     document.getElementById('export-button').addEventListener('click', exportData);
     document.getElementById('copy-export-button').addEventListener('click', () => copyToClipboard('exported-data-textarea'));
+
+    // Don't lose edits still waiting in the debounce window when leaving the page
+    window.addEventListener('beforeunload', () => {
+        if (pendingEdits.size === 0) return;
+        const payload = JSON.stringify({ entries: Array.from(pendingEdits.values()) });
+        navigator.sendBeacon('/personal/api/usaf_retirement/update_batch', new Blob([payload], { type: 'application/json' }));
+    });
 }
 
 // Run the initialization function when the page loads